@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+# compare how quickly the ways of checking for periodicity the compiler
+# can generate spot inside points, on the standard benchmark files
+
+from time import time as now
+
+from fract4d import fractal, fractconfig, fract4dc
+from fract4d_compiler import codegen, fc
+
+files = [
+    'testdata/std.fct',
+    'testdata/param.fct',
+    'testdata/valley_test.fct',
+    'testdata/trigcentric.fct',
+    'testdata/zpower.fct'
+]
+
+period_checks = [codegen.IntervalPeriodCheck, codegen.BrentPeriodCheck]
+
+FATE_INSIDE = 0x20  # as in pf.h
+
+
+class Benchmark:
+    def __init__(self):
+        self.w = 160
+        self.h = 120
+        self.compiler = fc.Compiler(fractconfig.userConfig())
+        self.compiler.add_func_path("formulas")
+        self.compiler.add_path("maps", fc.FormulaTypes.GRADIENT)
+
+    def points(self, f):
+        "The 4D position of the center of each pixel, a row at a time"
+        m = fract4dc.rot_matrix(f.params)
+        mag = f.params[f.MAGNITUDE]
+        rows = []
+        for y in range(self.h):
+            dy = -mag * (y + 0.5 - self.h / 2.0) / self.w
+            if f.yflip:
+                dy = -dy
+            row = []
+            for x in range(self.w):
+                dx = mag * (x + 0.5 - self.w / 2.0) / self.w
+                row.append(tuple(
+                    f.params[i] + m[0][i] * dx + m[1][i] * dy
+                    for i in range(4)))
+            rows.append(row)
+        return rows
+
+    def run_file(self, file, period_check):
+        f = fractal.T(self.compiler)
+        with open(file) as fh:
+            f.loadFctFile(fh)
+        f.set_compiler_option("period_check", period_check)
+        f.compile()
+        f.init_pfunc()
+
+        inside = 0
+        iterations = 0
+        last_time = now()
+        for row in self.points(f):
+            for (iters, fate, dist, solid) in fract4dc.pf_calc_batch(
+                    f.pfunc, row, f.maxiter, 1):
+                if fate & FATE_INSIDE:
+                    inside += 1
+                    iterations += iters
+        return (inside, iterations, now() - last_time)
+
+    def run(self):
+        print("file inside " + " ".join(
+            f"{check}-iters {check}-time" for check in period_checks))
+        for file in files:
+            results = [self.run_file(file, check) for check in period_checks]
+            line = [file, str(results[0][0])]
+            for (inside, iterations, time) in results:
+                # every method should find the same points inside
+                if inside != results[0][0]:
+                    line.append("(%d inside)" % inside)
+                average = iterations / inside if inside else 0.0
+                line.append(f"{average:.1f} {time:.4f}")
+            print(" ".join(line))
+
+
+bench = Benchmark()
+bench.run()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+# how the time to draw an image falls as threads are added. The formula is
+# kept cheap so that time spent coordinating the threads isn't hidden
+# behind the time spent calculating points.
+# usage: benchthreads.py [max threads]
+
+import math
+import os
+import sys
+from time import time as now
+
+from fract4d import fractal, fractconfig, fract4dc, image
+from fract4d_compiler import fc
+
+file = 'testdata/std.fct'
+repeats = 3
+
+
+class Benchmark:
+    def __init__(self, max_threads):
+        self.w = 640
+        self.h = 480
+        self.max_threads = max_threads
+        self.compiler = fc.Compiler(fractconfig.userConfig())
+        self.compiler.add_func_path("formulas")
+        self.compiler.add_path("maps", fc.FormulaTypes.GRADIENT)
+
+    def load(self):
+        f = fractal.T(self.compiler)
+        with open(file) as fh:
+            f.loadFctFile(fh)
+        f.maxiter = 64
+        f.auto_deepen = False
+        f.set_periodicity(False)
+        f.compile()
+        return f
+
+    def run_threads(self, f, nthreads):
+        "the best of a few runs, and how busy each thread was in it"
+        (best_time, best_stats) = (math.inf, None)
+        for i in range(repeats):
+            im = image.T(self.w, self.h)
+            last_time = now()
+            f.draw(im, nthreads)
+            time = now() - last_time
+            if time < best_time:
+                (best_time, best_stats) = (time, fract4dc.pool_thread_stats())
+        return (best_time, best_stats)
+
+    def run(self):
+        f = self.load()
+        print("threads time speedup busy idle jobs steals")
+        base = None
+        for nthreads in range(1, self.max_threads + 1):
+            (time, stats) = self.run_threads(f, nthreads)
+            if base is None:
+                base = time
+            if nthreads == 1:
+                # drawn on the calling thread, not the pool
+                stats = []
+            busy = sum(s[0] for s in stats)
+            idle = sum(s[1] for s in stats)
+            jobs = sum(s[2] for s in stats)
+            steals = sum(s[3] for s in stats)
+            print(f"{nthreads} {time:.4f} {base / time:.2f} "
+                  f"{busy:.4f} {idle:.4f} {jobs} {steals}")
+        fract4dc.pool_clear()
+
+
+max_threads = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+bench = Benchmark(max(max_threads, 1))
+bench.run()
@@ -165,10 +165,40 @@ static void BM_fractal(benchmark::State& state) {
     }
 }
 
+// a gradient using every blend mode, to compare color lookups through the
+// lookup table (of the given size) with the exact calculation (size 0)
+static void BM_gradient_lookup(benchmark::State& state) {
+    const int n_segments = 5;
+    std::unique_ptr<GradientColorMap> cmap{new (std::nothrow) GradientColorMap{}};
+    cmap->init(n_segments);
+    for (auto i = 0; i < n_segments; i++) {
+        double left = static_cast<double>(i) / n_segments;
+        double right = static_cast<double>(i + 1) / n_segments;
+        double left_color[4] = {0.0, 0.5, 1.0, 1.0};
+        double right_color[4] = {1.0, 0.2, 0.0, 1.0};
+        cmap->set(i, left, right, left + (right - left) * 0.3,
+            left_color, right_color,
+            static_cast<e_blendType>(i), static_cast<e_colorType>(i % 3));
+    }
+    cmap->set_lut_size(state.range(0));
+
+    const int n_lookups = 640 * 480;
+    for (auto _ : state) {
+        for (auto i = 0; i < n_lookups; i++) {
+            // step through the gradient several times, as a smooth
+            // coloring algorithm would
+            double index = i * (7.0 / n_lookups);
+            benchmark::DoNotOptimize(cmap->lookup_with_transfer(index, 0, 0));
+        }
+    }
+    state.SetItemsProcessed(state.iterations() * n_lookups);
+}
+
 // run benchmark
 // - report time per iteration in milliseconds
 // - for at least 2 minutes
 // - measure real time not CPU time for main thread
 BENCHMARK(BM_fractal)->Arg(64)->Arg(128)->Arg(432)->Unit(benchmark::kMillisecond)->MinTime(120.0)->UseRealTime();
+BENCHMARK(BM_gradient_lookup)->Arg(0)->Arg(4096)->Arg(65536)->Unit(benchmark::kMillisecond);
 
 BENCHMARK_MAIN();
\ No newline at end of file
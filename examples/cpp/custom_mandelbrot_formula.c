@@ -112,6 +112,9 @@ typedef unsigned char fate_t;
 #define FATE_SOLID 0x80
 #define FATE_DIRECT 0x40
 #define FATE_INSIDE 0x20
+/* the calculation was interrupted before the point's fate was known.
+   Attractor 31 is never reached, so this can't be a real fate */
+#define FATE_INTERRUPTED 0x1F
 
 typedef enum
 {
@@ -170,12 +173,48 @@ struct s_pf_vtable
     /* deallocate data in p */
     void (*kill)(
         struct s_pf_data *p);
+    /* calculate a batch of points (optional, may be NULL) */
+    void (*calc_batch)(
+        struct s_pf_data *p,
+        int n,
+        const double *xs, const double *ys,
+        const double *zs, const double *ws,
+        int nIters, int warp_param,
+        int periodicity, int *pLastIters, double period_tolerance,
+        const int *px, int y, int aa,
+        double *const *states,
+        int *pnIters, int *pFate, double *pDist, int *pSolid,
+        int *pDirectColorFlag, double *pColors);
+    /* calculate a point with double-double coordinates (optional, may be NULL) */
+    void (*calc_dd)(
+        struct s_pf_data *p,
+        const double *params, int nIters, int warp_param,
+        int min_period_iter, double period_tolerance,
+        int x, int y, int aa,
+        int *pnIters, int *pFate, double *pDist, int *pSolid,
+        int *pDirectColorFlag, double *pColors);
+    /* calculate a point, saving its state to carry on from later (optional, may be NULL) */
+    void (*calc_resume)(
+        struct s_pf_data *p,
+        const double *params, int nIters, int warp_param,
+        int min_period_iter, double period_tolerance,
+        int x, int y, int aa,
+        double *state,
+        int *pnIters, int *pFate, double *pDist, int *pSolid,
+        int *pDirectColorFlag, double *pColors);
+    /* number of doubles in calc_resume's state */
+    int state_size;
+    /* copy p for another thread to use (optional, may be NULL) */
+    struct s_pf_data *(*clone)(
+        struct s_pf_data *p);
 };
 
 struct s_pf_data
 {
     struct s_pf_vtable *vtbl;
     void *arena;
+    /* a flag which is non-zero when the calculation should stop (may be NULL) */
+    const volatile int *interrupted;
 };
 
 typedef struct s_pf_vtable pf_vtable;
@@ -446,7 +485,13 @@ static struct s_pf_vtable vtbl =
         pf_get_defaults,
         pf_init,
         pf_calc,
-        pf_kill};
+        pf_kill,
+        NULL, /* no batched calc */
+        NULL, /* double precision only */
+        NULL, /* can't resume */
+        0,
+        NULL /* threads share one copy */
+    };
 
 pf_obj *pf_new()
 {
@@ -455,5 +500,6 @@ pf_obj *pf_new()
         return NULL;
     p->parent.vtbl = &vtbl;
     p->parent.arena = arena_create(100000, 1);
+    p->parent.interrupted = NULL;
     return (pf_obj *)p;
 }
@@ -241,7 +241,12 @@ static struct s_pf_vtable vtbl =
     pf_get_defaults,
     pf_init,
     pf_calc,
-    pf_kill
+    pf_kill,
+    nullptr, // no batched calc
+    nullptr, // no double-double calc
+    nullptr, // can't resume
+    0,
+    nullptr // threads share one copy
 };
 
 pf_obj *pf_new()
@@ -250,5 +255,6 @@ pf_obj *pf_new()
     if (!p)
         return NULL;
     p->parent.vtbl = &vtbl;
+    p->parent.interrupted = NULL;
     return (pf_obj *)p;
 }
\ No newline at end of file
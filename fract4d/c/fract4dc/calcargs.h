@@ -1,7 +1,10 @@
 #ifndef __CALCARGS_H_INCLUDED__
 #define __CALCARGS_H_INCLUDED__
 
+#include <memory>
+
 #include "model/calcoptions.h"
+#include "model/perturbation.h"
 
 typedef struct _object PyObject;
 // forward references
@@ -20,7 +23,12 @@ struct calc_args
     ColorMap *cmap;
     IImage *im;
     IFractalSite *site;
-    PyObject *pycmap, *pypfo, *pyim, *pysite;
+    // only set for deep zooms
+    std::unique_ptr<ReferenceOrbit> orbit;
+    // digits of the center beyond those in params, if given
+    double center_lo[4] = {0.0, 0.0, 0.0, 0.0};
+    // NULL until set, so an error part-way through parsing can clean up
+    PyObject *pycmap = NULL, *pypfo = NULL, *pyim = NULL, *pysite = NULL;
 
     calc_args();
 
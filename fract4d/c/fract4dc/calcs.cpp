@@ -7,6 +7,9 @@
 #include "model/calcfunc.h"
 #include "model/site.h"
 #include "model/image.h"
+#include "model/perturbation.h"
+
+#include "fract_dd.h"
 
 #include "fract4dc/calcargs.h"
 #include "fract4dc/loaders.h"
@@ -66,7 +69,9 @@ namespace calcs {
                     cargs->cmap,
                     cargs->site,
                     cargs->im,
-                    0 // debug_flags
+                    0, // debug_flags
+                    cargs->orbit.get(),
+                    cargs->center_lo
                 );
 
             delete cargs;
@@ -77,6 +82,30 @@ namespace calcs {
 
         return Py_None;
     }
+
+    PyObject * pyrecolor([[maybe_unused]] PyObject *self, PyObject *args)
+    {
+        PyObject *pyim, *pycmap;
+        int nthreads = 1;
+        if (!PyArg_ParseTuple(args, "OO|i", &pyim, &pycmap, &nthreads))
+        {
+            return NULL;
+        }
+
+        IImage *im = images::image_fromcapsule(pyim);
+        ColorMap *cmap = colormaps::cmap_fromcapsule(pycmap);
+        if (!im || !cmap)
+        {
+            return NULL;
+        }
+
+        Py_BEGIN_ALLOW_THREADS
+            recolor(cmap, im, nthreads);
+        Py_END_ALLOW_THREADS
+
+        Py_INCREF(Py_None);
+        return Py_None;
+    }
 }
 
 struct GIL_guard {
@@ -107,7 +136,9 @@ void * calculation_thread(calc_args *args)
         args->cmap,
         args->site,
         args->im,
-        0 // debug_flags
+        0, // debug_flags
+        args->orbit.get(),
+        args->center_lo
     );
 #ifdef DEBUG_THREADS
     std::cerr << args << " : CA : ENDCALC(" << std::this_thread::get_id() << ")\n";
@@ -117,9 +148,105 @@ void * calculation_thread(calc_args *args)
     return NULL;
 }
 
+// a center of the image as (x, y) or (x, y, z, w). The values can be
+// strings, to keep more precision than a float has
+static bool parse_center(PyObject *pycenter, const char *name, std::string (&center)[4])
+{
+    if (!PyTuple_Check(pycenter) ||
+        (PyTuple_Size(pycenter) != 2 && PyTuple_Size(pycenter) != 4))
+    {
+        PyErr_Format(PyExc_ValueError, "%s must be a tuple of 2 or 4 items", name);
+        return false;
+    }
+
+    for (int i = 0; i < PyTuple_Size(pycenter); ++i)
+    {
+        PyObject *pystr = PyObject_Str(PyTuple_GetItem(pycenter, i));
+        if (!pystr)
+        {
+            return false;
+        }
+        const char *str = PyUnicode_AsUTF8(pystr);
+        if (str)
+        {
+            center[i] = str;
+        }
+        Py_DECREF(pystr);
+        if (!str)
+        {
+            return false;
+        }
+    }
+    return true;
+}
+
+// deep_zoom_coloring is (potential, density, offset), as for
+// ReferenceOrbit::settings
+static bool parse_deep_zoom(
+    PyObject *pydeep, double bailout, PyObject *pycoloring, calc_args *cargs)
+{
+    std::string center[4] = {"0", "0", "0", "0"};
+    if (!parse_center(pydeep, "deep_zoom", center))
+    {
+        return false;
+    }
+
+    cargs->orbit = std::make_unique<ReferenceOrbit>(center);
+    if (!cargs->orbit->ok())
+    {
+        PyErr_SetString(PyExc_ValueError, "bad deep_zoom center");
+        return false;
+    }
+
+    ReferenceOrbit::settings settings;
+    if (bailout <= 0.0)
+    {
+        PyErr_SetString(PyExc_ValueError, "bad deep_zoom_bailout");
+        return false;
+    }
+    settings.bailout = bailout;
+    if (pycoloring && pycoloring != Py_None &&
+        !PyArg_ParseTuple(
+            pycoloring, "ddd;deep_zoom_coloring must be (potential, density, offset)",
+            &settings.potential, &settings.density, &settings.offset))
+    {
+        return false;
+    }
+    cargs->orbit->set_settings(settings);
+    return true;
+}
+
+// precise_center replaces the center in params with one carrying enough
+// digits for double-double formulas
+static bool parse_precise_center(PyObject *pycenter, calc_args *cargs)
+{
+    std::string center[4] = {"0", "0", "0", "0"};
+    if (!parse_center(pycenter, "precise_center", center))
+    {
+        return false;
+    }
+
+    for (int i = 0; i < 4; ++i)
+    {
+        dd_real value;
+        if (!dd_parse(center[i].c_str(), &value))
+        {
+            PyErr_SetString(PyExc_ValueError, "bad precise_center");
+            return false;
+        }
+        cargs->params[XCENTER + i] = value.hi;
+        cargs->center_lo[i] = value.lo;
+    }
+    return true;
+}
+
 calc_args * parse_calc_args(PyObject *args, PyObject *kwds)
 {
     PyObject *pyparams, *pypfo, *pycmap, *pyim, *pysite;
+    PyObject *pydeep = NULL;
+    double deep_bailout = 4.0;
+    PyObject *pydeep_coloring = NULL;
+    PyObject *pyprecise = NULL;
     calc_args *cargs = new calc_args();
     double *p = NULL;
 
@@ -141,12 +268,23 @@ calc_args * parse_calc_args(PyObject *args, PyObject *kwds)
         "warp_param",
         "tolerance",
         "auto_tolerance",
+        "deep_zoom",
+        "series_approximation",
+        "precise_center",
+        "draw_type",
+        "safe_subdivide",
+        "aa_samples",
+        "aa_variance",
+        "update_rate",
+        "priority",
+        "deep_zoom_bailout",
+        "deep_zoom_coloring",
         NULL};
 
     if (!PyArg_ParseTupleAndKeywords(
             args,
             kwds,
-            "OOOOO|iiiiiiiiiidi",
+            "OOOOO|iiiiiiiiiidiOiOiiidiidO",
             const_cast<char **>(kwlist),
 
             &pyim, &pysite,
@@ -163,8 +301,32 @@ calc_args * parse_calc_args(PyObject *args, PyObject *kwds)
             &cargs->asynchronous,
             &cargs->options.warp_param,
             &cargs->options.period_tolerance,
-            &cargs->options.auto_tolerance))
+            &cargs->options.auto_tolerance,
+            &pydeep,
+            &cargs->options.series_approximation,
+            &pyprecise,
+            &cargs->options.draw_type,
+            &cargs->options.safe_subdivide,
+            &cargs->options.aa_samples,
+            &cargs->options.aa_variance,
+            &cargs->options.update_rate,
+            &cargs->options.priority,
+            &deep_bailout,
+            &pydeep_coloring))
+    {
+        goto error;
+    }
+
+    if (cargs->options.priority < 0 || cargs->options.priority >= NUM_PRIORITIES)
+    {
+        PyErr_SetString(PyExc_ValueError, "bad priority");
+        goto error;
+    }
+
+    if (cargs->options.aa_samples != 4 && cargs->options.aa_samples != 9 &&
+        cargs->options.aa_samples != 16)
     {
+        PyErr_SetString(PyExc_ValueError, "aa_samples must be 4, 9 or 16");
         goto error;
     }
 
@@ -206,6 +368,17 @@ calc_args * parse_calc_args(PyObject *args, PyObject *kwds)
         goto error;
     }
 
+    if (pydeep && pydeep != Py_None &&
+        !parse_deep_zoom(pydeep, deep_bailout, pydeep_coloring, cargs))
+    {
+        goto error;
+    }
+
+    if (pyprecise && pyprecise != Py_None && !parse_precise_center(pyprecise, cargs))
+    {
+        goto error;
+    }
+
     return cargs;
 
 error:
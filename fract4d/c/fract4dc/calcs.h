@@ -11,6 +11,7 @@ void * calculation_thread(calc_args *args);
 namespace calcs {
     PyObject * pystop_calc(PyObject *self, PyObject *args);
     PyObject * pycalc(PyObject *self, PyObject *args, PyObject *kwds);
+    PyObject * pyrecolor(PyObject *self, PyObject *args);
 }
 
 #endif
\ No newline at end of file
@@ -77,10 +77,13 @@ namespace colormaps {
         float: left,right,mid
         int: bmode, cmode
         [f,f,f,f] : left_color, right_color
+        and optionally the number of cells in a lookup table to
+        approximate it with, 0 (the default) to calculate colors exactly
         */
         PyObject *pyarray, *pyret;
+        int lut_size = 0;
 
-        if (!PyArg_ParseTuple(args, "O", &pyarray))
+        if (!PyArg_ParseTuple(args, "O|i", &pyarray, &lut_size))
         {
             return NULL;
         }
@@ -90,7 +93,13 @@ namespace colormaps {
             return NULL;
         }
 
-        ColorMap *cmap = cmap_from_pyobject(pyarray);
+        if (lut_size < 0)
+        {
+            PyErr_SetString(PyExc_ValueError, "Negative lookup table size");
+            return NULL;
+        }
+
+        ColorMap *cmap = cmap_from_pyobject(pyarray, lut_size);
 
         if (NULL == cmap)
         {
@@ -206,7 +215,7 @@ namespace colormaps {
     }
 
 
-    ColorMap * cmap_from_pyobject(PyObject *pyarray)
+    ColorMap * cmap_from_pyobject(PyObject *pyarray, int lut_size)
     {
         int len, i;
         GradientColorMap *cmap;
@@ -262,6 +271,13 @@ namespace colormaps {
 
             Py_DECREF(pyitem);
         }
+
+        if (!cmap->set_lut_size(lut_size))
+        {
+            PyErr_SetString(PyExc_MemoryError, "Can't allocate colormap lookup table");
+            delete cmap;
+            return NULL;
+        }
         return cmap;
     }
 
@@ -16,7 +16,7 @@ namespace colormaps {
     PyObject * pycmap_set_transfer(PyObject *self, PyObject *args);
     PyObject * cmap_pylookup(PyObject *self, PyObject *args);
     PyObject * cmap_pylookup_with_flags(PyObject *self, PyObject *args);
-    ColorMap * cmap_from_pyobject(PyObject *pyarray);
+    ColorMap * cmap_from_pyobject(PyObject *pyarray, int lut_size = 0);
     ColorMap * cmap_fromcapsule(PyObject *capsule);
     void pycmap_delete(PyObject *capsule);
 }
@@ -1,5 +1,6 @@
 #include "Python.h"
 #include <cassert>
+#include <cerrno>
 #include <new>
 
 #include "images.h"
@@ -17,17 +18,33 @@ namespace images {
     {
         int x, y;
         int totalx = -1, totaly = -1;
-        if (!PyArg_ParseTuple(args, "ii|ii", &x, &y, &totalx, &totaly))
+        int buffers = IMAGE_BUFFERS_FULL;
+        const char *backing_dir = NULL;
+        if (!PyArg_ParseTuple(args, "ii|iiiz", &x, &y, &totalx, &totaly, &buffers, &backing_dir))
         {
             return NULL;
         }
 
-        IImage *i = new image();
+        if (buffers < IMAGE_BUFFERS_RGB || buffers > IMAGE_BUFFERS_FULL)
+        {
+            PyErr_SetString(PyExc_ValueError, "bad image buffers");
+            return NULL;
+        }
 
+        IImage *i = new image(static_cast<image_buffers_t>(buffers), backing_dir);
+
+        errno = 0;
         i->set_resolution(x, y, totalx, totaly);
 
         if (!i->ok())
         {
+            if (backing_dir && errno != 0)
+            {
+                // couldn't make the scratch file
+                PyErr_SetFromErrnoWithFilename(PyExc_OSError, backing_dir);
+                delete i;
+                return NULL;
+            }
             PyErr_SetString(PyExc_MemoryError, "Image too large");
             delete i;
             return NULL;
@@ -183,6 +200,47 @@ namespace images {
         return Py_None;
     }
 
+    PyObject * image_shift([[maybe_unused]] PyObject *self, PyObject *args)
+    {
+        PyObject *pyim;
+        int dx, dy;
+
+        if (!PyArg_ParseTuple(args, "Oii", &pyim, &dx, &dy))
+        {
+            return NULL;
+        }
+
+        IImage *i = image_fromcapsule(pyim);
+        if (NULL == i)
+        {
+            return NULL;
+        }
+
+        i->shift(dx, dy);
+
+        Py_INCREF(Py_None);
+        return Py_None;
+    }
+
+    PyObject * image_rescale([[maybe_unused]] PyObject *self, PyObject *args)
+    {
+        PyObject *pyim;
+        double x0, y0, scale;
+
+        if (!PyArg_ParseTuple(args, "Oddd", &pyim, &x0, &y0, &scale))
+        {
+            return NULL;
+        }
+
+        IImage *i = image_fromcapsule(pyim);
+        if (NULL == i)
+        {
+            return NULL;
+        }
+
+        return PyBool_FromLong(i->rescale(x0, y0, scale));
+    }
+
     PyObject * image_writer_create([[maybe_unused]] PyObject *self, PyObject *args)
     {
         PyObject *pyim;
@@ -270,14 +328,21 @@ namespace images {
     PyObject * image_save_tile([[maybe_unused]] PyObject *self, PyObject *args)
     {
         PyObject *pyimwriter;
-        if (!PyArg_ParseTuple(args, "O", &pyimwriter))
+        PyObject *pytile = NULL;
+        if (!PyArg_ParseTuple(args, "O|O", &pyimwriter, &pytile))
         {
             return NULL;
         }
 
         ImageWriter *i = image_writer_fromcapsule(pyimwriter);
+        // by default, the rows of the image the writer was created with
+        IImage *tile = pytile ? image_fromcapsule(pytile) : NULL;
+        if (pytile && !tile)
+        {
+            return NULL;
+        }
 
-        if (!i || !i->save_tile())
+        if (!i || !(tile ? i->save_tile(tile) : i->save_tile()))
         {
             PyErr_SetString(PyExc_IOError, "Couldn't save image tile");
             return NULL;
@@ -335,8 +400,8 @@ namespace images {
             PyErr_SetString(PyExc_ValueError, "request for buffer outside image bounds");
             return NULL;
         }
-        int offset = 3 * (y * i->Xres() + x); // @TODO: this number 3 means "bytes per pixel" and it's hardcoded here and in the image class
-        assert(offset > -1 && offset < i->bytes());
+        const std::size_t offset = 3 * (static_cast<std::size_t>(y) * i->Xres() + x); // @TODO: this number 3 means "bytes per pixel" and it's hardcoded here and in the image class
+        assert(offset < i->bytes());
         Py_buffer *buffer = new Py_buffer;
         PyBuffer_FillInfo(buffer, NULL, i->getBuffer() + offset, i->bytes() - offset, 0, PyBUF_WRITABLE);
         pybuf = PyMemoryView_FromBuffer(buffer);
@@ -375,9 +440,9 @@ namespace images {
             PyErr_SetString(PyExc_ValueError, "request for buffer outside image bounds");
             return NULL;
         }
-        int index = i->index_of_subpixel(x, y, 0);
-        int last_index = i->index_of_sentinel_subpixel();
-        assert(index > -1 && index < last_index);
+        const std::size_t index = i->index_of_subpixel(x, y, 0);
+        const std::size_t last_index = i->index_of_sentinel_subpixel();
+        assert(index < last_index);
 
         Py_buffer *buffer = new Py_buffer;
         PyBuffer_FillInfo(buffer, NULL, i->getFateBuffer() + index, (last_index - index) * sizeof(fate_t), 0, PyBUF_WRITABLE);
@@ -409,7 +474,7 @@ namespace images {
 
         if (x < 0 || x >= i->Xres() ||
             y < 0 || y >= i->Yres() ||
-            sub < 0 || sub >= image::N_SUBPIXELS)
+            sub < 0 || sub >= i->getNSubPixels())
         {
             PyErr_SetString(PyExc_ValueError,
                             "request for data outside image bounds");
@@ -441,7 +506,7 @@ namespace images {
 
         if (x < 0 || x >= i->Xres() ||
             y < 0 || y >= i->Yres() ||
-            sub < 0 || sub >= image::N_SUBPIXELS)
+            sub < 0 || sub >= i->getNSubPixels())
         {
             PyErr_SetString(PyExc_ValueError,
                             "request for data outside image bounds");
@@ -18,6 +18,8 @@ namespace images {
     PyObject * image_dims(PyObject *self, PyObject *args);
     PyObject * image_set_offset(PyObject *self, PyObject *args);
     PyObject * image_clear(PyObject *self, PyObject *args);
+    PyObject * image_shift(PyObject *self, PyObject *args);
+    PyObject * image_rescale(PyObject *self, PyObject *args);
     PyObject * image_writer_create(PyObject *self, PyObject *args);
     PyObject * image_read(PyObject *self, PyObject *args);
     PyObject * image_save_header(PyObject *self, PyObject *args);
@@ -1,6 +1,7 @@
 #include "Python.h"
 #include <dlfcn.h>
 #include <cassert>
+#include <vector>
 
 #include "loaders.h"
 
@@ -213,6 +214,67 @@ namespace loaders
     }
 
 
+    PyObject * pf_calc_batch([[maybe_unused]] PyObject *self, PyObject *args)
+    {
+        PyObject *pyobj, *pypoints;
+        int nIters, periodicity = 0;
+
+        if (!PyArg_ParseTuple(args, "OOi|i",
+                            &pyobj, &pypoints, &nIters, &periodicity))
+        {
+            return NULL;
+        }
+        if (!PyCapsule_CheckExact(pyobj))
+        {
+            PyErr_SetString(PyExc_ValueError, "Not a valid handle");
+            return NULL;
+        }
+        if (!PyList_Check(pypoints))
+        {
+            PyErr_SetString(PyExc_ValueError, "points must be a list");
+            return NULL;
+        }
+
+        struct pfHandle *pfh = pf_fromcapsule(pyobj);
+        if (!pfh->pfo->vtbl->calc_batch)
+        {
+            PyErr_SetString(PyExc_ValueError, "Formula has no batch entry point");
+            return NULL;
+        }
+
+        const int n = PyList_Size(pypoints);
+        std::vector<double> xs(n), ys(n), zs(n), ws(n);
+        for (int i = 0; i < n; ++i)
+        {
+            if (!PyArg_ParseTuple(PyList_GetItem(pypoints, i), "dddd",
+                                &xs[i], &ys[i], &zs[i], &ws[i]))
+            {
+                return NULL;
+            }
+        }
+
+        std::vector<int> px(n, 0), outIters(n), outFate(n), outSolid(n), fDirectColorFlag(n);
+        std::vector<double> outDist(n), colors(4 * n);
+        int lastIters = 0;
+        pfh->pfo->vtbl->calc_batch(
+            pfh->pfo, n,
+            xs.data(), ys.data(), zs.data(), ws.data(),
+            nIters, -1,
+            periodicity, &lastIters, 1.0E-9,
+            px.data(), 0, 0,
+            nullptr,
+            outIters.data(), outFate.data(), outDist.data(), outSolid.data(),
+            fDirectColorFlag.data(), colors.data());
+
+        PyObject *pyret = PyList_New(n);
+        for (int i = 0; i < n; ++i)
+        {
+            PyList_SET_ITEM(pyret, i, Py_BuildValue(
+                "iidi", outIters[i], outFate[i], outDist[i], outSolid[i]));
+        }
+        return pyret;
+    }
+
     struct pfHandle * pf_fromcapsule(PyObject *capsule)
     {
         struct pfHandle *pfHandle = (struct pfHandle *)PyCapsule_GetPointer(capsule, OBTYPE_POINTFUNC);
@@ -22,6 +22,7 @@ namespace loaders {
     PyObject * pf_init(PyObject *self, PyObject *args);
     PyObject * pf_defaults(PyObject *self, PyObject *args);
     PyObject * pf_calc(PyObject *self, PyObject *args);
+    PyObject * pf_calc_batch(PyObject *self, PyObject *args);
     struct pfHandle * pf_fromcapsule(PyObject *capsule);
     void pf_delete(PyObject *p);
     void * module_fromcapsule(PyObject *p);
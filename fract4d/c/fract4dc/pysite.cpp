@@ -87,9 +87,11 @@ void PySite::stats_changed(pixel_stat_t &stats)
     PyObject *ret = PyObject_CallMethod(
         site,
         const_cast<char *>("stats_changed"),
-        const_cast<char *>("[kkkkkkkkkk]"),
+        const_cast<char *>("[kkkkkkkkkkkkkkkk]"),
         stats.s[0], stats.s[1], stats.s[2], stats.s[3], stats.s[4],
-        stats.s[5], stats.s[6], stats.s[7], stats.s[8], stats.s[9]);
+        stats.s[5], stats.s[6], stats.s[7], stats.s[8], stats.s[9],
+        stats.s[10], stats.s[11], stats.s[12], stats.s[13], stats.s[14],
+        stats.s[15]);
     Py_XDECREF(ret);
     RELEASE_LOCK;
 }
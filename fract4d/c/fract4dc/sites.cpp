@@ -22,6 +22,129 @@ namespace sites {
         return pyret;
     }
 
+    PyObject * pystatussite_create([[maybe_unused]] PyObject *self, [[maybe_unused]] PyObject *args)
+    {
+        StatusSite *site = new StatusSite();
+        if (site->get_fd() == -1)
+        {
+            delete site;
+            PyErr_SetFromErrno(PyExc_OSError);
+            return NULL;
+        }
+
+        PyObject *pyret = PyCapsule_New(
+            static_cast<IFractalSite *>(site), OBTYPE_SITE, pysite_delete);
+
+        return pyret;
+    }
+
+    static StatusSite * statussite_fromcapsule(PyObject *pysite)
+    {
+        StatusSite *site = dynamic_cast<StatusSite *>(site_fromcapsule(pysite));
+        if (NULL == site && !PyErr_Occurred())
+        {
+            PyErr_SetString(PyExc_ValueError, "not a status site");
+        }
+        return site;
+    }
+
+    PyObject * pystatussite_fd([[maybe_unused]] PyObject *self, PyObject *args)
+    {
+        PyObject *pysite;
+        if (!PyArg_ParseTuple(args, "O", &pysite))
+        {
+            return NULL;
+        }
+        StatusSite *site = statussite_fromcapsule(pysite);
+        if (NULL == site)
+        {
+            return NULL;
+        }
+        return Py_BuildValue("i", site->get_fd());
+    }
+
+    // append a (type, payload) message, with the payload packed the same
+    // way FDSite writes it to its pipe
+    static bool append_message(PyObject *list, msg_type_t type, const void *buf, int size)
+    {
+        PyObject *payload = PyBytes_FromStringAndSize(
+            static_cast<const char *>(buf), size);
+        if (NULL == payload)
+        {
+            return false;
+        }
+        // N steals the reference to payload
+        PyObject *message = Py_BuildValue("(iN)", static_cast<int>(type), payload);
+        if (NULL == message)
+        {
+            return false;
+        }
+        const int ret = PyList_Append(list, message);
+        Py_DECREF(message);
+        return ret == 0;
+    }
+
+    PyObject * pystatussite_read([[maybe_unused]] PyObject *self, PyObject *args)
+    {
+        PyObject *pysite;
+        if (!PyArg_ParseTuple(args, "O", &pysite))
+        {
+            return NULL;
+        }
+        StatusSite *site = statussite_fromcapsule(pysite);
+        if (NULL == site)
+        {
+            return NULL;
+        }
+
+        site_status status = site->read();
+
+        PyObject *messages = PyList_New(0);
+        if (NULL == messages)
+        {
+            return NULL;
+        }
+        bool ok = true;
+        if (status.has_iters)
+        {
+            ok = ok && append_message(
+                messages, ITERS, &status.iterations, sizeof(status.iterations));
+        }
+        if (status.has_tolerance)
+        {
+            ok = ok && append_message(
+                messages, TOLERANCE, &status.tolerance, sizeof(status.tolerance));
+        }
+        if (status.has_image)
+        {
+            const int rect[4] = {status.x1, status.y1, status.x2, status.y2};
+            ok = ok && append_message(messages, IMAGE, rect, sizeof(rect));
+        }
+        if (status.has_progress)
+        {
+            const int percentdone = static_cast<int>(100.0 * status.progress);
+            ok = ok && append_message(
+                messages, PROGRESS, &percentdone, sizeof(percentdone));
+        }
+        if (status.has_stats)
+        {
+            ok = ok && append_message(
+                messages, STATS, &status.stats, sizeof(status.stats));
+        }
+        // statuses go last, so that "done" comes after the final updates
+        for (int status_val : status.statuses)
+        {
+            ok = ok && append_message(
+                messages, STATUS, &status_val, sizeof(status_val));
+        }
+        if (!ok)
+        {
+            Py_DECREF(messages);
+            return NULL;
+        }
+        return messages;
+    }
+
     PyObject * pysite_create([[maybe_unused]] PyObject *self, PyObject *args)
     {
         PyObject *pysite;
@@ -9,6 +9,9 @@ namespace sites {
     void pysite_delete(PyObject *pysite);
     PyObject * pysite_create(PyObject *self, PyObject *args);
     PyObject * pyfdsite_create(PyObject *self, PyObject *args);
+    PyObject * pystatussite_create(PyObject *self, PyObject *args);
+    PyObject * pystatussite_fd(PyObject *self, PyObject *args);
+    PyObject * pystatussite_read(PyObject *self, PyObject *args);
     IFractalSite * site_fromcapsule(PyObject *pysite);
 }
 
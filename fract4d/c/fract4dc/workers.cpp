@@ -8,6 +8,7 @@
 #include "fract4dc/sites.h"
 
 #include "model/worker.h"
+#include "model/workerpool.h"
 #include "model/image.h"
 #include "model/vectors.h"
 
@@ -138,6 +139,45 @@ namespace workers {
             ok, root[0], root[1], root[2], root[3]);
     }
 
+    PyObject * pool_idle_count([[maybe_unused]] PyObject *self, [[maybe_unused]] PyObject *args)
+    {
+        return Py_BuildValue("i", WorkerPool::instance().idle_count());
+    }
+
+    PyObject * pool_clear([[maybe_unused]] PyObject *self, [[maybe_unused]] PyObject *args)
+    {
+        Py_BEGIN_ALLOW_THREADS
+        WorkerPool::instance().clear();
+        Py_END_ALLOW_THREADS
+
+        Py_INCREF(Py_None);
+        return Py_None;
+    }
+
+    PyObject * pool_thread_stats([[maybe_unused]] PyObject *self, [[maybe_unused]] PyObject *args)
+    {
+        const std::vector<tpool_thread_stats> stats = WorkerPool::instance().last_thread_stats();
+        PyObject *pyret = PyList_New(stats.size());
+        if (!pyret)
+        {
+            return NULL;
+        }
+        for (size_t i = 0; i < stats.size(); ++i)
+        {
+            const tpool_thread_stats &s = stats[i];
+            PyObject *pystat = Py_BuildValue(
+                "(ddlll)",
+                s.busy_seconds, s.idle_seconds, s.jobs, s.steals, s.splits);
+            if (!pystat)
+            {
+                Py_DECREF(pyret);
+                return NULL;
+            }
+            PyList_SET_ITEM(pyret, i, pystat);
+        }
+        return pyret;
+    }
+
 }
 
 
@@ -13,6 +13,9 @@ namespace workers {
     PyObject * fw_pixel(PyObject *self, PyObject *args);
     PyObject * fw_pixel_aa(PyObject *self, PyObject *args);
     PyObject * fw_find_root(PyObject *self, PyObject *args);
+    PyObject * pool_idle_count(PyObject *self, PyObject *args);
+    PyObject * pool_clear(PyObject *self, PyObject *args);
+    PyObject * pool_thread_stats(PyObject *self, PyObject *args);
 }
 
 #endif
\ No newline at end of file
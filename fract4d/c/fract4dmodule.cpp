@@ -71,6 +71,12 @@ pf_calc(PyObject *self, PyObject *args)
     return loaders::pf_calc(self, args);
 }
 
+static PyObject *
+pf_calc_batch(PyObject *self, PyObject *args)
+{
+    return loaders::pf_calc_batch(self, args);
+}
+
 /*
  * cmaps
  */
@@ -128,6 +134,21 @@ static PyObject * pyfdsite_create(PyObject *self, PyObject *args)
     return sites::pyfdsite_create(self, args);
 }
 
+static PyObject * pystatussite_create(PyObject *self, PyObject *args)
+{
+    return sites::pystatussite_create(self, args);
+}
+
+static PyObject * pystatussite_fd(PyObject *self, PyObject *args)
+{
+    return sites::pystatussite_fd(self, args);
+}
+
+static PyObject * pystatussite_read(PyObject *self, PyObject *args)
+{
+    return sites::pystatussite_read(self, args);
+}
+
 
 /*
 * calcs
@@ -147,6 +168,12 @@ pycalc(PyObject *self, PyObject *args, PyObject *kwds)
     return calcs::pycalc(self, args, kwds);
 }
 
+static PyObject *
+pyrecolor(PyObject *self, PyObject *args)
+{
+    return calcs::pyrecolor(self, args);
+}
+
 
 /*
 * images
@@ -188,6 +215,18 @@ image_clear(PyObject *self, PyObject *args)
     return images::image_clear(self, args);
 }
 
+static PyObject *
+image_shift(PyObject *self, PyObject *args)
+{
+    return images::image_shift(self, args);
+}
+
+static PyObject *
+image_rescale(PyObject *self, PyObject *args)
+{
+    return images::image_rescale(self, args);
+}
+
 static PyObject *
 image_writer_create(PyObject *self, PyObject *args)
 {
@@ -271,6 +310,24 @@ fw_find_root(PyObject *self, PyObject *args)
     return workers::fw_find_root(self, args);
 }
 
+static PyObject *
+pool_idle_count(PyObject *self, PyObject *args)
+{
+    return workers::pool_idle_count(self, args);
+}
+
+static PyObject *
+pool_clear(PyObject *self, PyObject *args)
+{
+    return workers::pool_clear(self, args);
+}
+
+static PyObject *
+pool_thread_stats(PyObject *self, PyObject *args)
+{
+    return workers::pool_thread_stats(self, args);
+}
+
 
 /*
 * functions
@@ -506,13 +563,15 @@ static PyMethodDef PfMethods[] = {
      "Init a point function"},
     {"pf_calc", pf_calc, METH_VARARGS,
      "Calculate one point"},
+    {"pf_calc_batch", pf_calc_batch, METH_VARARGS,
+     "Calculate a list of points with one call"},
     {"pf_defaults", pf_defaults, METH_VARARGS,
      "Get defaults for this formula"},
 
     {"cmap_create", cmap_create, METH_VARARGS,
      "Create a new colormap"},
     {"cmap_create_gradient", cmap_create_gradient, METH_VARARGS,
-     "Create a new gradient-based colormap"},
+     "Create a new gradient-based colormap, optionally approximated by a lookup table"},
     {"cmap_lookup", cmap_pylookup, METH_VARARGS,
      "Get a color tuple from a distance value"},
     {"cmap_lookup_flags", cmap_pylookup_with_flags, METH_VARARGS,
@@ -539,6 +598,10 @@ static PyMethodDef PfMethods[] = {
      "get a tuple containing image's dimensions"},
     {"image_clear", image_clear, METH_VARARGS,
      "Clear all iteration and color data from image"},
+    {"image_shift", image_shift, METH_VARARGS,
+     "Move image data for a view which has moved by whole pixels"},
+    {"image_rescale", image_rescale, METH_VARARGS,
+     "Keep the pixels of a zoomed view which land exactly on old ones"},
 
     {"image_writer_create", image_writer_create, METH_VARARGS,
      "create an object used to write image to disk"},
@@ -570,6 +633,12 @@ static PyMethodDef PfMethods[] = {
      "Create a new site"},
     {"fdsite_create", pyfdsite_create, METH_VARARGS,
      "Create a new file-descriptor site"},
+    {"statussite_create", pystatussite_create, METH_NOARGS,
+     "Create a site which keeps the latest updates for statussite_read"},
+    {"statussite_fd", pystatussite_fd, METH_VARARGS,
+     "Get the file descriptor which becomes readable when a status site has updates"},
+    {"statussite_read", pystatussite_read, METH_VARARGS,
+     "Get a status site's updates since the last read, as a list of (type, payload)"},
 
     {"ff_create", ff_create, METH_VARARGS,
      "Create a fractFunc."},
@@ -587,12 +656,22 @@ static PyMethodDef PfMethods[] = {
     {"fw_find_root", fw_find_root, METH_VARARGS,
      "Find closest root considering fractal function along a vector"},
 
+    {"pool_idle_count", pool_idle_count, METH_NOARGS,
+     "Get the number of idle workers kept for reuse between calculations"},
+    {"pool_clear", pool_clear, METH_NOARGS,
+     "Stop and discard all idle workers kept for reuse"},
+    {"pool_thread_stats", pool_thread_stats, METH_NOARGS,
+     "Get (busy, idle, jobs, steals, splits) for each thread of the last multi-threaded calculation"},
+
     {"calc", (PyCFunction)pycalc, METH_VARARGS | METH_KEYWORDS,
      "Calculate a fractal image"},
 
     {"interrupt", pystop_calc, METH_VARARGS,
      "Stop an asynchronous calculation"},
 
+    {"recolor", pyrecolor, METH_VARARGS,
+     "Recolor a calculated image with a new colormap, without recalculating it"},
+
     {"rot_matrix", rot_matrix, METH_VARARGS,
      "Return a rotated and scaled identity matrix based on params"},
 
@@ -664,6 +743,7 @@ PyInit_fract4dc(void)
     PyModule_AddIntConstant(pymod, "AA_NONE", AA_NONE);
     PyModule_AddIntConstant(pymod, "AA_FAST", AA_FAST);
     PyModule_AddIntConstant(pymod, "AA_BEST", AA_BEST);
+    PyModule_AddIntConstant(pymod, "AA_ADAPTIVE", AA_ADAPTIVE);
 
     PyModule_AddIntConstant(pymod, "RENDER_TWO_D", RENDER_TWO_D);
     PyModule_AddIntConstant(pymod, "RENDER_LANDSCAPE", RENDER_LANDSCAPE);
@@ -671,6 +751,11 @@ PyInit_fract4dc(void)
 
     PyModule_AddIntConstant(pymod, "DRAW_GUESSING", DRAW_GUESSING);
     PyModule_AddIntConstant(pymod, "DRAW_TO_DISK", DRAW_TO_DISK);
+    PyModule_AddIntConstant(pymod, "DRAW_SUBDIVIDE", DRAW_SUBDIVIDE);
+
+    PyModule_AddIntConstant(pymod, "PRIORITY_BACKGROUND", PRIORITY_BACKGROUND);
+    PyModule_AddIntConstant(pymod, "PRIORITY_PREVIEW", PRIORITY_PREVIEW);
+    PyModule_AddIntConstant(pymod, "PRIORITY_INTERACTIVE", PRIORITY_INTERACTIVE);
 
     PyModule_AddIntConstant(pymod, "DELTA_X", DELTA_X);
     PyModule_AddIntConstant(pymod, "DELTA_Y", DELTA_Y);
@@ -684,6 +769,11 @@ PyInit_fract4dc(void)
     PyModule_AddIntConstant(pymod, "IMAGE_XOFFSET", 4);
     PyModule_AddIntConstant(pymod, "IMAGE_YOFFSET", 5);
 
+    /* image buffer consts */
+    PyModule_AddIntConstant(pymod, "IMAGE_BUFFERS_RGB", IMAGE_BUFFERS_RGB);
+    PyModule_AddIntConstant(pymod, "IMAGE_BUFFERS_RGB_ITER", IMAGE_BUFFERS_RGB_ITER);
+    PyModule_AddIntConstant(pymod, "IMAGE_BUFFERS_FULL", IMAGE_BUFFERS_FULL);
+
     /* image type consts */
     PyModule_AddIntConstant(pymod, "FILE_TYPE_TGA", FILE_TYPE_TGA);
     PyModule_AddIntConstant(pymod, "FILE_TYPE_PNG", FILE_TYPE_PNG);
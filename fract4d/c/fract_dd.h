@@ -0,0 +1,375 @@
+#ifndef FRACT_DD_H_
+#define FRACT_DD_H_
+
+/* double-double arithmetic.
+
+   A dd_real is the unevaluated sum of two doubles, hi + lo, with lo no
+   bigger than half an ulp of hi. That gives 106 bits of mantissa (about
+   32 decimal digits) with the exponent range of a double, at a cost of
+   roughly 10-20 floating-point operations per arithmetic operation.
+
+   Formulas compiled with the "double-double" precision option are
+   generated as C++ and use dd_real everywhere the usual code has a
+   double, so all they need is for the operators and math functions to
+   be overloaded. The basic arithmetic is inline here, the
+   transcendental functions are in fract_stdlib.cpp.
+
+   The algorithms are those of Hida, Li and Bailey's QD library.
+*/
+
+#include <math.h>
+
+struct dd_real
+{
+    double hi;
+    double lo;
+
+    // left uninitialized, like a double, so dd_real members don't stop
+    // the formula's struct being allocated with malloc
+    dd_real() = default;
+    dd_real(double h) : hi(h), lo(0.0) {}
+    dd_real(double h, double l) : hi(h), lo(l) {}
+
+    // rounded to the nearest double
+    explicit operator double() const { return hi; }
+
+    // truncated towards 0
+    explicit operator int() const
+    {
+        int i = static_cast<int>(hi);
+        if (hi == i && hi > 0.0 && lo < 0.0)
+        {
+            --i;
+        }
+        else if (hi == i && hi < 0.0 && lo > 0.0)
+        {
+            ++i;
+        }
+        return i;
+    }
+
+    // for if(x), meaning x != 0
+    explicit operator bool() const { return hi != 0.0; }
+
+    dd_real &operator+=(const dd_real &b);
+    dd_real &operator+=(double b);
+    dd_real &operator-=(const dd_real &b);
+    dd_real &operator-=(double b);
+    dd_real &operator*=(const dd_real &b);
+    dd_real &operator*=(double b);
+    dd_real &operator/=(const dd_real &b);
+    dd_real &operator/=(double b);
+};
+
+// error-free transformations: each returns a rounded result and puts the
+// rounding error in err
+
+// a + b, if |a| >= |b|
+inline double dd_quick_two_sum(double a, double b, double &err)
+{
+    double s = a + b;
+    err = b - (s - a);
+    return s;
+}
+
+inline double dd_two_sum(double a, double b, double &err)
+{
+    double s = a + b;
+    double bb = s - a;
+    err = (a - (s - bb)) + (b - bb);
+    return s;
+}
+
+inline double dd_two_prod(double a, double b, double &err)
+{
+    double p = a * b;
+#ifdef FP_FAST_FMA
+    err = fma(a, b, -p);
+#else
+    // Dekker's algorithm: split each factor into 26-bit halves whose
+    // products are exact
+    const double splitter = 134217729.0; // 2^27 + 1
+    double t = splitter * a;
+    double a_hi = t - (t - a);
+    double a_lo = a - a_hi;
+    t = splitter * b;
+    double b_hi = t - (t - b);
+    double b_lo = b - b_hi;
+    err = ((a_hi * b_hi - p) + a_hi * b_lo + a_lo * b_hi) + a_lo * b_lo;
+#endif
+    return p;
+}
+
+// arithmetic
+
+inline dd_real operator-(const dd_real &a)
+{
+    return dd_real(-a.hi, -a.lo);
+}
+
+inline dd_real operator+(const dd_real &a, const dd_real &b)
+{
+    double s2, t2;
+    double s1 = dd_two_sum(a.hi, b.hi, s2);
+    double t1 = dd_two_sum(a.lo, b.lo, t2);
+    s2 += t1;
+    s1 = dd_quick_two_sum(s1, s2, s2);
+    s2 += t2;
+    s1 = dd_quick_two_sum(s1, s2, s2);
+    return dd_real(s1, s2);
+}
+
+inline dd_real operator+(const dd_real &a, double b)
+{
+    double s2;
+    double s1 = dd_two_sum(a.hi, b, s2);
+    s2 += a.lo;
+    s1 = dd_quick_two_sum(s1, s2, s2);
+    return dd_real(s1, s2);
+}
+
+inline dd_real operator+(double a, const dd_real &b)
+{
+    return b + a;
+}
+
+inline dd_real operator-(const dd_real &a, const dd_real &b)
+{
+    return a + -b;
+}
+
+inline dd_real operator-(const dd_real &a, double b)
+{
+    return a + -b;
+}
+
+inline dd_real operator-(double a, const dd_real &b)
+{
+    return -b + a;
+}
+
+inline dd_real operator*(const dd_real &a, const dd_real &b)
+{
+    double p2;
+    double p1 = dd_two_prod(a.hi, b.hi, p2);
+    p2 += a.hi * b.lo + a.lo * b.hi;
+    p1 = dd_quick_two_sum(p1, p2, p2);
+    return dd_real(p1, p2);
+}
+
+inline dd_real operator*(const dd_real &a, double b)
+{
+    double p2;
+    double p1 = dd_two_prod(a.hi, b, p2);
+    p2 += a.lo * b;
+    p1 = dd_quick_two_sum(p1, p2, p2);
+    return dd_real(p1, p2);
+}
+
+inline dd_real operator*(double a, const dd_real &b)
+{
+    return b * a;
+}
+
+inline dd_real operator/(const dd_real &a, const dd_real &b)
+{
+    // long division, one double's worth of quotient at a time
+    double q1 = a.hi / b.hi;
+    dd_real r = a - b * q1;
+    double q2 = r.hi / b.hi;
+    r -= b * q2;
+    double q3 = r.hi / b.hi;
+    q1 = dd_quick_two_sum(q1, q2, q2);
+    return dd_real(q1, q2) + q3;
+}
+
+inline dd_real operator/(const dd_real &a, double b)
+{
+    double q1 = a.hi / b;
+    double p2;
+    double p1 = dd_two_prod(q1, b, p2);
+    double s2;
+    double s1 = dd_two_sum(a.hi, -p1, s2);
+    s2 -= p2;
+    s2 += a.lo;
+    double q2 = (s1 + s2) / b;
+    q1 = dd_quick_two_sum(q1, q2, q2);
+    return dd_real(q1, q2);
+}
+
+inline dd_real operator/(double a, const dd_real &b)
+{
+    return dd_real(a) / b;
+}
+
+inline dd_real &dd_real::operator+=(const dd_real &b) { return *this = *this + b; }
+inline dd_real &dd_real::operator+=(double b) { return *this = *this + b; }
+inline dd_real &dd_real::operator-=(const dd_real &b) { return *this = *this - b; }
+inline dd_real &dd_real::operator-=(double b) { return *this = *this - b; }
+inline dd_real &dd_real::operator*=(const dd_real &b) { return *this = *this * b; }
+inline dd_real &dd_real::operator*=(double b) { return *this = *this * b; }
+inline dd_real &dd_real::operator/=(const dd_real &b) { return *this = *this / b; }
+inline dd_real &dd_real::operator/=(double b) { return *this = *this / b; }
+
+// comparisons
+
+inline bool operator==(const dd_real &a, const dd_real &b) { return a.hi == b.hi && a.lo == b.lo; }
+inline bool operator==(const dd_real &a, double b) { return a.hi == b && a.lo == 0.0; }
+inline bool operator==(double a, const dd_real &b) { return b == a; }
+inline bool operator!=(const dd_real &a, const dd_real &b) { return !(a == b); }
+inline bool operator!=(const dd_real &a, double b) { return !(a == b); }
+inline bool operator!=(double a, const dd_real &b) { return !(b == a); }
+
+inline bool operator<(const dd_real &a, const dd_real &b) { return a.hi < b.hi || (a.hi == b.hi && a.lo < b.lo); }
+inline bool operator<(const dd_real &a, double b) { return a.hi < b || (a.hi == b && a.lo < 0.0); }
+inline bool operator<(double a, const dd_real &b) { return a < b.hi || (a == b.hi && b.lo > 0.0); }
+inline bool operator>(const dd_real &a, const dd_real &b) { return b < a; }
+inline bool operator>(const dd_real &a, double b) { return b < a; }
+inline bool operator>(double a, const dd_real &b) { return b < a; }
+inline bool operator<=(const dd_real &a, const dd_real &b) { return !(b < a); }
+inline bool operator<=(const dd_real &a, double b) { return !(b < a); }
+inline bool operator<=(double a, const dd_real &b) { return !(b < a); }
+inline bool operator>=(const dd_real &a, const dd_real &b) { return !(a < b); }
+inline bool operator>=(const dd_real &a, double b) { return !(a < b); }
+inline bool operator>=(double a, const dd_real &b) { return !(a < b); }
+
+// math functions. These overload the C library's, so formula code calls
+// them just as it would for doubles
+
+inline dd_real fabs(const dd_real &a)
+{
+    return a.hi < 0.0 ? -a : a;
+}
+
+inline dd_real floor(const dd_real &a)
+{
+    double hi = ::floor(a.hi);
+    double lo = 0.0;
+    if (hi == a.hi)
+    {
+        // hi is already an integer, so the fraction is all in lo
+        lo = ::floor(a.lo);
+        hi = dd_quick_two_sum(hi, lo, lo);
+    }
+    return dd_real(hi, lo);
+}
+
+inline dd_real ceil(const dd_real &a)
+{
+    double hi = ::ceil(a.hi);
+    double lo = 0.0;
+    if (hi == a.hi)
+    {
+        lo = ::ceil(a.lo);
+        hi = dd_quick_two_sum(hi, lo, lo);
+    }
+    return dd_real(hi, lo);
+}
+
+inline dd_real fmod(const dd_real &a, const dd_real &b)
+{
+    // like C's fmod, the quotient is truncated towards 0
+    dd_real n = a / b;
+    n = n.hi < 0.0 ? ceil(n) : floor(n);
+    return a - n * b;
+}
+
+inline dd_real sqrt(const dd_real &a)
+{
+    if (a.hi <= 0.0)
+    {
+        // 0, or a NaN for negative numbers, just as for doubles
+        return dd_real(::sqrt(a.hi));
+    }
+    // Karp's trick: one Newton step from the double square root
+    double x = 1.0 / ::sqrt(a.hi);
+    double ax = a.hi * x;
+    double err;
+    double ax2 = dd_two_prod(ax, ax, err);
+    double correction = (a - dd_real(ax2, err)).hi * (x * 0.5);
+    double s = dd_two_sum(ax, correction, err);
+    return dd_real(s, err);
+}
+
+// defined in fract_stdlib.cpp
+dd_real exp(const dd_real &a);
+dd_real log(const dd_real &a);
+dd_real sin(const dd_real &a);
+dd_real cos(const dd_real &a);
+dd_real atan2(const dd_real &y, const dd_real &x);
+
+// parse a decimal string such as "-0.7436438870371587047521915061" into
+// the nearest dd_real. Returns false if it isn't a number
+bool dd_parse(const char *s, dd_real *result);
+
+// the rest follow from those
+
+inline dd_real pow(const dd_real &a, const dd_real &b)
+{
+    if (a.hi <= 0.0)
+    {
+        // negative numbers to integer powers and so on: no better than a double
+        return dd_real(::pow(a.hi, b.hi));
+    }
+    return exp(b * log(a));
+}
+
+inline dd_real tan(const dd_real &a)
+{
+    return sin(a) / cos(a);
+}
+
+inline dd_real sinh(const dd_real &a)
+{
+    dd_real e = exp(a);
+    return (e - 1.0 / e) * 0.5;
+}
+
+inline dd_real cosh(const dd_real &a)
+{
+    dd_real e = exp(a);
+    return (e + 1.0 / e) * 0.5;
+}
+
+inline dd_real tanh(const dd_real &a)
+{
+    if (::fabs(a.hi) > 20.0)
+    {
+        // e^2a has overwhelmed the 1s
+        return dd_real(a.hi > 0.0 ? 1.0 : -1.0);
+    }
+    dd_real e2 = exp(a * 2.0);
+    return (e2 - 1.0) / (e2 + 1.0);
+}
+
+inline dd_real atan(const dd_real &a)
+{
+    return atan2(a, dd_real(1.0));
+}
+
+inline dd_real asin(const dd_real &a)
+{
+    return atan2(a, sqrt(1.0 - a * a));
+}
+
+inline dd_real acos(const dd_real &a)
+{
+    return atan2(sqrt(1.0 - a * a), a);
+}
+
+inline dd_real asinh(const dd_real &a)
+{
+    return log(a + sqrt(a * a + 1.0));
+}
+
+inline dd_real acosh(const dd_real &a)
+{
+    return log(a + sqrt(a * a - 1.0));
+}
+
+inline dd_real atanh(const dd_real &a)
+{
+    return log((1.0 + a) / (1.0 - a)) * 0.5;
+}
+
+#endif /* FRACT_DD_H_ */
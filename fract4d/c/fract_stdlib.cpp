@@ -2,6 +2,7 @@
 #include <cstdlib>
 #include <new>
 #include <algorithm>
+#include <cctype>
 
 #include "fract_stdlib.h"
 
@@ -352,3 +353,248 @@ ARRAY_GET_T(array_get_int, int)
 ARRAY_GET_T(array_get_double, double)
 ARRAY_SET_T(array_set_int, int)
 ARRAY_SET_T(array_set_double, double)
+
+// double-double math functions, for formulas compiled with that precision
+
+namespace {
+    const dd_real DD_LN2(6.931471805599452862e-01, 2.319046813846299558e-17);
+    const dd_real DD_PI_2(1.570796326794896558e+00, 6.123233995736766036e-17);
+    const dd_real DD_PI(3.141592653589793116e+00, 1.224646799147353207e-16);
+    const dd_real DD_2PI(6.283185307179586232e+00, 2.449293598294706414e-16);
+    const double DD_EPS = 4.93038065763132e-32; // 2^-104
+
+    inline dd_real dd_ldexp(const dd_real &a, int exp)
+    {
+        return dd_real(std::ldexp(a.hi, exp), std::ldexp(a.lo, exp));
+    }
+
+    inline dd_real dd_nint(const dd_real &a)
+    {
+        return floor(a + 0.5);
+    }
+
+    // sin and cos of t, for |t| <= pi/4
+    void dd_sincos_taylor(const dd_real &t, dd_real *sin_t, dd_real *cos_t)
+    {
+        if (t.hi == 0.0)
+        {
+            *sin_t = 0.0;
+            *cos_t = 1.0;
+            return;
+        }
+        const double threshold = 0.5 * std::fabs(t.hi) * DD_EPS;
+        const dd_real t2 = t * t;
+        dd_real term = t;
+        dd_real s = t;
+        double n = 1.0;
+        do
+        {
+            term = -term * t2 / ((n + 1.0) * (n + 2.0));
+            s += term;
+            n += 2.0;
+        } while (std::fabs(term.hi) > threshold);
+        *sin_t = s;
+        // cos is at least 0.7 here, so this loses nothing
+        *cos_t = sqrt(1.0 - s * s);
+    }
+
+    // reduce a to t + j * pi/2 with |t| <= pi/4 and work out its sin and cos
+    void dd_sincos(const dd_real &a, dd_real *sin_a, dd_real *cos_a)
+    {
+        const dd_real r = a - DD_2PI * dd_nint(a / DD_2PI);
+        const double j = std::floor(r.hi / DD_PI_2.hi + 0.5);
+        const dd_real t = r - DD_PI_2 * j;
+        dd_real s, c;
+        dd_sincos_taylor(t, &s, &c);
+        switch (static_cast<int>(j))
+        {
+        case 0:
+            *sin_a = s;
+            *cos_a = c;
+            break;
+        case 1:
+            *sin_a = c;
+            *cos_a = -s;
+            break;
+        case -1:
+            *sin_a = -c;
+            *cos_a = s;
+            break;
+        default: // +-2
+            *sin_a = -s;
+            *cos_a = -c;
+            break;
+        }
+    }
+}
+
+dd_real exp(const dd_real &a)
+{
+    if (a.hi <= -709.0)
+    {
+        return 0.0;
+    }
+    if (a.hi >= 709.0)
+    {
+        return HUGE_VAL;
+    }
+    // exp(a) = 2^m * exp(r)^512, where a = m * ln 2 + 512 * r
+    const double k = 512.0;
+    const double m = std::floor(a.hi / DD_LN2.hi + 0.5);
+    const dd_real r = (a - DD_LN2 * m) / k;
+
+    // Taylor series for exp(r) - 1, which is tiny, so keep it that way
+    // while squaring to avoid losing the low bits against the 1
+    const double threshold = std::fabs(r.hi) * DD_EPS / k;
+    dd_real term = r;
+    dd_real s = r;
+    double n = 1.0;
+    do
+    {
+        n += 1.0;
+        term = term * r / n;
+        s += term;
+    } while (std::fabs(term.hi) > threshold);
+
+    // (1 + s)^2 - 1 = 2s + s^2, 9 times over
+    for (int i = 0; i < 9; ++i)
+    {
+        s = s * 2.0 + s * s;
+    }
+    return dd_ldexp(s + 1.0, static_cast<int>(m));
+}
+
+dd_real log(const dd_real &a)
+{
+    if (a.hi <= 0.0)
+    {
+        // -inf or NaN, as for doubles
+        return std::log(a.hi);
+    }
+    if (a == 1.0)
+    {
+        return 0.0;
+    }
+    // one Newton step from the double log: x' = x + a * exp(-x) - 1
+    const dd_real x = std::log(a.hi);
+    return x + a * exp(-x) - 1.0;
+}
+
+dd_real sin(const dd_real &a)
+{
+    dd_real s, c;
+    dd_sincos(a, &s, &c);
+    return s;
+}
+
+dd_real cos(const dd_real &a)
+{
+    dd_real s, c;
+    dd_sincos(a, &s, &c);
+    return c;
+}
+
+dd_real atan2(const dd_real &y, const dd_real &x)
+{
+    if (x.hi == 0.0 || y.hi == 0.0)
+    {
+        if (y.hi == 0.0)
+        {
+            return x.hi < 0.0 ? DD_PI : dd_real(std::atan2(y.hi, x.hi));
+        }
+        return y.hi > 0.0 ? DD_PI_2 : -DD_PI_2;
+    }
+    // one Newton step from the double atan2, on whichever of sin and cos
+    // is better conditioned
+    const dd_real r = sqrt(x * x + y * y);
+    const dd_real xx = x / r;
+    const dd_real yy = y / r;
+    dd_real z = std::atan2(y.hi, x.hi);
+    dd_real sin_z, cos_z;
+    dd_sincos(z, &sin_z, &cos_z);
+    if (std::fabs(xx.hi) > std::fabs(yy.hi))
+    {
+        z += (yy - sin_z) / cos_z;
+    }
+    else
+    {
+        z -= (xx - cos_z) / sin_z;
+    }
+    return z;
+}
+
+bool dd_parse(const char *s, dd_real *result)
+{
+    const char *p = s;
+    while (std::isspace(static_cast<unsigned char>(*p)))
+    {
+        ++p;
+    }
+    bool negative = false;
+    if (*p == '-' || *p == '+')
+    {
+        negative = (*p == '-');
+        ++p;
+    }
+
+    // accumulate the digits as an integer, remembering where the point was
+    dd_real r = 0.0;
+    int exponent = 0;
+    bool seen_digit = false, seen_point = false;
+    for (; *p; ++p)
+    {
+        if (std::isdigit(static_cast<unsigned char>(*p)))
+        {
+            r = r * 10.0 + static_cast<double>(*p - '0');
+            seen_digit = true;
+            if (seen_point)
+            {
+                --exponent;
+            }
+        }
+        else if (*p == '.' && !seen_point)
+        {
+            seen_point = true;
+        }
+        else
+        {
+            break;
+        }
+    }
+    if (!seen_digit)
+    {
+        return false;
+    }
+    if (*p == 'e' || *p == 'E')
+    {
+        char *end = nullptr;
+        exponent += static_cast<int>(std::strtol(p + 1, &end, 10));
+        if (end == p + 1)
+        {
+            return false;
+        }
+        p = end;
+    }
+    while (std::isspace(static_cast<unsigned char>(*p)))
+    {
+        ++p;
+    }
+    if (*p != '\0')
+    {
+        return false;
+    }
+
+    // scale by 10^exponent, squaring our way up to it
+    dd_real scale = 1.0, power = 10.0;
+    for (int e = std::abs(exponent); e > 0; e >>= 1)
+    {
+        if (e & 1)
+        {
+            scale *= power;
+        }
+        power *= power;
+    }
+    r = exponent < 0 ? r / scale : r * scale;
+    *result = negative ? -r : r;
+    return true;
+}
@@ -57,6 +57,70 @@ extern "C"
 
 #ifdef __cplusplus
 }
+
+#include "fract_dd.h"
+
+// overloads for formulas compiled with double-double precision. Colors,
+// images and arrays are only ever double precision
+
+inline void fract_rand(dd_real *re, dd_real *im)
+{
+    double d_re, d_im;
+    fract_rand(&d_re, &d_im);
+    *re = d_re;
+    *im = d_im;
+}
+
+// the arena is passed as the void * in pf_obj, which C++ won't convert
+inline void *alloc_array1D(void *arena, int element_size, int size)
+{
+    return alloc_array1D(static_cast<arena_t>(arena), element_size, size);
+}
+
+inline void *alloc_array2D(void *arena, int element_size, int xsize, int ysize)
+{
+    return alloc_array2D(static_cast<arena_t>(arena), element_size, xsize, ysize);
+}
+
+inline void *alloc_array3D(void *arena, int element_size, int xsize, int ysize, int zsize)
+{
+    return alloc_array3D(static_cast<arena_t>(arena), element_size, xsize, ysize, zsize);
+}
+
+inline void *alloc_array4D(void *arena, int element_size, int xsize, int ysize, int zsize, int wsize)
+{
+    return alloc_array4D(static_cast<arena_t>(arena), element_size, xsize, ysize, zsize, wsize);
+}
+
+inline int write_float_array_1D(void *array, int x, dd_real val)
+{
+    return write_float_array_1D(array, x, val.hi);
+}
+
+inline int write_float_array_2D(void *array, int x, int y, dd_real val)
+{
+    return write_float_array_2D(array, x, y, val.hi);
+}
+
+inline void image_lookup(
+    void *im, dd_real x, dd_real y, dd_real *pr, dd_real *pg, dd_real *pb)
+{
+    double r, g, b;
+    image_lookup(im, x.hi, y.hi, &r, &g, &b);
+    *pr = r;
+    *pg = g;
+    *pb = b;
+}
+
+inline void gradient(
+    void *grad_object, dd_real index, dd_real *r, dd_real *g, dd_real *b)
+{
+    double d_r, d_g, d_b;
+    gradient(grad_object, index.hi, &d_r, &d_g, &d_b);
+    *r = d_r;
+    *g = d_g;
+    *b = d_b;
+}
 #endif
 
 #endif
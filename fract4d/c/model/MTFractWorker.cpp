@@ -20,14 +20,42 @@ MTFractWorker::MTFractWorker(
     m_workers.reserve(numWorkers);
     for (int i = 0; i < numWorkers; ++i)
     {
-        m_workers.emplace_back(pfo, cmap, im, site);
+        m_workers.emplace_back(i == 0 ? pfo : clone_formula(pfo), cmap, im, site);
     }
     if (numThreads > 1)
     {
-        m_threads = std::make_unique<tpool<job_info_t, STFractWorker>>(numThreads, 1000, &m_workers[0]);
+        // the pool threads get workers 1..n to themselves, leaving 0 for this thread
+        m_threads = std::make_unique<tpool<job_info_t, STFractWorker>>(numThreads, 1000, &m_workers[1]);
     }
 }
 
+MTFractWorker::~MTFractWorker()
+{
+    // stop the threads before taking their formulas away
+    m_threads.reset();
+    kill_clones();
+}
+
+pf_obj *MTFractWorker::clone_formula(pf_obj *pfo)
+{
+    pf_obj *clone = pfo->vtbl->clone ? pfo->vtbl->clone(pfo) : nullptr;
+    if (!clone)
+    {
+        return pfo;
+    }
+    m_clones.push_back(clone);
+    return clone;
+}
+
+void MTFractWorker::kill_clones()
+{
+    for (auto clone: m_clones)
+    {
+        clone->vtbl->kill(clone);
+    }
+    m_clones.clear();
+}
+
 void MTFractWorker::set_context(IWorkerContext *context)
 {
     for (auto& worker: m_workers)
@@ -36,15 +64,44 @@ void MTFractWorker::set_context(IWorkerContext *context)
     }
 }
 
-void MTFractWorker::row_aa(int y, int n)
+void MTFractWorker::rebind(pf_obj *pfo, ColorMap *cmap, IImage *im, IFractalSite *site)
+{
+    // the threads are idle between calculations, so it's safe to
+    // swap their targets from underneath them
+    kill_clones();
+    for (size_t i = 0; i < m_workers.size(); ++i)
+    {
+        m_workers[i].rebind(i == 0 ? pfo : clone_formula(pfo), cmap, im, site);
+    }
+    if (m_threads)
+    {
+        m_threads->reset_stats();
+    }
+}
+
+int MTFractWorker::num_threads() const
+{
+    return static_cast<int>(m_workers.size()) - 1;
+}
+
+std::vector<tpool_thread_stats> MTFractWorker::thread_stats() const
+{
+    if (!m_threads)
+    {
+        return std::vector<tpool_thread_stats>();
+    }
+    return m_threads->thread_stats();
+}
+
+void MTFractWorker::row_aa(int x, int y, int n)
 {
     if (m_threads && n > 8)
     {
-        send_row_aa(y, n);
+        send_row_aa(x, y, n);
     }
     else
     {
-        m_workers[0].row_aa(y, n);
+        m_workers[0].row_aa(x, y, n);
     }
 }
 
@@ -84,6 +141,32 @@ void MTFractWorker::qbox_row(int w, int y, int rsize, int drawsize)
     }
 }
 
+void MTFractWorker::rect(int x, int y, int w, int h)
+{
+    if (m_threads)
+    {
+        // divide it here until the parts are small enough to share out,
+        // so a flat area is filled in whole however big it is
+        m_workers[0].rect(x, y, w, h, this);
+    }
+    else
+    {
+        m_workers[0].rect(x, y, w, h);
+    }
+}
+
+void MTFractWorker::subdivide(int x, int y, int w, int h)
+{
+    if (m_threads)
+    {
+        send_subdivide(x, y, w, h);
+    }
+    else
+    {
+        m_workers[0].subdivide(x, y, w, h);
+    }
+}
+
 void MTFractWorker::reset_counts()
 {
     for (auto& worker: m_workers) {
@@ -124,7 +207,8 @@ void MTFractWorker::send_row(int x, int y, int w)
 void MTFractWorker::send_box_row(int w, int y, int rsize)
 {
     //cout << "sent BXR" << y << "\n";
-    send_cmd(JOB_BOX_ROW, w, y, rsize);
+    // boxes starting anywhere in [0, w-rsize) - the scheduler may split that range
+    send_cmd(JOB_BOX_ROW, 0, y, rsize, w - rsize);
 }
 
 void MTFractWorker::send_qbox_row(int w, int y, int rsize, int drawsize)
@@ -139,10 +223,16 @@ void MTFractWorker::send_box(int x, int y, int rsize)
     send_cmd(JOB_BOX, x, y, rsize);
 }
 
-void MTFractWorker::send_row_aa(int y, int w)
+void MTFractWorker::send_subdivide(int x, int y, int w, int h)
+{
+    //cout << "sent SUB" << y << "\n";
+    send_cmd(JOB_SUBDIVIDE, x, y, w, h);
+}
+
+void MTFractWorker::send_row_aa(int x, int y, int w)
 {
     //cout << "sent RAA" << y << "\n";
-    send_cmd(JOB_ROW_AA, 0, y, w);
+    send_cmd(JOB_ROW_AA, x, y, w);
 }
 
 void MTFractWorker::flush()
@@ -152,3 +242,13 @@ void MTFractWorker::flush()
         m_threads->flush();
     }
 }
+
+bool MTFractWorker::flush_for(double seconds)
+{
+    return !m_threads || m_threads->flush_for(seconds);
+}
+
+bool MTFractWorker::queues_jobs() const
+{
+    return static_cast<bool>(m_threads);
+}
@@ -1,7 +1,9 @@
 #include <cstdio>
 #include <cstdlib>
 #include <utility>
+#include <algorithm>
 #include <cassert>
+#include <vector>
 
 #include "model/worker.h"
 
@@ -16,11 +18,22 @@
 void STFractWorker::set_context(IWorkerContext *context)
 {
     m_context = context;
+    m_pf.set_reference_orbit(context->get_reference_orbit());
+}
+
+void STFractWorker::rebind(pf_obj *pfo, ColorMap *cmap, IImage *im, IFractalSite *site)
+{
+    m_site = site;
+    m_im = im;
+    m_pf = pointFunc(pfo, cmap);
+    m_lastPointIters = 0;
+    m_stats.reset();
 }
 
 /* we're in a worker thread */
 void STFractWorker::work(job_info_t &tdata)
 {
+    m_context->wait_turn();
     if (m_context->try_finished_cond())
     {
         // interrupted - just return without doing anything
@@ -43,12 +56,12 @@ void STFractWorker::work(job_info_t &tdata)
         break;
     case JOB_BOX_ROW:
         //printf("BXR(%d,%d,%d) [%x]\n",x,y,param,(unsigned int)pthread_self());
-        box_row(tdata.x, tdata.y, tdata.param);
+        box_span(tdata.x, tdata.param2, tdata.y, tdata.param);
         nRows = tdata.param;
         break;
     case JOB_ROW_AA:
         //printf("RAA(%d,%d,%d) [%x]\n",x,y,param,(unsigned int)pthread_self());
-        row_aa(tdata.y, tdata.param);
+        row_aa(tdata.x, tdata.y, tdata.param);
         nRows = 1;
         break;
     case JOB_QBOX_ROW:
@@ -56,19 +69,73 @@ void STFractWorker::work(job_info_t &tdata)
         qbox_row(tdata.x, tdata.y, tdata.param, tdata.param2);
         nRows = tdata.param;
         break;
+    case JOB_SUBDIVIDE:
+        //printf("SUB(%d,%d,%d,%d) [%x]\n",x,y,param,param2,(unsigned int)pthread_self());
+        subdivide(tdata.x, tdata.y, tdata.param, tdata.param2);
+        nRows = tdata.param2;
+        break;
     default:
         printf("Unknown job id %d ignored\n", static_cast<int>(tdata.job));
     }
-    m_context->image_changed(0, tdata.y, m_im->Xres(), tdata.y + nRows);
+    m_context->rows_changed(tdata.y, tdata.y + nRows);
     const float new_progress = static_cast<float>(tdata.y) / static_cast<float>(m_im->Yres());
     m_context->progress_changed(new_progress);
 }
 
-void STFractWorker::row_aa(int y, int w)
+bool STFractWorker::split_job(job_info_t &job, job_info_t &rest)
+{
+    // the halves must cover exactly the pixels the whole job would have,
+    // so each pixel is still calculated by only one thread
+    switch (job.job)
+    {
+    case JOB_ROW:
+    case JOB_ROW_AA:
+    {
+        if (job.param < 2 * tpool_traits<job_info_t, STFractWorker>::MIN_SPLIT_PIXELS)
+        {
+            return false;
+        }
+        const int half = job.param / 2;
+        rest = job;
+        rest.x = job.x + half;
+        rest.param = job.param - half;
+        job.param = half;
+        return true;
+    }
+    case JOB_BOX_ROW:
+    {
+        // boxes overlap by 1 pixel, so start positions are rsize-1 apart
+        const int step = job.param - 1;
+        const int nBoxes = (job.param2 - job.x + step - 1) / step;
+        if (nBoxes < 2)
+        {
+            return false;
+        }
+        const int split_x = job.x + (nBoxes / 2) * step;
+        // the column shared by the boxes either side of the split would
+        // otherwise be calculated by both halves at once. Do it now, the
+        // same way the left-hand box would have done
+        for (auto y2 = job.y; y2 < job.y + job.param; ++y2)
+        {
+            pixel(split_x, y2, 1, 1);
+        }
+        rest = job;
+        rest.x = split_x;
+        job.param2 = split_x;
+        return true;
+    }
+    default:
+        // qbox rows are cheap and rectangles divide themselves as they
+        // go: keep those whole
+        return false;
+    }
+}
+
+void STFractWorker::row_aa(int x, int y, int n)
 {
-    for (auto x = 0; x < w; ++x)
+    for (auto i = x; i < x + n; ++i)
     {
-        pixel_aa(x, y);
+        pixel_aa(i, y);
     }
 }
 
@@ -100,12 +167,91 @@ inline void STFractWorker::periodSet(int ppos)
 
 void STFractWorker::row(int x, int y, int n)
 {
+#ifndef DEBUG_PIXEL
+    if (m_pf.has_batch() && m_context->get_options().render_type == RENDER_TWO_D)
+    {
+        for (auto i = 0; i < n; i += pointFunc::BATCH_SIZE)
+        {
+            row_batch(x + i, y, std::min(n - i, static_cast<int>(pointFunc::BATCH_SIZE)));
+        }
+        return;
+    }
+#endif
     for (auto i = 0; i < n; ++i)
     {
         pixel(x + i, y, 1, 1);
     }
 }
 
+// calculate up to BATCH_SIZE pixels of a row with a single call into the formula.
+// Gives the same results as calling pixel() on each in turn
+void STFractWorker::row_batch(int x, int y, int n)
+{
+    const calc_options &options = m_context->get_options();
+    const fract_geometry &geometry = m_context->get_geometry();
+    double xs[pointFunc::BATCH_SIZE], ys[pointFunc::BATCH_SIZE];
+    double zs[pointFunc::BATCH_SIZE], ws[pointFunc::BATCH_SIZE];
+    int px[pointFunc::BATCH_SIZE];
+    double *states[pointFunc::BATCH_SIZE];
+    rgba_t colors[pointFunc::BATCH_SIZE];
+    int iters[pointFunc::BATCH_SIZE];
+    float indexes[pointFunc::BATCH_SIZE];
+    fate_t fates[pointFunc::BATCH_SIZE];
+    // gather the pixels which still need calculating, recolor the rest
+    int count = 0;
+    for (auto i = x; i < x + n; ++i)
+    {
+        if (m_im->getFate(i, y, 0) != FATE_UNKNOWN)
+        {
+            pixel(i, y, 1, 1);
+            continue;
+        }
+        const dvec4 pos = geometry.vec_for_point_2d(i, y);
+        xs[count] = pos.n[VX];
+        ys[count] = pos.n[VY];
+        zs[count] = pos.n[VZ];
+        ws[count] = pos.n[VW];
+        px[count] = i;
+        states[count] = m_im->getState(i, y);
+        if (states[count] && states[count][0] != 0.0)
+        {
+            ++m_stats.s[PIXELS_RESUMED];
+        }
+        ++count;
+    }
+    if (count == 0)
+    {
+        return;
+    }
+    m_pf.calc_batch(
+        count,
+        xs, ys, zs, ws,
+        options.maxiter,
+        options.periodicity, m_lastPointIters, options.period_tolerance,
+        options.warp_param,
+        px, y, 0,
+        states,
+        colors, iters, indexes, fates);
+    // scatter the results, keeping the period guess in step for the
+    // stats calculations just as the one-pixel-at-a-time path does
+    for (auto j = 0; j < count; ++j)
+    {
+        const dvec4 pos(xs[j], ys[j], zs[j], ws[j]);
+        compute_stats(pos, iters[j], fates[j], px[j], y);
+        periodSet(iters[j]);
+        if (m_context->get_debug_flags() & DEBUG_DRAWING_STATS)
+        {
+            printf("pixel %d %d %d %d\n", px[j], y, fates[j], iters[j]);
+        }
+        // the formula only gives up on a point when we're stopping
+        assert(fates[j] != FATE_UNKNOWN || m_context->try_finished_cond());
+        m_im->setIter(px[j], y, iters[j]);
+        m_im->setFate(px[j], y, 0, fates[j]);
+        m_im->setIndex(px[j], y, 0, indexes[j]);
+        m_im->put(px[j], y, colors[j]);
+    }
+}
+
 void STFractWorker::reset_counts()
 {
     m_stats.reset();
@@ -123,6 +269,12 @@ inline int STFractWorker::Pixel2INT(int x, int y)
 
 inline bool STFractWorker::isTheSame(int targetIter, int targetCol, int x, int y)
 {
+    if (m_im->buffers() == IMAGE_BUFFERS_RGB)
+    {
+        // colors alone can't show an area is flat: where the gradient
+        // saturates, the edges of a box can all match around detail
+        return false;
+    }
     // does this point have the target # of iterations?
     // does it have the same colour too?
     if ((m_im->getIter(x, y) == targetIter) && (Pixel2INT(x, y) == targetCol)) {
@@ -131,11 +283,17 @@ inline bool STFractWorker::isTheSame(int targetIter, int targetCol, int x, int y
     return false;
 }
 
-rgba_t STFractWorker::antialias(int x, int y)
+rgba_t STFractWorker::antialias(int x, int y, rgba_t *samples)
 {
     const calc_options &options = m_context->get_options();
     const fract_geometry &geometry = m_context->get_geometry();
-    const dvec4 topleft = geometry.vec_for_point_2d_aa(x, y);
+    // double-double formulas get each subpixel's position calculated
+    // precisely, the rest step from one to the next
+    const bool precise = m_pf.is_precise();
+    dvec4 pos_lo(0.0);
+    const dvec4 topleft = precise ?
+        geometry.precise_vec_for_point_2d_aa(x, y, pos_lo) :
+        geometry.vec_for_point_2d_aa(x, y);
     dvec4 pos = topleft;
     rgba_t ptmp;
     unsigned int pixel_r_val = 0, pixel_g_val = 0, pixel_b_val = 0;
@@ -161,7 +319,8 @@ rgba_t STFractWorker::antialias(int x, int y)
             checkPeriod, options.period_tolerance,
             options.warp_param,
             x, y, 1,
-            &ptmp, &p, &index, &fate);
+            &ptmp, &p, &index, &fate,
+            pos_lo.n);
         m_im->setFate(x, y, 0, fate);
         m_im->setIndex(x, y, 0, index);
     }
@@ -170,6 +329,10 @@ rgba_t STFractWorker::antialias(int x, int y)
         fate = m_im->getFate(x, y, 0);
         ptmp = m_pf.recolor(m_im->getIndex(x, y, 0), fate, last);
     }
+    if (samples)
+    {
+        samples[0] = ptmp;
+    }
     pixel_r_val += ptmp.r;
     pixel_g_val += ptmp.g;
     pixel_b_val += ptmp.b;
@@ -177,13 +340,16 @@ rgba_t STFractWorker::antialias(int x, int y)
     fate = m_im->getFate(x, y, 1);
     if (fate == FATE_UNKNOWN)
     {
-        pos += geometry.delta_aa_x;
+        pos = precise ?
+            geometry.precise_vec_for_point_2d_aa(x + 0.5, y, pos_lo) :
+            pos + geometry.delta_aa_x;
         m_pf.calc(
             pos.n, options.maxiter,
             checkPeriod, options.period_tolerance,
             options.warp_param,
             x, y, 2,
-            &ptmp, &p, &index, &fate);
+            &ptmp, &p, &index, &fate,
+            pos_lo.n);
         m_im->setFate(x, y, 1, fate);
         m_im->setIndex(x, y, 1, index);
     }
@@ -191,6 +357,10 @@ rgba_t STFractWorker::antialias(int x, int y)
     {
         ptmp = m_pf.recolor(m_im->getIndex(x, y, 1), fate, last);
     }
+    if (samples)
+    {
+        samples[1] = ptmp;
+    }
     pixel_r_val += ptmp.r;
     pixel_g_val += ptmp.g;
     pixel_b_val += ptmp.b;
@@ -198,13 +368,16 @@ rgba_t STFractWorker::antialias(int x, int y)
     fate = m_im->getFate(x, y, 2);
     if (fate == FATE_UNKNOWN)
     {
-        pos = topleft + geometry.delta_aa_y;
+        pos = precise ?
+            geometry.precise_vec_for_point_2d_aa(x, y + 0.5, pos_lo) :
+            topleft + geometry.delta_aa_y;
         m_pf.calc(
             pos.n, options.maxiter,
             checkPeriod, options.period_tolerance,
             options.warp_param,
             x, y, 3,
-            &ptmp, &p, &index, &fate);
+            &ptmp, &p, &index, &fate,
+            pos_lo.n);
         m_im->setFate(x, y, 2, fate);
         m_im->setIndex(x, y, 2, index);
     }
@@ -212,6 +385,10 @@ rgba_t STFractWorker::antialias(int x, int y)
     {
         ptmp = m_pf.recolor(m_im->getIndex(x, y, 2), fate, last);
     }
+    if (samples)
+    {
+        samples[2] = ptmp;
+    }
     pixel_r_val += ptmp.r;
     pixel_g_val += ptmp.g;
     pixel_b_val += ptmp.b;
@@ -219,13 +396,16 @@ rgba_t STFractWorker::antialias(int x, int y)
     fate = m_im->getFate(x, y, 3);
     if (fate == FATE_UNKNOWN)
     {
-        pos = topleft + geometry.delta_aa_y + geometry.delta_aa_x;
+        pos = precise ?
+            geometry.precise_vec_for_point_2d_aa(x + 0.5, y + 0.5, pos_lo) :
+            topleft + geometry.delta_aa_y + geometry.delta_aa_x;
         m_pf.calc(
             pos.n, options.maxiter,
             checkPeriod, options.period_tolerance,
             options.warp_param,
             x, y, 4,
-            &ptmp, &p, &index, &fate);
+            &ptmp, &p, &index, &fate,
+            pos_lo.n);
         m_im->setFate(x, y, 3, fate);
         m_im->setIndex(x, y, 3, index);
     }
@@ -233,6 +413,10 @@ rgba_t STFractWorker::antialias(int x, int y)
     {
         ptmp = m_pf.recolor(m_im->getIndex(x, y, 3), fate, last);
     }
+    if (samples)
+    {
+        samples[3] = ptmp;
+    }
     pixel_r_val += ptmp.r;
     pixel_g_val += ptmp.g;
     pixel_b_val += ptmp.b;
@@ -242,6 +426,115 @@ rgba_t STFractWorker::antialias(int x, int y)
     return ptmp;
 }
 
+// running sums of the colors of some subpixels
+struct color_moments
+{
+    int n = 0;
+    double sum[3] = {0.0, 0.0, 0.0}, sum_sq[3] = {0.0, 0.0, 0.0};
+
+    void add(const rgba_t &color)
+    {
+        const double rgb[3] = {double(color.r), double(color.g), double(color.b)};
+        for (int i = 0; i < 3; ++i)
+        {
+            sum[i] += rgb[i];
+            sum_sq[i] += rgb[i] * rgb[i];
+        }
+        ++n;
+    }
+
+    // how far the average of the subpixels is likely to be from the
+    // pixel's true color: their variance over their number, averaged
+    // over the channels
+    double mean_variance() const
+    {
+        double variance = 0.0;
+        for (int i = 0; i < 3; ++i)
+        {
+            variance += sum_sq[i] / n - (sum[i] / n) * (sum[i] / n);
+        }
+        return variance / 3 / n;
+    }
+};
+
+// the order to sample a 3x3 or 4x4 grid of subpixels in, (i, j) pairs. Each
+// round of 3 or 4 is spread over the whole pixel, so whenever sampling stops
+// after a round the ones taken still cover the pixel evenly
+static const int aa_grid_order3[9][2] = {
+    {0, 0}, {1, 2}, {2, 1},
+    {0, 1}, {1, 0}, {2, 2},
+    {0, 2}, {1, 1}, {2, 0}};
+static const int aa_grid_order4[16][2] = {
+    {0, 0}, {2, 0}, {0, 2}, {2, 2},
+    {1, 1}, {3, 1}, {1, 3}, {3, 3},
+    {1, 0}, {3, 0}, {1, 2}, {3, 2},
+    {0, 1}, {2, 1}, {0, 3}, {2, 3}};
+
+rgba_t STFractWorker::antialias_adaptive(int x, int y)
+{
+    const calc_options &options = m_context->get_options();
+    rgba_t samples[4];
+    const rgba_t average = antialias(x, y, samples);
+    // an edge gets a 3x3 or 4x4 grid of subpixels in place of the 2x2
+    const int side = options.aa_samples == 16 ? 4 : options.aa_samples == 9 ? 3 : 0;
+    if (side == 0)
+    {
+        return average;
+    }
+
+    // sampling stops as soon as the average color is known closely enough,
+    // whether from the 2x2 or after any round of the grid
+    color_moments moments;
+    for (const auto &sample : samples)
+    {
+        moments.add(sample);
+    }
+    if (moments.mean_variance() <= options.aa_variance)
+    {
+        return average;
+    }
+
+    const fract_geometry &geometry = m_context->get_geometry();
+    const bool precise = m_pf.is_precise();
+    const int checkPeriod = periodGuess(m_im->getIter(x, y));
+    const int(*order)[2] = side == 4 ? aa_grid_order4 : aa_grid_order3;
+    // the grid's subpixels aren't kept in the image, so such pixels can't be
+    // recolored from the 4 it does keep
+    moments = color_moments();
+    for (int k = 0; k < side * side; ++k)
+    {
+        const int i = order[k][0], j = order[k][1];
+        const double dx = (i + 0.5) / side - 0.5;
+        const double dy = (j + 0.5) / side - 0.5;
+        dvec4 pos_lo(0.0);
+        const dvec4 pos = precise ?
+            geometry.precise_vec_for_point_2d(x + dx, y + dy, pos_lo) :
+            geometry.vec_for_point_2d(x + dx, y + dy);
+        rgba_t ptmp;
+        int p;
+        float index;
+        fate_t fate;
+        m_pf.calc(
+            pos.n, options.maxiter,
+            checkPeriod, options.period_tolerance,
+            options.warp_param,
+            x, y, 5 + j * side + i,
+            &ptmp, &p, &index, &fate,
+            pos_lo.n);
+        moments.add(ptmp);
+        if ((k + 1) % side == 0 && moments.mean_variance() <= options.aa_variance)
+        {
+            break;
+        }
+    }
+    m_stats.s[SUBPIXELS_ANTIALIASED] += moments.n;
+    rgba_t pixel = average;
+    pixel.r = moments.sum[0] / moments.n;
+    pixel.g = moments.sum[1] / moments.n;
+    pixel.b = moments.sum[2] / moments.n;
+    return pixel;
+}
+
 void STFractWorker::compute_stats(const dvec4 &pos, int iter, fate_t fate, int x, int y)
 {
     const calc_options &options = m_context->get_options();
@@ -343,7 +636,15 @@ void STFractWorker::compute_auto_deepen_stats(const dvec4 &pos, int iter, int x,
         float temp_index;
         fate_t temp_fate;
         int temp_iter;
-        /* didn't bail out, try again with 2x as many iterations */
+        /* didn't bail out, try again with 2x as many iterations,
+           carrying on from where the pixel stopped if we can. The
+           pixel's own state has to stay as it is for the next pass */
+        const double *state = m_im->getState(x, y);
+        std::vector<double> state_copy;
+        if (state)
+        {
+            state_copy.assign(state, state + m_pf.state_size());
+        }
         m_pf.calc(
             pos.n,
             options.maxiter * 2,
@@ -351,7 +652,8 @@ void STFractWorker::compute_auto_deepen_stats(const dvec4 &pos, int iter, int x,
             options.period_tolerance,
             options.warp_param,
             x, y, -1,
-            &temp_pixel, &temp_iter, &temp_index, &temp_fate);
+            &temp_pixel, &temp_iter, &temp_index, &temp_fate,
+            nullptr, state ? state_copy.data() : nullptr);
 
         if (temp_iter != -1)
         {
@@ -375,8 +677,14 @@ void STFractWorker::pixel(int x, int y, int w, int h)
         case RENDER_TWO_D:
         {
             // calculate coords of this point
-            const dvec4 pos =  geometry.vec_for_point_2d(x, y); //m_ff->topleft + x * m_ff->deltax + y * m_ff->deltay;
+            dvec4 pos_lo(0.0);
+            const dvec4 pos = m_pf.is_precise() ?
+                geometry.precise_vec_for_point_2d(x, y, pos_lo) :
+                geometry.vec_for_point_2d(x, y); //m_ff->topleft + x * m_ff->deltax + y * m_ff->deltay;
             const int min_period_iters = periodGuess();
+            // if an earlier pass left this pixel inside, carry on from there
+            double *state = m_im->getState(x, y);
+            const bool resumed = state && state[0] != 0.0;
             m_pf.calc(
                 pos.n,
                 options.maxiter,
@@ -384,8 +692,13 @@ void STFractWorker::pixel(int x, int y, int w, int h)
                 options.period_tolerance,
                 options.warp_param,
                 x, y, 0,
-                &pixel, &iter, &index, &fate);
+                &pixel, &iter, &index, &fate,
+                pos_lo.n, state);
             compute_stats(pos, iter, fate, x, y);
+            if (resumed)
+            {
+                ++m_stats.s[PIXELS_RESUMED];
+            }
 #ifdef DEBUG_PIXEL
             const int color_iters = (fate & FATE_INSIDE) ? -1 : iter;
             m_site->pixel_changed(
@@ -428,7 +741,7 @@ void STFractWorker::pixel(int x, int y, int w, int h)
         {
             printf("pixel %d %d %d %d\n", x, y, fate, iter);
         }
-        assert(fate != FATE_UNKNOWN);
+        assert(fate != FATE_UNKNOWN || m_context->try_finished_cond());
         m_im->setIter(x, y, iter);
         m_im->setFate(x, y, 0, fate);
         m_im->setIndex(x, y, 0, index);
@@ -436,21 +749,28 @@ void STFractWorker::pixel(int x, int y, int w, int h)
     }
     else
     {
-        pixel = m_pf.recolor(m_im->getIndex(x, y, 0), fate, m_im->get(x, y));
+        // without color indexes the pixel keeps the color it was drawn with
+        pixel = m_im->buffers() == IMAGE_BUFFERS_FULL ?
+            m_pf.recolor(m_im->getIndex(x, y, 0), fate, m_im->get(x, y)) :
+            m_im->get(x, y);
         rectangle(pixel, x, y, w, h);
     }
 }
 
 void STFractWorker::box_row(int w, int y, int rsize)
+{
+    box_span(0, w - rsize, y, rsize);
+    // extra pixels at end of lines: already calculated by qbox_row
+}
+
+void STFractWorker::box_span(int x, int end, int y, int rsize)
 {
     // we increment by rsize-1 because we want to reuse the vertical bars
     // between the boxes - each box overlaps by 1 pixel
-    auto x = 0;
-    for (; x < w - rsize; x += rsize - 1)
+    for (; x < end; x += rsize - 1)
     {
         box(x, y, rsize);
     }
-    // extra pixels at end of lines: already calculated by qbox_row
 }
 
 void STFractWorker::qbox_row(int w, int y, int rsize, int drawsize)
@@ -470,30 +790,22 @@ void STFractWorker::qbox_row(int w, int y, int rsize, int drawsize)
 
 void STFractWorker::pixel_aa(int x, int y)
 {
-    const int iter = m_im->getIter(x, y);
-    // if aa type is fast, short-circuit some points
-    if (m_context->get_options().eaa == AA_FAST &&
-        x > 0 && x < m_im->Xres() - 1 && y > 0 && y < m_im->Yres() - 1)
-    {
-        // check to see if this point is surrounded by others of the same colour
-        // if so, don't bother recalculating
-        const int pcol = Pixel2INT(x, y);
-        const bool bFlat =
-            isTheSame(iter, pcol, x, y - 1) &&
-            isTheSame(iter, pcol, x - 1, y) &&
-            isTheSame(iter, pcol, x + 1, y) &&
-            isTheSame(iter, pcol, x, y + 1);
-        if (bFlat)
+    // fast and adaptive antialiasing skip some pixels, decided from the
+    // image as it was before antialiasing started. That way no pixel
+    // depends on whether its neighbours have been antialiased yet
+    if (!m_context->needs_aa(x, y))
+    {
+        if (m_context->get_debug_flags() & DEBUG_DRAWING_STATS)
         {
-            if (m_context->get_debug_flags() & DEBUG_DRAWING_STATS)
-            {
-                printf("noaa %d %d\n", x, y);
-            }
-            m_im->fill_subpixels(x, y);
-            return;
+            printf("noaa %d %d\n", x, y);
         }
+        m_im->fill_subpixels(x, y);
+        return;
     }
-    const rgba_t pixel = antialias(x, y);
+    ++m_stats.s[PIXELS_ANTIALIASED];
+    const rgba_t pixel = m_context->get_options().eaa == AA_ADAPTIVE ?
+        antialias_adaptive(x, y) :
+        antialias(x, y);
     rectangle(pixel, x, y, 1, 1);
 }
 
@@ -686,6 +998,20 @@ void STFractWorker::box(int x, int y, int rsize)
         pixel(right_x, y2, 1, 1);
         bFlat = bFlat && isTheSame(iter, pcol, right_x, y2);
     }
+    // any pixels inside already known, say from a previous zoom level,
+    // have to agree too
+    for (int y2 = y + 1; bFlat && y2 < bottom_y; ++y2)
+    {
+        for (int x2 = x + 1; x2 < right_x; ++x2)
+        {
+            if (m_im->getFate(x2, y2, 0) != FATE_UNKNOWN &&
+                !isTheSame(iter, pcol, x2, y2))
+            {
+                bFlat = false;
+                break;
+            }
+        }
+    }
     if (bFlat)
     {
         // just draw a solid rectangle
@@ -724,13 +1050,155 @@ void STFractWorker::box(int x, int y, int rsize)
     }
 }
 
+void STFractWorker::rect(int x, int y, int w, int h)
+{
+    rect(x, y, w, h, nullptr);
+}
+
+void STFractWorker::rect(int x, int y, int w, int h, IFractWorker *farm)
+{
+    // calculate the border, then work inwards from it
+    const auto bottom_y = y + h - 1;
+    const auto right_x = x + w - 1;
+    row(x, y, w);
+    if (bottom_y > y)
+    {
+        row(x, bottom_y, w);
+    }
+    for (auto y2 = y + 1; y2 < bottom_y; ++y2)
+    {
+        pixel(x, y2, 1, 1);
+        if (right_x > x)
+        {
+            pixel(right_x, y2, 1, 1);
+        }
+    }
+    divide(x, y, w, h, farm);
+}
+
+void STFractWorker::subdivide(int x, int y, int w, int h)
+{
+    divide(x, y, w, h, nullptr);
+}
+
+void STFractWorker::divide(int x, int y, int w, int h, IFractWorker *farm)
+{
+    if (w < 3 || h < 3)
+    {
+        // it's all border
+        return;
+    }
+    if (w * h > SHARED_RECT_PIXELS)
+    {
+        // the whole image is one job, so look for interruptions while
+        // it's divided up. Not for each small part, since the site
+        // may need the Python lock to answer
+        if (m_context->try_finished_cond())
+        {
+            return;
+        }
+    }
+    else if (farm)
+    {
+        farm->subdivide(x, y, w, h);
+        return;
+    }
+    const auto bottom_y = y + h - 1;
+    const auto right_x = x + w - 1;
+    if (isFlat(x, y, w, h))
+    {
+        // however big it is, the inside is the same as the edges
+        const rgba_t pixel = m_im->get(x, y);
+        const fate_t fate = m_im->getFate(x, y, 0);
+        const float index = m_im->getIndex(x, y, 0);
+        rectangle_with_iter(pixel, fate, m_im->getIter(x, y), index, x + 1, y + 1, w - 2, h - 2);
+    }
+    else if (w <= 4 || h <= 4)
+    {
+        // too thin to be worth dividing
+        for (auto y2 = y + 1; y2 < bottom_y; ++y2)
+        {
+            row(x + 1, y2, w - 2);
+        }
+    }
+    else if (w >= h)
+    {
+        // split down the middle. The halves share the new column as an edge
+        const auto mid_x = x + w / 2;
+        for (auto y2 = y + 1; y2 < bottom_y; ++y2)
+        {
+            pixel(mid_x, y2, 1, 1);
+        }
+        divide(x, y, mid_x - x + 1, h, farm);
+        divide(mid_x, y, right_x - mid_x + 1, h, farm);
+    }
+    else
+    {
+        const auto mid_y = y + h / 2;
+        row(x + 1, mid_y, w - 2);
+        divide(x, y, w, mid_y - y + 1, farm);
+        divide(x, mid_y, w, bottom_y - mid_y + 1, farm);
+    }
+}
+
+bool STFractWorker::isFlat(int x, int y, int w, int h)
+{
+    const int iter = m_im->getIter(x, y);
+    const int pcol = Pixel2INT(x, y);
+    if (m_context->get_options().safe_subdivide &&
+        !(m_im->getFate(x, y, 0) & FATE_INSIDE))
+    {
+        // an outside band can have filaments of the set running through
+        // it without touching the edges, but a connected set can't have
+        // holes, so a loop of inside pixels only has inside pixels within
+        return false;
+    }
+    const auto bottom_y = y + h - 1;
+    const auto right_x = x + w - 1;
+    for (auto x2 = x; x2 <= right_x; ++x2)
+    {
+        if (!isTheSame(iter, pcol, x2, y) || !isTheSame(iter, pcol, x2, bottom_y))
+        {
+            return false;
+        }
+    }
+    for (auto y2 = y + 1; y2 < bottom_y; ++y2)
+    {
+        if (!isTheSame(iter, pcol, x, y2) || !isTheSame(iter, pcol, right_x, y2))
+        {
+            return false;
+        }
+    }
+    // any pixels inside already known, say from a previous zoom level,
+    // have to agree too
+    for (auto y2 = y + 1; y2 < bottom_y; ++y2)
+    {
+        for (auto x2 = x + 1; x2 < right_x; ++x2)
+        {
+            if (m_im->getFate(x2, y2, 0) != FATE_UNKNOWN &&
+                !isTheSame(iter, pcol, x2, y2))
+            {
+                return false;
+            }
+        }
+    }
+    return true;
+}
+
+// color pixel x,y, and use it as a guess for the rest of the block until
+// they're calculated. Pixels which are already known, say because the
+// image has been shifted, keep their own colors
 inline void STFractWorker::rectangle(rgba_t pixel, int x, int y, int w, int h)
 {
+    m_im->put(x, y, pixel);
     for (auto i = y; i < y + h; ++i)
     {
         for (auto j = x; j < x + w; ++j)
         {
-            m_im->put(j, i, pixel);
+            if (m_im->getFate(j, i, 0) == FATE_UNKNOWN)
+            {
+                m_im->put(j, i, pixel);
+            }
         }
     }
 }
@@ -743,6 +1211,11 @@ inline void STFractWorker::rectangle_with_iter(
     {
         for (auto j = x; j < x + w; ++j)
         {
+            if (m_im->getFate(j, i, 0) != FATE_UNKNOWN)
+            {
+                // calculated already, which beats a guess
+                continue;
+            }
             if (m_context->get_debug_flags() & DEBUG_DRAWING_STATS)
             {
                 printf("guess %d %d %d %d\n", j, i, fate, iter);
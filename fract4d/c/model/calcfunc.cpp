@@ -1,12 +1,40 @@
+#include <algorithm>
 #include <cassert>
-#include <memory>
+#include <thread>
+#include <vector>
 
 #include "calcfunc.h"
 
 #include "model/worker.h"
+#include "model/workerpool.h"
+#include "model/scheduler.h"
 #include "model/fractfunc.h"
 #include "model/image.h"
+#include "model/colormap.h"
+#include "model/perturbation.h"
 
+namespace {
+    // points around the edge of the image, as offsets from its center
+    std::vector<ReferenceOrbit::offset_t> series_probes(
+        const fract_geometry &geometry, IImage *im)
+    {
+        const double left = -0.5, top = -0.5;
+        const double right = im->Xres() - 0.5, bottom = im->Yres() - 0.5;
+        const double mid_x = im->Xres() / 2.0, mid_y = im->Yres() / 2.0;
+        const double points[][2] = {
+            {left, top}, {mid_x, top}, {right, top},
+            {left, mid_y}, {right, mid_y},
+            {left, bottom}, {mid_x, bottom}, {right, bottom}};
+
+        std::vector<ReferenceOrbit::offset_t> probes;
+        for (const auto &point : points)
+        {
+            const dvec4 pos = geometry.vec_for_point_2d(point[0], point[1]);
+            probes.push_back({pos.n[VX], pos.n[VY], pos.n[VZ], pos.n[VW]});
+        }
+        return probes;
+    }
+}
 
 void calc(
     calc_options options,
@@ -15,26 +43,151 @@ void calc(
     ColorMap *cmap,
     IFractalSite *site,
     IImage *im,
-    int debug_flags)
+    int debug_flags,
+    ReferenceOrbit *orbit,
+    const d *center_lo)
 {
     assert(im && site && cmap && pfo && params);
 
-    std::unique_ptr<IFractWorker> worker {IFractWorker::create(options.nThreads, pfo, cmap, im, site)};
+    if (im->buffers() != IMAGE_BUFFERS_FULL)
+    {
+        // there's nowhere to keep the subpixels
+        options.eaa = AA_NONE;
+    }
+
+    // let the formula notice an interruption part-way through a point.
+    // Set before the worker copies the formula for each thread
+    pfo->interrupted = site->get_interrupt_flag();
+    pooled_worker_t worker {WorkerPool::instance().acquire(options.nThreads, pfo, cmap, im, site)};
     if (worker)
     {
+        const scheduler_ticket ticket(options.priority);
+
         fractFunc ff(
             options,
             params,
             worker.get(),
             im,
-            site
+            site,
+            orbit,
+            center_lo
         );
 
+        if (orbit)
+        {
+            orbit->compute(options.maxiter, params[MAGNITUDE] / im->totalXres());
+            if (options.series_approximation)
+            {
+                orbit->compute_series(
+                    series_probes(ff.get_geometry(), im), options.maxiter);
+            }
+        }
+
         ff.set_debug_flags(debug_flags);
         if (options.dirty)
         {
             im->clear();
         }
+
+        // with auto-deepening, inside pixels can carry on from where the
+        // last pass stopped rather than starting from scratch
+        const bool resume = options.auto_deepen && !orbit &&
+            options.render_type == RENDER_TWO_D &&
+            pfo->vtbl->calc_resume && pfo->vtbl->state_size > 0 &&
+            im->alloc_state(pfo->vtbl->state_size);
         ff.draw_all();
+        if (resume)
+        {
+            im->free_state();
+        }
+    }
+    pfo->interrupted = nullptr;
+}
+namespace {
+    inline rgba_t recolor_subpixel(const ColorMap *cmap, fate_t fate, float index)
+    {
+        return cmap->lookup_with_transfer(
+            index, (fate & FATE_SOLID) ? 1 : 0, (fate & FATE_INSIDE) ? 1 : 0);
+    }
+
+    void recolor_pixel(const ColorMap *cmap, IImage *im, int x, int y)
+    {
+        const fate_t fate = im->getFate(x, y, 0);
+        if (fate == FATE_UNKNOWN || (fate & FATE_DIRECT))
+        {
+            return;
+        }
+        // antialiased pixels have all their subpixels calculated
+        const int nsub = im->getNSubPixels();
+        bool aa = true;
+        for (int n = 1; n < nsub; ++n)
+        {
+            const fate_t sub_fate = im->getFate(x, y, n);
+            if (sub_fate != FATE_UNKNOWN && (sub_fate & FATE_DIRECT))
+            {
+                // the other subpixels' share of the color is lost
+                return;
+            }
+            aa = aa && sub_fate != FATE_UNKNOWN;
+        }
+        if (!aa)
+        {
+            im->put(x, y, recolor_subpixel(cmap, fate, im->getIndex(x, y, 0)));
+            return;
+        }
+        // averaged just as the antialiasing pass does
+        unsigned int r = 0, g = 0, b = 0;
+        rgba_t pixel;
+        for (int n = 0; n < nsub; ++n)
+        {
+            pixel = recolor_subpixel(
+                cmap, im->getFate(x, y, n), im->getIndex(x, y, n));
+            r += pixel.r;
+            g += pixel.g;
+            b += pixel.b;
+        }
+        pixel.r = r / nsub;
+        pixel.g = g / nsub;
+        pixel.b = b / nsub;
+        im->put(x, y, pixel);
+    }
+
+    void recolor_rows(const ColorMap *cmap, IImage *im, int y_start, int y_end)
+    {
+        for (int y = y_start; y < y_end; ++y)
+        {
+            for (int x = 0; x < im->Xres(); ++x)
+            {
+                recolor_pixel(cmap, im, x, y);
+            }
+        }
+    }
+}
+
+void recolor(ColorMap *cmap, IImage *im, int nThreads)
+{
+    assert(cmap && im);
+    if (!im->hasFate() || im->buffers() != IMAGE_BUFFERS_FULL)
+    {
+        // no color indexes to recolor from
+        return;
+    }
+    // one band of rows per thread: every pixel costs about the same
+    const int nbands = std::max(1, std::min(nThreads, im->Yres()));
+    if (nbands == 1)
+    {
+        recolor_rows(cmap, im, 0, im->Yres());
+        return;
+    }
+    std::vector<std::thread> threads;
+    for (int i = 0; i < nbands; ++i)
+    {
+        threads.emplace_back(
+            recolor_rows, cmap, im,
+            im->Yres() * i / nbands, im->Yres() * (i + 1) / nbands);
+    }
+    for (auto &thread : threads)
+    {
+        thread.join();
     }
-}
\ No newline at end of file
+}
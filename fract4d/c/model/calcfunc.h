@@ -8,6 +8,7 @@ typedef double d;
 class ColorMap;
 class IImage;
 class IFractalSite;
+class ReferenceOrbit;
 
 
 #ifdef __cplusplus
@@ -22,9 +23,17 @@ extern "C"
         ColorMap *,
         IFractalSite *,
         IImage *,
-        int debug_flags
+        int debug_flags,
+        ReferenceOrbit *orbit = nullptr, // deep zoom by perturbation if set
+        const d *center_lo = nullptr // extra digits of the center, for double-double formulas
     );
 
+    // recolor an already-calculated image with a new colormap, using the
+    // fate and index of each subpixel rather than calculating anything.
+    // Pixels which were never calculated or are colored directly by the
+    // formula are left as they are
+    void recolor(ColorMap *, IImage *, int nThreads);
+
 #ifdef __cplusplus
 }
 #endif
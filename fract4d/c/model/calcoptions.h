@@ -14,9 +14,16 @@ struct calc_options
         periodicity = true, // enables "period checking" technique to find values which vary within an interval before reaching maxiter
         dirty = 1, // clears the image fate and iters buffers
         auto_tolerance = false, // dinamically adjust period_tolerance value (based on statistics of the current process)
-        warp_param = -1; // index of the param to be warped
+        warp_param = -1, // index of the param to be warped
+        series_approximation = true, // for deep zooms, skip the iterations all the pixels have in common
+        safe_subdivide = false, // with DRAW_SUBDIVIDE, only fill in rectangles bordered by inside pixels
+        aa_samples = 4, // with AA_ADAPTIVE, how many subpixels an edge pixel can use: 4, 9 or 16
+        update_rate = 30; // most times a second to tell the site about progress, 0 for as often as there is any
     double period_tolerance = 1.0E-9; // value used by the preiod checking technique
+    double aa_variance = 4.0; // with AA_ADAPTIVE, stop adding subpixels once the variance of their average color is at most this
     render_type_t render_type = RENDER_TWO_D; // redenring mode, 2d as default (3d is also supported but experimental)
+    draw_type_t draw_type = DRAW_GUESSING; // how to decide which pixels to calculate and which to guess
+    priority_t priority = PRIORITY_INTERACTIVE; // whether to give way to other calculations running at the same time
 };
 
 #endif
\ No newline at end of file
@@ -169,11 +169,16 @@ rgba_t ColorMap::lookup_with_transfer(double index, int solid, int inside) const
 GradientColorMap::GradientColorMap() : ColorMap()
 {
     items = NULL;
+    lut_size = 0;
+    lut = NULL;
+    lut_exact = NULL;
 }
 
 GradientColorMap::~GradientColorMap()
 {
     delete[] items;
+    delete[] lut;
+    delete[] lut_exact;
 }
 
 bool GradientColorMap::init(int ncolors_)
@@ -293,6 +298,55 @@ static double calc_sphere_decreasing_factor(double middle, double pos)
     return 1.0 - std::sqrt(1.0 - pos * pos);
 }
 
+bool GradientColorMap::set_lut_size(int lut_size_)
+{
+    delete[] lut;
+    delete[] lut_exact;
+    lut = NULL;
+    lut_exact = NULL;
+    lut_size = 0;
+    if (lut_size_ <= 0)
+    {
+        return true;
+    }
+    float *new_lut = new (std::nothrow) float[(lut_size_ + 1) * 4];
+    bool *new_lut_exact = new (std::nothrow) bool[lut_size_];
+    if (!new_lut || !new_lut_exact)
+    {
+        delete[] new_lut;
+        delete[] new_lut_exact;
+        return false;
+    }
+    int prev_seg = 0;
+    for (int i = 0; i <= lut_size_; ++i)
+    {
+        double index = (double)i / lut_size_;
+        rgba_t color = lookup_exact(index);
+        float *entry = &new_lut[i * 4];
+        // the exact path truncates 255 * color to an int, so store the
+        // middle of that integer's range to interpolate between
+        entry[0] = (color.r + 0.5f) / 255.0f;
+        entry[1] = (color.g + 0.5f) / 255.0f;
+        entry[2] = (color.b + 0.5f) / 255.0f;
+        entry[3] = (color.a + 0.5f) / 255.0f;
+        int seg = grad_find(index, items, ncolors);
+        if (i > 0)
+        {
+            new_lut_exact[i - 1] = seg != prev_seg;
+        }
+        prev_seg = seg;
+    }
+    lut = new_lut;
+    lut_exact = new_lut_exact;
+    lut_size = lut_size_;
+    return true;
+}
+
+int GradientColorMap::get_lut_size() const
+{
+    return lut_size;
+}
+
 rgba_t GradientColorMap::lookup(double input_index) const
 {
     assert(canary == 0xfeeefeee);
@@ -302,6 +356,32 @@ rgba_t GradientColorMap::lookup(double input_index) const
         // must be infinite or NaN
         return black;
     }
+    if (lut)
+    {
+        double pos = index * lut_size;
+        int i = (int)pos;
+        if (i >= lut_size)
+        {
+            i = lut_size - 1;
+        }
+        if (!lut_exact[i])
+        {
+            float factor = (float)(pos - i);
+            const float *lo = &lut[i * 4];
+            const float *hi = lo + 4;
+            rgba_t result;
+            result.r = (unsigned char)(255.0f * (lo[0] + (hi[0] - lo[0]) * factor));
+            result.g = (unsigned char)(255.0f * (lo[1] + (hi[1] - lo[1]) * factor));
+            result.b = (unsigned char)(255.0f * (lo[2] + (hi[2] - lo[2]) * factor));
+            result.a = (unsigned char)(255.0f * (lo[3] + (hi[3] - lo[3]) * factor));
+            return result;
+        }
+    }
+    return lookup_exact(index);
+}
+
+rgba_t GradientColorMap::lookup_exact(double index) const
+{
     int i = grad_find(index, items, ncolors);
     assert(i >= 0 && i < ncolors);
     gradient_item_t *seg = &items[i];
@@ -91,8 +91,20 @@ public:
              double *right_col,
              e_blendType bmode, e_colorType cmode);
     rgba_t lookup(double index) const;
+    /* sample the gradient into a table of lut_size cells, which lookup
+       then interpolates instead of doing the blend calculations.
+       0 goes back to the exact calculation. Call after set() */
+    bool set_lut_size(int lut_size);
+    int get_lut_size() const;
 private:
+    rgba_t lookup_exact(double index) const;
     gradient_item_t *items;
+    int lut_size;
+    /* lut_size + 1 samples of r,g,b,a in [0,1] */
+    float *lut;
+    /* cells which a segment boundary falls inside, where interpolating
+       could blur a discontinuity, so lookup calculates them exactly */
+    bool *lut_exact;
 };
 
 extern void cmap_delete(ColorMap *cmap);
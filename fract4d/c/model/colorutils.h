@@ -40,6 +40,48 @@ extern "C" {
         double *r, double *g, double *b);
 #ifdef __cplusplus
 }
+
+#include "fract_dd.h"
+
+// overloads for formulas compiled with double-double precision.
+// Colors don't need more than double precision
+
+inline void hsl_to_rgb(
+    dd_real h, dd_real s, dd_real l,
+    dd_real *r, dd_real *g, dd_real *b)
+{
+    double d_r, d_g, d_b;
+    hsl_to_rgb(h.hi, s.hi, l.hi, &d_r, &d_g, &d_b);
+    *r = d_r;
+    *g = d_g;
+    *b = d_b;
+}
+
+inline void hsv_to_rgb(
+    dd_real h, dd_real s, dd_real v,
+    dd_real *r, dd_real *g, dd_real *b)
+{
+    double d_r, d_g, d_b;
+    hsv_to_rgb(h.hi, s.hi, v.hi, &d_r, &d_g, &d_b);
+    *r = d_r;
+    *g = d_g;
+    *b = d_b;
+}
+
+inline dd_real hue(dd_real r, dd_real g, dd_real b)
+{
+    return hue(r.hi, g.hi, b.hi);
+}
+
+inline dd_real sat(dd_real r, dd_real g, dd_real b)
+{
+    return sat(r.hi, g.hi, b.hi);
+}
+
+inline dd_real lum(dd_real r, dd_real g, dd_real b)
+{
+    return lum(r.hi, g.hi, b.hi);
+}
 #endif
 
 #endif /* __COLORUTILS_H_INCLUDED__ */
@@ -26,6 +26,7 @@ typedef enum {
     AA_NONE = 0,
     AA_FAST,
     AA_BEST,
+    AA_ADAPTIVE, /* only supersample pixels on an edge, with up to aa_samples subpixels */
     AA_DEFAULT /* used only for effective_aa - means use aa from fractal */
 } e_antialias;
 
@@ -47,9 +48,31 @@ typedef enum {
 // how to draw the image
 typedef enum {
     DRAW_GUESSING, // several passes, starting with large boxes
-    DRAW_TO_DISK   // complete all passes on one box_row before continuing
+    DRAW_TO_DISK,  // complete all passes on one box_row before continuing
+    DRAW_SUBDIVIDE // split rectangles until their borders are all the same (Mariani-Silver)
 } draw_type_t;
 
+// how much a calculation matters to the user. While one is running,
+// any with a lower priority pause between jobs
+typedef enum {
+    PRIORITY_BACKGROUND,  // e.g. the render queue
+    PRIORITY_PREVIEW,     // small views which aren't the focus, like subfractals
+    PRIORITY_INTERACTIVE, // the view the user is working with
+    NUM_PRIORITIES
+} priority_t;
+
+
+/**********
+ * IMAGES *
+ * ********/
+
+// which data an image keeps for each pixel besides its color
+typedef enum {
+    IMAGE_BUFFERS_RGB,      // the fate of one subpixel, so drawing knows which pixels are done. Nothing is guessed
+    IMAGE_BUFFERS_RGB_ITER, // and the iteration count, which guessing compares
+    IMAGE_BUFFERS_FULL      // and the fate and color index of every subpixel, for antialiasing and recoloring
+} image_buffers_t;
+
 
 /***************
  * IMAGE FILES *
@@ -98,6 +121,13 @@ typedef enum
     // n pixels currently misclassified that would be correct
     // if we tightened the tolerance
     BETTER_TOLERANCE_PIXELS,
+    // pixels which carried on from the state an earlier pass left
+    // them in, rather than starting again
+    PIXELS_RESUMED,
+    // pixels the antialiasing pass calculated subpixels for
+    PIXELS_ANTIALIASED,
+    // subpixels adaptive antialiasing calculated in a 3x3 or 4x4 grid
+    SUBPIXELS_ANTIALIASED,
     // how many stats do we keep
     NUM_STATS
 } stat_t;
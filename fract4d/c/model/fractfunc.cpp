@@ -1,47 +1,170 @@
 #include <cstdio>
 #include <cstdlib>
+#include <cmath>
+#include <climits>
 #include <ctime>
 #include <cassert>
+#include <algorithm>
+#include <array>
 
 #include "fractfunc.h"
 #include "model/image.h"
+#include "model/scheduler.h"
+
+namespace {
+    // in deep zoom mode the geometry works in offsets from the reference
+    // orbit's center, which doubles can represent at any magnification
+    std::array<d, N_PARAMS> offset_params(const d *location_params)
+    {
+        std::array<d, N_PARAMS> params;
+        std::copy(location_params, location_params + N_PARAMS, params.begin());
+        params[XCENTER] = params[YCENTER] = params[ZCENTER] = params[WCENTER] = 0.0;
+        return params;
+    }
+
+    // rows [y1, y2) as a single value, so they can be updated atomically
+    inline unsigned long long pack_rows(unsigned int y1, unsigned int y2)
+    {
+        return (static_cast<unsigned long long>(y1) << 32) | y2;
+    }
+
+    const unsigned long long NO_ROWS = pack_rows(UINT_MAX, 0);
+}
 
 fractFunc::fractFunc(
     calc_options options,
     d *location_params,
     IFractWorker *fw,
     IImage *im,
-    IFractalSite *site):
+    IFractalSite *site,
+    const ReferenceOrbit *orbit,
+    const d *center_lo):
     m_debug_flags{0},
     m_options{options},
     m_geometry {
-        location_params,
+        orbit ? offset_params(location_params).data() : location_params,
         static_cast<bool>(options.yflip),
         im->totalXres(),
         im->totalYres(),
         im->Xoffset(),
-        im->Yoffset()
+        im->Yoffset(),
+        orbit ? nullptr : center_lo
     },
-    m_im{im}, m_worker{fw}, m_site{site},
+    m_im{im}, m_worker{fw}, m_site{site}, m_orbit{orbit},
     m_last_update_y{0},
     m_min_progress{0.0f}, m_delta_progress{1.0f},
-    m_stats{}
+    m_stats{},
+    m_dirty_rows{NO_ROWS}, m_progress{0.0f}, m_last_report{},
+    m_reported_progress{-1.0f},
+    m_status{GF4D_FRACTAL_CALCULATING}
 {
     m_worker->set_context(this);
 }
 
+void fractFunc::rows_changed(int y1, int y2) const
+{
+    if (y1 >= y2)
+    {
+        return;
+    }
+    auto rows = m_dirty_rows.load();
+    unsigned long long merged;
+    do
+    {
+        merged = pack_rows(
+            std::min(static_cast<unsigned int>(rows >> 32), static_cast<unsigned int>(y1)),
+            std::max(static_cast<unsigned int>(rows), static_cast<unsigned int>(y2)));
+    } while (merged != rows && !m_dirty_rows.compare_exchange_weak(rows, merged));
+}
+
+void fractFunc::progress_changed(float progress) const
+{
+    // jobs finish out of order, so keep the furthest any has got
+    auto current = m_progress.load();
+    while (progress > current && !m_progress.compare_exchange_weak(current, progress))
+    {
+    }
+}
+
+void fractFunc::report_changes(bool force)
+{
+    const auto now = std::chrono::steady_clock::now();
+    if (!force && m_options.update_rate > 0 &&
+        now - m_last_report < std::chrono::duration<double>(1.0 / m_options.update_rate))
+    {
+        return;
+    }
+    const auto rows = m_dirty_rows.exchange(NO_ROWS);
+    const auto y1 = static_cast<unsigned int>(rows >> 32);
+    const auto y2 = static_cast<unsigned int>(rows);
+    const float progress = m_min_progress + m_progress * m_delta_progress;
+    if (!force && y1 >= y2 && progress == m_reported_progress)
+    {
+        // nothing new, e.g. because the workers are paused
+        return;
+    }
+    m_last_report = now;
+    if (y1 < y2)
+    {
+        m_site->image_changed(0, y1, m_im->Xres(), y2);
+    }
+    m_site->progress_changed(progress);
+    m_reported_progress = progress;
+}
+
+void fractFunc::flush()
+{
+    // workers note what they've done as each job finishes. Pass that on
+    // while waiting for them, or the site would hear nothing until the
+    // whole pass was over
+    const double interval = m_options.update_rate > 0 ?
+        1.0 / m_options.update_rate : MIN_REPORT_INTERVAL;
+    while (!m_worker->flush_for(interval))
+    {
+        report_changes(false);
+    }
+}
+
 bool fractFunc::update_image(int i)
 {
-    const auto done = try_finished_cond();
+    auto done = try_finished_cond();
     if (!done)
     {
-        image_changed(0, m_last_update_y, m_im->Xres(), i);
-        progress_changed(static_cast<float>(i) / static_cast<float>(m_im->Yres()));
+        if (!m_worker->queues_jobs())
+        {
+            // the rows are done already. Queued jobs aren't, and the
+            // worker threads report them when they are
+            rows_changed(m_last_update_y, i);
+            progress_changed(static_cast<float>(i) / static_cast<float>(m_im->Yres()));
+        }
+        report_changes(false);
+        if (CalcScheduler::instance().must_wait(m_options.priority))
+        {
+            pause();
+            done = try_finished_cond();
+        }
     }
     m_last_update_y = i;
     return done;
 }
 
+void fractFunc::pause()
+{
+    // show what we've done so far while we wait
+    report_changes(true);
+    m_site->status_changed(GF4D_FRACTAL_PAUSED);
+    wait_turn();
+    if (!try_finished_cond())
+    {
+        m_site->status_changed(m_status);
+    }
+}
+
+void fractFunc::wait_turn() const
+{
+    CalcScheduler::instance().wait_turn(m_options.priority, m_site);
+}
+
 // see if the image needs more (or less) iterations & tolerance to display properly
 int fractFunc::updateiters()
 {
@@ -88,34 +211,98 @@ void fractFunc::draw_aa(float min_progress, float max_progress)
 
     reset_counts();
 
-    const float delta = (max_progress - min_progress) / 2.0;
+    // antialiasing a pixel only looks at that pixel, plus this map made
+    // from the image before any of them changed. So the threads can do
+    // the rows in any order, without looking at pixels another thread is
+    // writing, and the result is always the same
+    find_aa_pixels();
 
-    // if we have multiple threads, make sure they don't modify
-    // pixels the other thread will look at - that wouldn't be
-    // an error per se but would make drawing nondeterministic,
-    // which I'm trying to avoid
-    // We do this by drawing every even line, then every odd one.
+    set_progress_range(min_progress, max_progress);
+    reset_progress(0.0);
+    m_last_update_y = 0;
 
-    for (auto i = 0; i < 2; ++i)
+    for (auto y = 0; y < h; ++y)
     {
-        set_progress_range(
-            min_progress + delta * i,
-            min_progress + delta * (i + 1));
-
-        reset_progress(0.0);
-        m_last_update_y = 0;
+        m_worker->row_aa(0, y, w);
+        if (update_image(y))
+        {
+            break;
+        }
+    }
+    reset_progress(1.0);
+    stats_changed();
+}
 
-        for (int y = i; y < h; y += 2)
+void fractFunc::find_aa_pixels()
+{
+    const auto w = m_im->Xres();
+    const auto h = m_im->Yres();
+    m_aa_pixels.clear();
+    if (m_options.eaa == AA_FAST)
+    {
+        // skip points surrounded by others of the same colour and
+        // iteration count
+        const auto same = [this](int x, int y, int x2, int y2) {
+            return m_im->getIter(x, y) == m_im->getIter(x2, y2) &&
+                static_cast<int>(m_im->get(x, y)) == static_cast<int>(m_im->get(x2, y2));
+        };
+        m_aa_pixels.assign(w * h, true);
+        for (auto y = 1; y < h - 1; ++y)
         {
-            m_worker->row_aa(y, w);
-            if (update_image(y))
+            for (auto x = 1; x < w - 1; ++x)
             {
-                break;
+                if (same(x, y, x, y - 1) && same(x, y, x - 1, y) &&
+                    same(x, y, x + 1, y) && same(x, y, x, y + 1))
+                {
+                    m_aa_pixels[y * w + x] = false;
+                }
+            }
+        }
+        return;
+    }
+    if (m_options.eaa != AA_ADAPTIVE)
+    {
+        return;
+    }
+    // adaptive antialiasing only does pixels on an edge, whose fate,
+    // iterations or color index differ from one of their neighbours'.
+    // A difference in color index smaller than this is a smooth gradient,
+    // not an edge
+    const float index_delta = 1.0 / 256;
+    m_aa_pixels.assign(w * h, false);
+    for (auto y = 0; y < h; ++y)
+    {
+        for (auto x = 0; x < w; ++x)
+        {
+            const fate_t fate = m_im->getFate(x, y, 0);
+            const int iter = m_im->getIter(x, y);
+            const float index = m_im->getIndex(x, y, 0);
+            // look at the neighbours to the right and below, marking both
+            // pixels when they differ. Those above and to the left have
+            // already looked at this one
+            const int neighbours[4][2] = {{1, 0}, {-1, 1}, {0, 1}, {1, 1}};
+            for (const auto &n : neighbours)
+            {
+                const int x2 = x + n[0], y2 = y + n[1];
+                if (x2 < 0 || x2 >= w || y2 >= h)
+                {
+                    continue;
+                }
+                if (m_im->getFate(x2, y2, 0) != fate ||
+                    m_im->getIter(x2, y2) != iter ||
+                    std::abs(m_im->getIndex(x2, y2, 0) - index) > index_delta)
+                {
+                    m_aa_pixels[y * w + x] = true;
+                    m_aa_pixels[y2 * w + x2] = true;
+                }
             }
         }
-        reset_progress(1.0);
     }
-    stats_changed();
+}
+
+bool fractFunc::needs_aa(int x, int y) const
+{
+    return m_aa_pixels.empty() || m_aa_pixels[y * m_im->Xres() + x];
 }
 
 void fractFunc::reset_counts()
@@ -125,9 +312,10 @@ void fractFunc::reset_counts()
 
 void fractFunc::reset_progress(float progress)
 {
-    m_worker->flush();
-    image_changed(0, 0, m_im->Xres(), m_im->Yres());
-    progress_changed(progress);
+    flush();
+    rows_changed(0, m_im->Yres());
+    m_progress = progress;
+    report_changes(true);
 }
 
 // change everything with a fate of IN to UNKNOWN, because
@@ -167,7 +355,14 @@ void fractFunc::draw_all()
     // profile & optimize the rest of the code without it confusing matters
 
     float minp = 0.0, maxp = 0.3;
-    draw(16, 16, minp, maxp);
+    if (m_options.draw_type == DRAW_SUBDIVIDE)
+    {
+        draw_subdivide(minp, maxp);
+    }
+    else
+    {
+        draw(16, 16, minp, maxp);
+    }
 
     maxp = m_options.eaa == AA_NONE ? 0.9 : 0.5;
     int improvement_flags;
@@ -189,7 +384,14 @@ void fractFunc::draw_all()
             status_changed(GF4D_FRACTAL_TIGHTENING);
         }
         clear_in_fates();
-        draw(16, 1, minp, maxp);
+        if (m_options.draw_type == DRAW_SUBDIVIDE)
+        {
+            draw_subdivide(minp, maxp);
+        }
+        else
+        {
+            draw(16, 1, minp, maxp);
+        }
     }
 
     if (m_options.eaa > AA_NONE)
@@ -200,7 +402,8 @@ void fractFunc::draw_all()
     else
     {
         set_progress_range(0.0, 1.0);
-        progress_changed(1.0);
+        m_progress = 1.0;
+        report_changes(true);
     }
 
     // we do this after antialiasing because otherwise sometimes the
@@ -217,7 +420,8 @@ void fractFunc::draw_all()
     }
 #endif
 
-    progress_changed(0.0);
+    m_progress = 0.0;
+    report_changes(true);
     status_changed(GF4D_FRACTAL_DONE);
 
     if (m_debug_flags & DEBUG_TIMING)
@@ -280,6 +484,26 @@ void fractFunc::draw(int rsize, int drawsize, float min_progress, float max_prog
     stats_changed();
 }
 
+// Mariani-Silver: calculate the edges of the image and keep dividing it until
+// the edges of each part are all the same, then fill in the insides
+void fractFunc::draw_subdivide(float min_progress, float max_progress)
+{
+    reset_counts();
+
+    const auto w = m_im->Xres();
+    const auto h = m_im->Yres();
+
+    m_last_update_y = 0;
+    set_progress_range(min_progress, max_progress);
+    reset_progress(0.0);
+
+    m_worker->rect(0, 0, w, h);
+    update_image(h);
+
+    reset_progress(1.0);
+    stats_changed();
+}
+
 void fractFunc::set_debug_flags(int debug_flags)
 {
     m_debug_flags = debug_flags;
@@ -289,5 +513,6 @@ void fractFunc::set_progress_range(float min, float max)
 {
     m_min_progress = min;
     m_delta_progress = max - min;
+    m_progress = 0.0;
     assert(m_delta_progress > 0.0);
 }
@@ -1,6 +1,10 @@
 #ifndef __FRACTFUNC_H_INCLUDED__
 #define __FRACTFUNC_H_INCLUDED__
 
+#include <vector>
+#include <atomic>
+#include <chrono>
+
 #include "model/vectors.h"
 #include "model/worker.h"
 #include "model/site.h"
@@ -10,6 +14,7 @@
 #include "model/fractgeometry.h"
 
 class IImage;
+class ReferenceOrbit;
 
 /* this contains stuff which is useful for drawing the fractal,
    but can be recalculated at will, so isn't part of the fractal's
@@ -25,7 +30,9 @@ public:
         d *location_params,
         IFractWorker *,
         IImage *,
-        IFractalSite *);
+        IFractalSite *,
+        const ReferenceOrbit *orbit = nullptr,
+        const d *center_lo = nullptr);
     ~fractFunc() = default;
 
     // additional flags controlling debugging & profiling options
@@ -49,19 +56,13 @@ public:
     }
     inline void status_changed(int status_val)
     {
+        m_status = status_val;
         m_site->status_changed(status_val);
     }
 
     // IWorkerContext
-    inline void image_changed(int x1, int x2, int y1, int y2) const
-    {
-        m_site->image_changed(x1, x2, y1, y2);
-    }
-    inline void progress_changed(float progress) const
-    {
-        const float adjusted_progress = m_min_progress + progress * m_delta_progress;
-        m_site->progress_changed(adjusted_progress);
-    }
+    void rows_changed(int y1, int y2) const;
+    void progress_changed(float progress) const;
     inline bool try_finished_cond() const
     {
         return m_site->is_interrupted();
@@ -75,6 +76,11 @@ public:
     inline const calc_options& get_options() const {
         return m_options;
     }
+    inline const ReferenceOrbit *get_reference_orbit() const {
+        return m_orbit;
+    }
+    bool needs_aa(int x, int y) const;
+    void wait_turn() const;
 
 private:
 
@@ -95,18 +101,47 @@ private:
     IImage *m_im;
     IFractWorker *m_worker;
     IFractalSite *m_site;
+    const ReferenceOrbit *m_orbit;
     // last time we redrew the image to this line
     int m_last_update_y;
     float m_min_progress;
     float m_delta_progress;
     pixel_stat_t m_stats;
+    // the rows which have changed since we last told the site, packed
+    // into one value so workers can add to them without a lock, and
+    // how far through the current pass the workers have got
+    mutable std::atomic<unsigned long long> m_dirty_rows;
+    mutable std::atomic<float> m_progress;
+    std::chrono::steady_clock::time_point m_last_report;
+    float m_reported_progress;
+    // pixels fast or adaptive antialiasing should calculate subpixels
+    // for, or empty to do all of them
+    std::vector<bool> m_aa_pixels;
+    // what we last told the site we were doing, to go back to after a pause
+    int m_status;
+
+    // with update_rate 0, how often to look for finished jobs to report
+    static constexpr double MIN_REPORT_INTERVAL = 0.001;
 
     void draw(int rsize, int drawsize, float min_progress, float max_progress);
+    void draw_subdivide(float min_progress, float max_progress);
     void draw_aa(float min_progress, float max_progress);
+    // decide which pixels the antialiasing pass should calculate
+    // subpixels for, before it changes any of them
+    void find_aa_pixels();
 
     // redraw the image to this line
-    // also checks for interruptions & returns true if we should stop
+    // also checks for interruptions & returns true if we should stop,
+    // and waits for any more important calculation to finish
     bool update_image(int i);
+    // give way to a more important calculation
+    void pause();
+    // tell the site which rows have changed and how far we've got, if
+    // it's been long enough since we last did, or if force is set
+    void report_changes(bool force);
+    // wait for the workers to finish the jobs they've been given,
+    // reporting on them as they go
+    void flush();
 
     // prepare for deepening by clearing 'in'-fated pixels
     void clear_in_fates();
@@ -1,9 +1,13 @@
 #ifndef __FRACTGEOMETRY_H_INCLUDED__
 #define __FRACTGEOMETRY_H_INCLUDED__
 
+#include "fract_dd.h"
+
 #include "model/vectors.h"
 #include "model/enums.h"
 
+typedef vec4<dd_real> ddvec4;
+
 /*
     this class performs the geometry calculations to give each point
     within a 2d slice or 3d projection its corresponding 4-dimensional
@@ -19,6 +23,9 @@ public:
     dvec4 topleft;                // top left corner of screen
     dvec4 aa_topleft;             // topleft - offset to 1st subpixel to draw
     dvec4 eye_point;              // where user's eye is (for 3d mode)
+    // topleft and aa_topleft in double-double precision, for formulas
+    // compiled with it
+    ddvec4 precise_topleft, precise_aa_topleft;
 
     fract_geometry(
         double *location, // x, y, z, w, magnitude, xy, xz, xw, yz, yw, zw
@@ -26,7 +33,9 @@ public:
         int width,
         int height,
         int x_offset,
-        int y_offset) noexcept
+        int y_offset,
+        // if set, the digits of the center's x, y, z, w beyond a double's
+        const double *center_lo = nullptr) noexcept
     {
         const dvec4 center = dvec4(
             location[XCENTER], location[YCENTER],
@@ -53,6 +62,21 @@ public:
         topleft += delta_aa_x + delta_aa_y;
         // antialias: offset to middle of top left quadrant of pixel
         aa_topleft = topleft - (delta_aa_y + delta_aa_x) / 2.0;
+
+        // the same again relative to the center, which can't be
+        // represented in a double but the offset from it can
+        dvec4 offset = deltax * (-width / 2.0) - deltay * height / 2.0;
+        offset += x_offset * deltax;
+        offset += y_offset * deltay;
+        offset += delta_aa_x + delta_aa_y;
+        const dvec4 aa_offset = offset - (delta_aa_y + delta_aa_x) / 2.0;
+        for (int i = 0; i < 4; ++i)
+        {
+            const dd_real precise_center =
+                dd_real(center.n[i]) + (center_lo ? center_lo[i] : 0.0);
+            precise_topleft.n[i] = precise_center + offset.n[i];
+            precise_aa_topleft.n[i] = precise_center + aa_offset.n[i];
+        }
     }
 
     inline dvec4 vec_for_point_2d(double x, double y) const
@@ -65,6 +89,18 @@ public:
         return aa_topleft + x * deltax + y * deltay;
     }
 
+    // the same in double-double precision, returned as the nearest
+    // doubles with the low-order parts in lo
+    inline dvec4 precise_vec_for_point_2d(double x, double y, dvec4 &lo) const
+    {
+        return split(precise_topleft, x * deltax + y * deltay, lo);
+    }
+
+    inline dvec4 precise_vec_for_point_2d_aa(double x, double y, dvec4 &lo) const
+    {
+        return split(precise_aa_topleft, x * deltax + y * deltay, lo);
+    }
+
     // a vector from the eye through the pixel at (x,y)
     inline dvec4 vec_for_point_3d(double x, double y) const
     {
@@ -92,6 +128,20 @@ public:
             rotYW<double>(location[YWANGLE]) *
             rotZW<double>(location[ZWANGLE]);
     }
+
+private:
+    // origin + offset, as high- and low-order parts
+    static dvec4 split(const ddvec4 &origin, const dvec4 &offset, dvec4 &lo)
+    {
+        dvec4 hi;
+        for (int i = 0; i < 4; ++i)
+        {
+            const dd_real sum = origin.n[i] + offset.n[i];
+            hi.n[i] = sum.hi;
+            lo.n[i] = sum.lo;
+        }
+        return hi;
+    }
 };
 
 #endif
\ No newline at end of file
@@ -1,8 +1,14 @@
+#include <algorithm>
 #include <cassert>
 #include <cstdlib>
 #include <cstdio>
 #include <cmath>
+#include <cstring>
 #include <new>
+#include <vector>
+
+#include <sys/mman.h>
+#include <unistd.h>
 
 #include "image.h"
 #include "model/color.h"
@@ -14,8 +20,13 @@
 
 const int image::N_SUBPIXELS = 4;
 
-image::image()
+image::image(image_buffers_t buffers, const char *backing_dir)
 {
+    m_backing_dir = backing_dir ? backing_dir : "";
+    m_mapping = NULL;
+    m_mapping_size = 0;
+    m_buffers = buffers;
+    m_nsub = buffers == IMAGE_BUFFERS_FULL ? N_SUBPIXELS : 1;
     m_Xres = m_Yres = 0;
     m_totalXres = m_totalYres = 0;
     m_xoffset = m_yoffset = 0;
@@ -23,10 +34,23 @@ image::image()
     iter_buf = NULL;
     fate_buf = NULL;
     index_buf = NULL;
+    state_buf = NULL;
+    m_state_size = 0;
 }
 
 image::image(const image &im)
 {
+    state_buf = NULL;
+    m_state_size = 0;
+    m_buffers = im.m_buffers;
+    m_nsub = im.m_nsub;
+    m_backing_dir = im.m_backing_dir;
+    m_mapping = NULL;
+    m_mapping_size = 0;
+    buffer = NULL;
+    iter_buf = NULL;
+    fate_buf = NULL;
+    index_buf = NULL;
     m_Xres = im.m_Xres;
     m_Yres = im.m_Yres;
     m_totalXres = im.m_totalXres;
@@ -43,37 +67,135 @@ image::~image()
 
 void image::delete_buffers()
 {
-    delete[] buffer;
-    delete[] iter_buf;
-    delete[] fate_buf;
-    delete[] index_buf;
+    if (m_mapping)
+    {
+        munmap(m_mapping, m_mapping_size);
+        m_mapping = NULL;
+        m_mapping_size = 0;
+    }
+    else
+    {
+        delete[] buffer;
+        delete[] iter_buf;
+        delete[] fate_buf;
+        delete[] index_buf;
+    }
     buffer = NULL;
     iter_buf = NULL;
     fate_buf = NULL;
     index_buf = NULL;
+    free_state();
+}
+
+bool image::alloc_state(int size)
+{
+    free_state();
+    state_buf = new (std::nothrow) double[pixel_index(0, m_Yres) * size]();
+    if (!state_buf)
+    {
+        return false;
+    }
+    m_state_size = size;
+    return true;
+}
+
+void image::free_state()
+{
+    delete[] state_buf;
+    state_buf = NULL;
+    m_state_size = 0;
 }
 
 bool image::alloc_buffers()
 {
-    // @TODO: find a way to reduce memory usage when (m_Xres * m_Yres > MAX_RECOLOR_SIZE)
+    if (!m_backing_dir.empty())
+    {
+        if (!map_buffers())
+        {
+            return false;
+        }
+        clear();
+        return true;
+    }
     buffer = new (std::nothrow) char[bytes()];
-    iter_buf = new (std::nothrow) int[m_Xres * m_Yres];
-    if (!buffer || !iter_buf)
+    fate_buf = new (std::nothrow) fate_t[index_of_sentinel_subpixel()];
+    if (!buffer || !fate_buf)
     {
         delete_buffers();
         return false;
     }
-    index_buf = new (std::nothrow) float[m_Xres * m_Yres * N_SUBPIXELS];
-    fate_buf = new (std::nothrow) fate_t[m_Xres * m_Yres * N_SUBPIXELS];
-    if (!index_buf || !fate_buf)
+    if (m_buffers >= IMAGE_BUFFERS_RGB_ITER)
     {
-        delete_buffers();
-        return false;
+        iter_buf = new (std::nothrow) int[pixel_index(0, m_Yres)];
+        if (!iter_buf)
+        {
+            delete_buffers();
+            return false;
+        }
+    }
+    if (m_buffers == IMAGE_BUFFERS_FULL)
+    {
+        index_buf = new (std::nothrow) float[index_of_sentinel_subpixel()];
+        if (!index_buf)
+        {
+            delete_buffers();
+            return false;
+        }
     }
     clear();
     return true;
 }
 
+// put all the buffers one after another in a new scratch file, which is
+// sparse so it takes no disk space until pages are written. It's unlinked
+// as soon as it's mapped, so the space is freed along with the mapping
+bool image::map_buffers()
+{
+    const std::size_t npixels = pixel_index(0, m_Yres);
+    // start each buffer suitably aligned for its type
+    const auto align = [](std::size_t n) { return (n + 7) & ~std::size_t(7); };
+    const std::size_t fate_offset = align(bytes());
+    const std::size_t fate_size = index_of_sentinel_subpixel() * sizeof(fate_t);
+    const std::size_t iter_offset = align(fate_offset + fate_size);
+    const std::size_t iter_size =
+        m_buffers >= IMAGE_BUFFERS_RGB_ITER ? npixels * sizeof(int) : 0;
+    const std::size_t index_offset = align(iter_offset + iter_size);
+    const std::size_t index_size =
+        m_buffers == IMAGE_BUFFERS_FULL ? index_of_sentinel_subpixel() * sizeof(float) : 0;
+    const std::size_t size = index_offset + index_size;
+    if (size == 0)
+    {
+        return false;
+    }
+
+    std::string path = m_backing_dir + "/fract4d-image-XXXXXX";
+    const int fd = mkstemp(&path[0]);
+    if (fd == -1)
+    {
+        return false;
+    }
+    unlink(path.c_str());
+    void *mapping = MAP_FAILED;
+    if (ftruncate(fd, size) == 0)
+    {
+        mapping = mmap(NULL, size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    }
+    close(fd);
+    if (mapping == MAP_FAILED)
+    {
+        return false;
+    }
+
+    m_mapping = mapping;
+    m_mapping_size = size;
+    char *base = static_cast<char *>(mapping);
+    buffer = base;
+    fate_buf = reinterpret_cast<fate_t *>(base + fate_offset);
+    iter_buf = iter_size ? reinterpret_cast<int *>(base + iter_offset) : NULL;
+    index_buf = index_size ? reinterpret_cast<float *>(base + index_offset) : NULL;
+    return true;
+}
+
 bool image::ok()
 {
     return buffer != NULL;
@@ -81,17 +203,17 @@ bool image::ok()
 
 int image::getNSubPixels() const
 {
-    return N_SUBPIXELS;
+    return m_nsub;
 }
 
-int image::bytes() const
+std::size_t image::bytes() const
 {
-    return row_length() * m_Yres;
+    return pixel_index(0, m_Yres) * 3;
 }
 
 void image::put(int x, int y, rgba_t pixel)
 {
-    int off = x * 3 + y * m_Xres * 3;
+    const std::size_t off = pixel_index(x, y) * 3;
     assert(off + BLUE < bytes());
     char *start = buffer + off;
     start[RED] = pixel.r;
@@ -101,7 +223,7 @@ void image::put(int x, int y, rgba_t pixel)
 
 rgba_t image::get(int x, int y) const
 {
-    char *start = buffer + x * 3 + y * m_Xres * 3;
+    char *start = buffer + pixel_index(x, y) * 3;
     //assert(start  + 2 - buffer <= bytes());
     rgba_t pixel;
     pixel.r = start[RED];
@@ -113,12 +235,22 @@ rgba_t image::get(int x, int y) const
 
 int image::getIter(int x, int y) const
 {
-    return iter_buf[x + y * m_Xres];
+    if (!iter_buf)
+    {
+        // the formulas report -1 iterations for inside points
+        const fate_t fate = getFate(x, y, 0);
+        return fate != FATE_UNKNOWN && (fate & FATE_INSIDE) ? -1 : 0;
+    }
+    return iter_buf[pixel_index(x, y)];
 }
 
 void image::setIter(int x, int y, int iter)
 {
-    iter_buf[x + y * m_Xres] = iter;
+    if (!iter_buf)
+    {
+        return;
+    }
+    iter_buf[pixel_index(x, y)] = iter;
 }
 
 bool image::hasFate() const
@@ -142,8 +274,9 @@ bool image::set_resolution(int x, int y, int totalx, int totaly)
     m_totalXres = totalx;
     m_totalYres = totaly;
     delete_buffers();
-    if (!alloc_buffers())
+    if (!alloc_buffers() || isMapped())
     {
+        // a new scratch file reads as zeros, which is already black
         return true;
     }
     rgba_t pixel = {
@@ -186,7 +319,7 @@ void image::fill_subpixels(int x, int y)
 {
     fate_t fate = getFate(x, y, 0);
     float index = getIndex(x, y, 0);
-    for (int i = 1; i < N_SUBPIXELS; ++i)
+    for (int i = 1; i < m_nsub; ++i)
     {
         setFate(x, y, i, fate);
         setIndex(x, y, i, index);
@@ -197,14 +330,17 @@ void image::clear_fate(int x, int y)
 {
     if (!fate_buf)
         return;
-    int base = index_of_subpixel(x, y, 0);
-    for (int i = base; i < base + N_SUBPIXELS; ++i)
+    const std::size_t base = index_of_subpixel(x, y, 0);
+    for (std::size_t i = base; i < base + m_nsub; ++i)
     {
         fate_buf[i] = FATE_UNKNOWN;
 #ifndef NDEBUG
         // index is only meaningful if fate is known, but set this for
         // testing purposes
-        index_buf[i] = 1e30;
+        if (index_buf)
+        {
+            index_buf[i] = 1e30;
+        }
 #endif
     }
 }
@@ -218,49 +354,195 @@ fate_t image::getFate(int x, int y, int subpixel) const
 void image::setFate(int x, int y, int subpixel, fate_t fate)
 {
     assert(fate_buf != NULL);
-    int i = index_of_subpixel(x, y, subpixel);
+    const std::size_t i = index_of_subpixel(x, y, subpixel);
     fate_buf[i] = fate;
 }
 
 float image::getIndex(int x, int y, int subpixel) const
 {
-    assert(index_buf != NULL);
+    if (!index_buf)
+    {
+        return 0.0;
+    }
     return index_buf[index_of_subpixel(x, y, subpixel)];
 }
 
 void image::setIndex(int x, int y, int subpixel, float index)
 {
-    assert(index_buf != NULL);
-    int i = index_of_subpixel(x, y, subpixel);
+    if (!index_buf)
+    {
+        return;
+    }
+    const std::size_t i = index_of_subpixel(x, y, subpixel);
     index_buf[i] = index;
 }
 
-int image::index_of_subpixel(int x, int y, int subpixel) const
+std::size_t image::index_of_subpixel(int x, int y, int subpixel) const
 {
-    assert(subpixel >= 0 && subpixel < N_SUBPIXELS);
+    assert(subpixel >= 0 && subpixel < m_nsub);
     assert(x >= 0 && x < m_Xres);
     assert(y >= 0 && y < m_Yres);
-    return (y * m_Xres + x) * N_SUBPIXELS + subpixel;
+    return pixel_index(x, y) * m_nsub + subpixel;
 }
 
-int image::index_of_sentinel_subpixel() const
+std::size_t image::index_of_sentinel_subpixel() const
 {
-    return m_Xres * m_Yres * N_SUBPIXELS;
+    return pixel_index(0, m_Yres) * m_nsub;
 }
 
 void image::clear()
 {
-    int fate_pos = 0;
     // no need to clear image buffer, just iters and fate
+    if (iter_buf)
+    {
+        std::fill(iter_buf, iter_buf + pixel_index(0, m_Yres), -1);
+    }
+    std::fill(fate_buf, fate_buf + index_of_sentinel_subpixel(), FATE_UNKNOWN);
+}
+
+// move the n elements per pixel of buf as image::shift describes,
+// leaving the pixels which are exposed as they were
+template <typename T>
+static void shift_buffer(T *buf, int xres, int yres, int n, int dx, int dy)
+{
+    const int width = xres - std::abs(dx);
+    const int dest_x = dx < 0 ? -dx : 0;
+    const int src_x = dx < 0 ? 0 : dx;
+    // go through the rows in the order which doesn't overwrite a row
+    // before it's been moved
+    const int first_y = dy < 0 ? yres - 1 : 0;
+    const int step = dy < 0 ? -1 : 1;
+    for (int i = 0; i < yres - std::abs(dy); ++i)
+    {
+        const int y = first_y + i * step;
+        memmove(
+            buf + (static_cast<std::size_t>(y) * xres + dest_x) * n,
+            buf + (static_cast<std::size_t>(y + dy) * xres + src_x) * n,
+            width * n * sizeof(T));
+    }
+}
+
+void image::shift(int dx, int dy)
+{
+    if (std::abs(dx) >= m_Xres || std::abs(dy) >= m_Yres)
+    {
+        // nothing left to keep
+        clear();
+        return;
+    }
+    if (dx == 0 && dy == 0)
+    {
+        return;
+    }
+    shift_buffer(buffer, m_Xres, m_Yres, 3, dx, dy);
+    shift_buffer(fate_buf, m_Xres, m_Yres, m_nsub, dx, dy);
+    if (iter_buf)
+    {
+        shift_buffer(iter_buf, m_Xres, m_Yres, 1, dx, dy);
+    }
+    if (index_buf)
+    {
+        shift_buffer(index_buf, m_Xres, m_Yres, m_nsub, dx, dy);
+    }
+    // iteration state is only kept during a calculation
+    free_state();
+
     for (int y = 0; y < m_Yres; ++y)
     {
+        const bool exposed_row = y + dy < 0 || y + dy >= m_Yres;
         for (int x = 0; x < m_Xres; ++x)
         {
-            iter_buf[y * m_Xres + x] = -1;
-            for (int n = 0; n < N_SUBPIXELS; ++n)
+            if (exposed_row || x + dx < 0 || x + dx >= m_Xres)
             {
-                fate_buf[fate_pos++] = FATE_UNKNOWN;
+                setIter(x, y, -1);
+                clear_fate(x, y);
             }
         }
     }
 }
+
+// for each of n new pixels, the old pixel its center lands on, or -1
+static std::vector<int> rescale_map(double start, double scale, int n)
+{
+    std::vector<int> map(n, -1);
+    for (int i = 0; i < n; ++i)
+    {
+        const double pos = start + i * scale;
+        const double nearest = std::round(pos);
+        if (std::fabs(pos - nearest) < 1.0e-6 && nearest >= 0 && nearest < n)
+        {
+            map[i] = static_cast<int>(nearest);
+        }
+    }
+    return map;
+}
+
+bool image::rescale(double x0, double y0, double scale)
+{
+    const std::vector<int> xmap = rescale_map(x0, scale, m_Xres);
+    const std::vector<int> ymap = rescale_map(y0, scale, m_Yres);
+
+    struct kept_pixel
+    {
+        int x, y;
+        int iter;
+        fate_t fate;
+        float index;
+        rgba_t color;
+    };
+    std::vector<kept_pixel> kept;
+    for (int y = 0; y < m_Yres; ++y)
+    {
+        const int old_y = ymap[y];
+        if (old_y == -1)
+        {
+            continue;
+        }
+        for (int x = 0; x < m_Xres; ++x)
+        {
+            const int old_x = xmap[x];
+            if (old_x == -1)
+            {
+                continue;
+            }
+            const fate_t fate = getFate(old_x, old_y, 0);
+            const float index = getIndex(old_x, old_y, 0);
+            if (fate == FATE_UNKNOWN)
+            {
+                continue;
+            }
+            // antialiasing replaces subpixel 0's sample at the center of
+            // the pixel with one nearer its corner, so only keep pixels
+            // which weren't antialiased, or where it made no difference
+            bool center = true;
+            for (int n = 1; n < m_nsub; ++n)
+            {
+                const fate_t sub_fate = getFate(old_x, old_y, n);
+                if (sub_fate != FATE_UNKNOWN &&
+                    (sub_fate != fate || getIndex(old_x, old_y, n) != index))
+                {
+                    center = false;
+                    break;
+                }
+            }
+            if (center)
+            {
+                kept.push_back({
+                    x, y,
+                    getIter(old_x, old_y), fate, index,
+                    get(old_x, old_y)});
+            }
+        }
+    }
+
+    clear();
+    free_state();
+    for (const kept_pixel &p : kept)
+    {
+        setIter(p.x, p.y, p.iter);
+        setFate(p.x, p.y, 0, p.fate);
+        setIndex(p.x, p.y, 0, p.index);
+        put(p.x, p.y, p.color);
+    }
+    return !kept.empty();
+}
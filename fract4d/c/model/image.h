@@ -2,8 +2,11 @@
 #define __IMAGE_H_INCLUDED__
 
 #include <cassert>
+#include <cstddef>
+#include <string>
 
 #include "pf.h"
+#include "model/enums.h"
 
 typedef struct s_rgba rgba_t;
 
@@ -22,6 +25,17 @@ public:
     virtual double ratio() const = 0;
     // set every iter value to -1. Other data need not be cleared
     virtual void clear() = 0;
+    // move the image's contents for a view which has moved dx pixels
+    // right and dy down: each pixel takes the colors, iters, fates and
+    // indexes of the one which was at (x + dx, y + dy), or is cleared
+    // if that was outside the image
+    virtual void shift(int dx, int dy) = 0;
+    // keep the pixels of a view which has been zoomed and moved whose
+    // centers land exactly on old ones: pixel (x, y) takes the iter,
+    // fate and index of the one at (x0 + x * scale, y0 + y * scale) if
+    // that's a whole pixel. The rest are cleared. Returns false if
+    // nothing was kept
+    virtual bool rescale(double x0, double y0, double scale) = 0;
 
     // return number of pixels wide this image is
     virtual int Xres() const = 0;
@@ -42,6 +56,11 @@ public:
     virtual char *getBuffer() const = 0;
     inline int row_length() const { return Xres() * 3; };
 
+    // which per-pixel data this image keeps. Without iteration counts
+    // getIter only tells inside (-1) from not; without color indexes
+    // getIndex returns 0. Setting either does nothing
+    virtual image_buffers_t buffers() const = 0;
+
     // accessors for iteration data
     virtual int getIter(int x, int y) const = 0;
     virtual void setIter(int x, int y, int iter) = 0;
@@ -59,6 +78,14 @@ public:
 
     virtual int getNSubPixels() const = 0;
     virtual bool hasUnknownSubpixels(int x, int y) const = 0;
+
+    // accessors for iteration state, which lets pixels left inside by
+    // one pass carry on from there in the next (see calc_resume in pf.h).
+    // Allocate size doubles per pixel, all zero. Returns false if out of memory
+    virtual bool alloc_state(int size) = 0;
+    virtual void free_state() = 0;
+    // nullptr unless state is allocated
+    virtual double *getState(int x, int y) const = 0;
 };
 
 class image : public IImage
@@ -81,14 +108,35 @@ class image : public IImage
     /* the fate of each pixel */
     fate_t *fate_buf;
 
+    /* the iteration state of each pixel, only while calculating */
+    double *state_buf;
+    int m_state_size;
+
+    /* which of the buffers above are allocated */
+    image_buffers_t m_buffers;
+    /* subpixels with a fate (and index) per pixel */
+    int m_nsub;
+
+    /* if set, the buffers live in a scratch file in this directory rather
+       than on the heap, so the kernel can page them out */
+    std::string m_backing_dir;
+    /* the mapping of that file, holding all of the buffers */
+    void *m_mapping;
+    std::size_t m_mapping_size;
+
     void delete_buffers();
     bool alloc_buffers();
+    bool map_buffers();
     void clear_fate(int x, int y);
+    inline std::size_t pixel_index(int x, int y) const
+    {
+        return static_cast<std::size_t>(y) * m_Xres + x;
+    }
 
 public:
     static const int N_SUBPIXELS;
 
-    image();
+    image(image_buffers_t buffers = IMAGE_BUFFERS_FULL, const char *backing_dir = nullptr);
     image(const image &im);
     ~image();
 
@@ -101,7 +149,7 @@ public:
         if (!hasFate())
             return true;
 
-        for (int i = 0; i < N_SUBPIXELS; ++i)
+        for (int i = 0; i < m_nsub; ++i)
         {
             if (getFate(x, y, i) == FATE_UNKNOWN)
             {
@@ -129,12 +177,15 @@ public:
 
     // utilities
 
-    int bytes() const;
+    std::size_t bytes() const;
+    inline bool isMapped() const { return m_mapping != nullptr; }
 
     // accessors
     void put(int x, int y, rgba_t pixel);
     rgba_t get(int x, int y) const;
 
+    inline image_buffers_t buffers() const { return m_buffers; }
+
     int getIter(int x, int y) const;
     void setIter(int x, int y, int iter);
     bool hasFate() const;
@@ -145,10 +196,10 @@ public:
     float getIndex(int x, int y, int subpixel) const;
     void setIndex(int x, int y, int subpixel, float index);
 
-    int index_of_subpixel(int x, int y, int subpixel) const;
+    std::size_t index_of_subpixel(int x, int y, int subpixel) const;
 
     // one beyond last pixel
-    int index_of_sentinel_subpixel() const;
+    std::size_t index_of_sentinel_subpixel() const;
 
     void fill_subpixels(int x, int y);
 
@@ -157,6 +208,19 @@ public:
 
     double ratio() const;
     void clear();
+    void shift(int dx, int dy);
+    bool rescale(double x0, double y0, double scale);
+
+    bool alloc_state(int size);
+    void free_state();
+    inline double *getState(int x, int y) const
+    {
+        if (!state_buf)
+        {
+            return nullptr;
+        }
+        return state_buf + pixel_index(x, y) * m_state_size;
+    }
 };
 
 #endif
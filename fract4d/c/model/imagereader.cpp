@@ -117,7 +117,7 @@ bool png_reader::read_tile()
     {
         for (auto y = 0; y < im->Yres(); ++y)
         {
-            png_bytep row = (png_bytep)(im->getBuffer() + im->row_length() * y);
+            png_bytep row = (png_bytep)(im->getBuffer() + static_cast<std::size_t>(im->row_length()) * y);
             png_read_rows(png_ptr, &row, (png_bytepp)NULL, 1);
         }
     }
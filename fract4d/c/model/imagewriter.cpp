@@ -49,6 +49,20 @@ image_writer::image_writer(FILE *fp_, IImage *image_)
     im = image_;
 }
 
+bool image_writer::save_tile()
+{
+    return write_rows(im);
+}
+
+bool image_writer::save_tile(IImage *tile)
+{
+    if (tile->totalXres() != im->totalXres() || tile->totalYres() != im->totalYres())
+    {
+        return false;
+    }
+    return write_rows(tile);
+}
+
 /******
 * TGA *
 *******/
@@ -78,13 +92,13 @@ bool tga_writer::save_header()
     return true;
 }
 
-bool tga_writer::save_tile()
+bool tga_writer::write_rows(IImage *tile)
 {
-    for (auto y = 0; y < im->Yres(); ++y)
+    for (auto y = 0; y < tile->Yres(); ++y)
     {
-        for (int x = 0; x < im->Xres(); ++x)
+        for (int x = 0; x < tile->Xres(); ++x)
         {
-            rgba_t pixel = im->get(x, y);
+            rgba_t pixel = tile->get(x, y);
             std::fputc(pixel.b, fp);
             std::fputc(pixel.g, fp);
             std::fputc(pixel.r, fp);
@@ -162,11 +176,11 @@ bool png_writer::save_header()
     return true;
 }
 
-bool png_writer::save_tile()
+bool png_writer::write_rows(IImage *tile)
 {
-    for (auto y = 0; y < im->Yres(); ++y)
+    for (auto y = 0; y < tile->Yres(); ++y)
     {
-        png_bytep row = (png_bytep)(im->getBuffer() + im->row_length() * y);
+        png_bytep row = (png_bytep)(tile->getBuffer() + static_cast<std::size_t>(tile->row_length()) * y);
         png_write_rows(png_ptr, &row, 1);
     }
     return true;
@@ -205,11 +219,11 @@ bool jpg_writer::save_header()
     return true;
 }
 
-bool jpg_writer::save_tile()
+bool jpg_writer::write_rows(IImage *tile)
 {
-    for (auto y = 0; y < im->Yres(); ++y)
+    for (auto y = 0; y < tile->Yres(); ++y)
     {
-        JSAMPROW row = (JSAMPROW)(im->getBuffer() + im->row_length() * y);
+        JSAMPROW row = (JSAMPROW)(tile->getBuffer() + static_cast<std::size_t>(tile->row_length()) * y);
         jpeg_write_scanlines(&cinfo, &row, 1);
     }
     return true;
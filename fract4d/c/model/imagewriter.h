@@ -14,6 +14,9 @@ public:
     static ImageWriter *create(image_file_t type, FILE *fp, IImage *image);
     virtual bool save_header() = 0;
     virtual bool save_tile() = 0;
+    // save the rows of another image, which must have the same total size.
+    // Lets several tiles be drawn at once, each in an image of its own
+    virtual bool save_tile(IImage *tile) = 0;
     virtual bool save_footer() = 0;
     bool save();
 };
@@ -22,8 +25,11 @@ class image_writer : public ImageWriter
 {
 public:
     virtual ~image_writer();
+    bool save_tile();
+    bool save_tile(IImage *tile);
 protected:
     image_writer(FILE *fp_, IImage *image_);
+    virtual bool write_rows(IImage *tile) = 0;
     FILE *fp;
     IImage *im;
 };
@@ -33,8 +39,9 @@ class tga_writer : public image_writer
 public:
     tga_writer(FILE *fp, IImage *image);
     bool save_header();
-    bool save_tile();
     bool save_footer();
+protected:
+    bool write_rows(IImage *tile);
 };
 
 #ifdef PNG_ENABLED
@@ -48,8 +55,9 @@ public:
     png_writer(FILE *fp, IImage *image);
     ~png_writer();
     bool save_header();
-    bool save_tile();
     bool save_footer();
+protected:
+    bool write_rows(IImage *tile);
 private:
     bool ok;
     png_structp png_ptr;
@@ -70,8 +78,9 @@ public:
     ~jpg_writer(){}
 
     bool save_header();
-    bool save_tile();
     bool save_footer();
+protected:
+    bool write_rows(IImage *tile);
 
 private:
     bool ok;
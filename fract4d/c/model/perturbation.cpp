@@ -0,0 +1,349 @@
+#include <algorithm>
+#include <cassert>
+#include <cerrno>
+#include <cmath>
+#include <cstdlib>
+
+#ifdef GMP_ENABLED
+#include <gmpxx.h>
+#endif
+
+#include "perturbation.h"
+
+#include "model/enums.h"
+
+const double ReferenceOrbit::ESCAPE_RADIUS_SQUARED = 1.0e10;
+const double ReferenceOrbit::SERIES_TOLERANCE = 1.0e-7;
+
+namespace {
+
+#ifdef GMP_ENABLED
+    typedef mpf_class hp_float;
+
+    inline bool parse(const std::string &s, int bits, hp_float &result)
+    {
+        result.set_prec(bits);
+        return 0 == mpf_set_str(result.get_mpf_t(), s.c_str(), 10);
+    }
+
+    inline void set(hp_float &x, double d, int bits)
+    {
+        x.set_prec(bits);
+        x = d;
+    }
+
+    inline double to_double(const hp_float &x)
+    {
+        return x.get_d();
+    }
+#else
+    typedef long double hp_float;
+
+    inline bool parse(const std::string &s, [[maybe_unused]] int bits, hp_float &result)
+    {
+        char *end = nullptr;
+        errno = 0;
+        result = std::strtold(s.c_str(), &end);
+        return errno == 0 && end != s.c_str() && *end == '\0';
+    }
+
+    inline void set(hp_float &x, double d, [[maybe_unused]] int bits)
+    {
+        x = d;
+    }
+
+    inline double to_double(const hp_float &x)
+    {
+        return static_cast<double>(x);
+    }
+#endif
+
+    // iterate z = z^2 + c in high precision, keeping each z rounded to double.
+    // Always records at least 2 points so there's one step to take
+    void high_precision_orbit(
+        const hp_float &zx0, const hp_float &zy0,
+        const hp_float &cx, const hp_float &cy,
+        int maxiter, int bits,
+        std::vector<ReferenceOrbit::complex_t> &orbit)
+    {
+        hp_float zx, zy, zx2, zy2;
+        set(zx, 0.0, bits);
+        set(zy, 0.0, bits);
+        set(zx2, 0.0, bits);
+        set(zy2, 0.0, bits);
+        zx = zx0;
+        zy = zy0;
+
+        orbit.clear();
+        orbit.reserve(maxiter + 2);
+        orbit.emplace_back(to_double(zx), to_double(zy));
+        for (int i = 0; i <= maxiter; ++i)
+        {
+            zx2 = zx * zx;
+            zy2 = zy * zy;
+            zy = 2 * zx * zy + cy;
+            zx = zx2 - zy2 + cx;
+            const ReferenceOrbit::complex_t z(to_double(zx), to_double(zy));
+            orbit.push_back(z);
+            if (std::norm(z) > ReferenceOrbit::ESCAPE_RADIUS_SQUARED)
+            {
+                break;
+            }
+        }
+    }
+
+    // the terms dz0^i * dc^j of the series, lowest powers first
+    struct series_terms
+    {
+        std::vector<std::pair<int, int>> powers;
+        // index of the dz0 and dc terms
+        int dz0, dc;
+        // products[k] = (t, p, q): the d^2 part of the recurrence adds
+        // coefficient p * coefficient q to coefficient t
+        std::vector<std::array<int, 3>> products;
+
+        series_terms()
+        {
+            for (int order = 1; order <= ReferenceOrbit::SERIES_ORDER; ++order)
+            {
+                for (int i = order; i >= 0; --i)
+                {
+                    powers.emplace_back(i, order - i);
+                }
+            }
+            dz0 = 0;
+            dc = 1;
+            const int n = static_cast<int>(powers.size());
+            for (int t = 0; t < n; ++t)
+            {
+                for (int p = 0; p < n; ++p)
+                {
+                    for (int q = 0; q < n; ++q)
+                    {
+                        if (powers[p].first + powers[q].first == powers[t].first &&
+                            powers[p].second + powers[q].second == powers[t].second)
+                        {
+                            products.push_back({t, p, q});
+                        }
+                    }
+                }
+            }
+        }
+    };
+
+    const series_terms &terms()
+    {
+        static const series_terms the_terms;
+        return the_terms;
+    }
+}
+
+ReferenceOrbit::ReferenceOrbit(const std::string (&center)[4]):
+    m_ok{true},
+    m_precision{0},
+    m_critical_start{false},
+    m_skip{0},
+    m_series_scale{1.0}
+{
+    for (int i = 0; i < 4; ++i)
+    {
+        hp_float value;
+        m_center[i] = center[i];
+        m_ok = m_ok && parse(m_center[i], 64, value);
+    }
+}
+
+void ReferenceOrbit::compute(int maxiter, double pixel_size)
+{
+    assert(m_ok);
+    // enough bits to tell adjacent pixels apart, plus a double's worth
+    // to spare for the iteration to eat into
+    const int zoom_bits = pixel_size > 0.0 ?
+        static_cast<int>(std::ceil(-std::log2(pixel_size))) : 0;
+    m_precision = 64 + std::max(0, zoom_bits);
+    // any old series was for a different orbit
+    m_skip = 0;
+    m_series.clear();
+
+    hp_float center[4], zero;
+    for (int i = 0; i < 4; ++i)
+    {
+        parse(m_center[i], m_precision, center[i]);
+    }
+    set(zero, 0.0, m_precision);
+
+    high_precision_orbit(
+        center[ZCENTER], center[WCENTER], center[XCENTER], center[YCENTER],
+        maxiter, m_precision, m_orbit);
+
+    m_critical_start = center[ZCENTER] == 0 && center[WCENTER] == 0;
+    if (m_critical_start)
+    {
+        m_critical.clear();
+    }
+    else
+    {
+        high_precision_orbit(
+            zero, zero, center[XCENTER], center[YCENTER],
+            maxiter, m_precision, m_critical);
+    }
+}
+
+ReferenceOrbit::complex_t ReferenceOrbit::evaluate_series(
+    const std::vector<complex_t> &coefficients, const double *offset) const
+{
+    const series_terms &t = terms();
+    const complex_t dz0 = complex_t(offset[ZCENTER], offset[WCENTER]) / m_series_scale;
+    const complex_t dc = complex_t(offset[XCENTER], offset[YCENTER]) / m_series_scale;
+    complex_t dz0_powers[SERIES_ORDER + 1], dc_powers[SERIES_ORDER + 1];
+    dz0_powers[0] = dc_powers[0] = 1.0;
+    for (int i = 1; i <= SERIES_ORDER; ++i)
+    {
+        dz0_powers[i] = dz0_powers[i - 1] * dz0;
+        dc_powers[i] = dc_powers[i - 1] * dc;
+    }
+    complex_t sum = 0.0;
+    for (size_t k = 0; k < coefficients.size(); ++k)
+    {
+        sum += coefficients[k] *
+            dz0_powers[t.powers[k].first] * dc_powers[t.powers[k].second];
+    }
+    return sum;
+}
+
+void ReferenceOrbit::compute_series(const std::vector<offset_t> &probes, int maxiter)
+{
+    m_skip = 0;
+    m_series.clear();
+
+    // scale offsets so the probes' are at most 1, which keeps high powers
+    // of tiny offsets (and correspondingly huge coefficients) in range
+    double scale = 0.0;
+    for (const auto &probe : probes)
+    {
+        scale = std::max(scale, std::hypot(probe[XCENTER], probe[YCENTER]));
+        scale = std::max(scale, std::hypot(probe[ZCENTER], probe[WCENTER]));
+    }
+    if (scale == 0.0)
+    {
+        return;
+    }
+    m_series_scale = scale;
+
+    const series_terms &t = terms();
+    std::vector<complex_t> coefficients(t.powers.size()), next(t.powers.size());
+    // d0 = dz0
+    coefficients[t.dz0] = scale;
+
+    // the probes are iterated by plain perturbation to check the series
+    std::vector<complex_t> exact;
+    for (const auto &probe : probes)
+    {
+        exact.emplace_back(probe[ZCENTER], probe[WCENTER]);
+    }
+
+    // always leave at least one real iteration, and never run past the
+    // end of the reference
+    const int limit = std::min(maxiter, length() - 1) - 1;
+    int n = 0;
+    for (; n < limit; ++n)
+    {
+        const complex_t ref = m_orbit[n];
+        for (size_t k = 0; k < coefficients.size(); ++k)
+        {
+            next[k] = 2.0 * ref * coefficients[k];
+        }
+        next[t.dc] += scale;
+        for (const auto &product : t.products)
+        {
+            next[product[0]] += coefficients[product[1]] * coefficients[product[2]];
+        }
+
+        bool valid = true;
+        for (size_t k = 0; k < probes.size() && valid; ++k)
+        {
+            const complex_t dc(probes[k][XCENTER], probes[k][YCENTER]);
+            exact[k] = 2.0 * ref * exact[k] + exact[k] * exact[k] + dc;
+            const complex_t z = m_orbit[n + 1] + exact[k];
+            // every pixel has to get through the skipped iterations
+            // without escaping or glitching
+            valid =
+                std::norm(z) < m_settings.bailout &&
+                std::norm(z) >= std::norm(exact[k]) &&
+                std::abs(evaluate_series(next, probes[k].data()) - exact[k]) <=
+                    SERIES_TOLERANCE * std::abs(exact[k]);
+        }
+        if (!valid)
+        {
+            break;
+        }
+        coefficients.swap(next);
+    }
+
+    m_skip = n;
+    if (m_skip > 0)
+    {
+        m_series.swap(coefficients);
+    }
+}
+
+int ReferenceOrbit::iterate(
+    const double *offset, int maxiter, double bailout, double *pmag) const
+{
+    assert(m_orbit.size() >= 2);
+    // after a rebase we continue along the orbit of 0
+    const std::vector<complex_t> &critical = m_critical_start ? m_orbit : m_critical;
+    const double dc_x = offset[XCENTER];
+    const double dc_y = offset[YCENTER];
+
+    const complex_t *ref = m_orbit.data();
+    size_t ref_last = m_orbit.size() - 1;
+    double delta_x = offset[ZCENTER];
+    double delta_y = offset[WCENTER];
+    size_t n = 0;
+    int numiter = 0;
+    double mag = 0.0;
+    if (m_skip > 0 && m_skip < maxiter)
+    {
+        // jump straight to where the series leaves off
+        const complex_t delta = evaluate_series(m_series, offset);
+        delta_x = delta.real();
+        delta_y = delta.imag();
+        n = m_skip;
+        numiter = m_skip;
+    }
+    while (numiter < maxiter)
+    {
+        const double ref_x = ref[n].real();
+        const double ref_y = ref[n].imag();
+        // d' = 2Zd + d^2 + dc
+        const double new_delta_x =
+            2.0 * (ref_x * delta_x - ref_y * delta_y) +
+            delta_x * delta_x - delta_y * delta_y + dc_x;
+        delta_y =
+            2.0 * (ref_x * delta_y + ref_y * delta_x) +
+            2.0 * delta_x * delta_y + dc_y;
+        delta_x = new_delta_x;
+        ++n;
+
+        const double z_x = ref[n].real() + delta_x;
+        const double z_y = ref[n].imag() + delta_y;
+        mag = z_x * z_x + z_y * z_y;
+        if (mag >= bailout)
+        {
+            break;
+        }
+        if (mag < delta_x * delta_x + delta_y * delta_y || n == ref_last)
+        {
+            // glitch, or we've run off the end of the reference: rebase
+            delta_x = z_x;
+            delta_y = z_y;
+            ref = critical.data();
+            ref_last = critical.size() - 1;
+            n = 0;
+        }
+        ++numiter;
+    }
+    *pmag = mag;
+    return numiter;
+}
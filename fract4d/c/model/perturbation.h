@@ -0,0 +1,122 @@
+#ifndef __PERTURBATION_H_INCLUDED__
+#define __PERTURBATION_H_INCLUDED__
+
+#include <array>
+#include <complex>
+#include <string>
+#include <vector>
+
+/*
+    deep zoom support for z = z^2 + c (the Mandelbrot set, and the Julia
+    sets we get by looking at it in the zw plane).
+
+    plain doubles run out of precision at a magnification of about 1e13.
+    Instead we calculate a single reference orbit, at the centre of the
+    image, with as much precision as the zoom needs, and store it rounded
+    to doubles. Every pixel is then iterated as a small double-precision
+    offset (delta) from that orbit:
+
+        d0 = dz0
+        d' = 2 * Z * d + d^2 + dc
+
+    where dz0 and dc are the pixel's offsets from the center in the zw
+    and xy planes respectively.
+
+    The delta loses precision when the pixel's orbit passes closer to 0
+    than the reference does (a "glitch"), or when the reference escapes
+    or ends before the pixel does. Either way we rebase: the pixel's
+    full value becomes the new delta against the critical orbit (the
+    orbit of 0 with the center's c), which for the Mandelbrot set is the
+    reference orbit itself.
+
+    On deep zooms every pixel spends its first iterations following the
+    reference closely, so those iterations are skipped with a series
+    approximation: d after n steps is approximated by a polynomial in
+    the pixel's dz0 and dc, whose coefficients are iterated once for the
+    whole image. We keep adding steps for as long as the polynomial
+    matches real perturbed orbits at probe points around the edge of the
+    image.
+
+    Precision beyond double needs GMP (GMP_ENABLED). Without it the
+    reference is calculated in long double, which only helps a little.
+*/
+
+class ReferenceOrbit final
+{
+public:
+    typedef std::complex<double> complex_t;
+    // offset of a point from the center in x, y, z, w
+    typedef std::array<double, 4> offset_t;
+
+    // the center's x, y, z and w coordinates, as decimal strings so they
+    // can carry more digits than a double
+    explicit ReferenceOrbit(const std::string (&center)[4]);
+
+    // were the center coordinates valid numbers?
+    bool ok() const { return m_ok; }
+
+    // how the formula being imitated decides a point has escaped, and
+    // how it colors those that do: like the continuous_potential
+    // colorfunc with this potential bailout, or by iteration count alone
+    // if that is 0, then scaled by density and shifted by offset
+    struct settings
+    {
+        double bailout = 4.0;
+        double potential = 4.0;
+        double density = 1.0;
+        double offset = 0.0;
+    };
+
+    void set_settings(const settings &s) { m_settings = s; }
+    const settings &get_settings() const { return m_settings; }
+
+    // calculate the orbits out to maxiter, precisely enough to
+    // distinguish points pixel_size apart
+    void compute(int maxiter, double pixel_size);
+
+    // work out how many iterations can be skipped by series approximation
+    // for every point within the area bounded by the probes
+    void compute_series(const std::vector<offset_t> &probes, int maxiter);
+
+    // iterate the point at offset (dx, dy, dz, dw) from the center.
+    // Returns the number of iterations before bailout, as the compiled
+    // formulas count them, and the squared modulus of the final z in *pmag
+    int iterate(const double *offset, int maxiter, double bailout, double *pmag) const;
+
+    // number of points in the reference orbit
+    int length() const { return static_cast<int>(m_orbit.size()); }
+    // bits of precision used for the last compute()
+    int precision() const { return m_precision; }
+    // iterations skipped by series approximation
+    int series_skip() const { return m_skip; }
+
+    // the reference is abandoned once it gets this far from the origin
+    static const double ESCAPE_RADIUS_SQUARED;
+    // highest total power of dz0 and dc in the series
+    enum { SERIES_ORDER = 4 };
+    // largest acceptable error in the series, relative to the real delta
+    static const double SERIES_TOLERANCE;
+
+private:
+    std::string m_center[4];
+    bool m_ok;
+    settings m_settings;
+    int m_precision;
+    // does the reference start at 0? Then it is also the critical orbit
+    bool m_critical_start;
+    // the orbit of the center
+    std::vector<complex_t> m_orbit;
+    // the orbit of 0, if that's different
+    std::vector<complex_t> m_critical;
+
+    // series coefficients for d at iteration m_skip. Powers of
+    // dz0 and dc are scaled by 1/m_series_scale to keep them in range
+    int m_skip;
+    double m_series_scale;
+    std::vector<complex_t> m_series;
+
+    complex_t evaluate_series(
+        const std::vector<complex_t> &coefficients, const double *offset) const;
+};
+
+#endif
@@ -1,5 +1,9 @@
+#include <cassert>
+
 #include "pointfunc.h"
 
+#include "model/perturbation.h"
+
 void pointFunc::calc(
     // in params
     const double *params, int nIters,
@@ -10,21 +14,62 @@ void pointFunc::calc(
     // only used for debugging
     int x, int y, int aa,
     // out params
-    rgba_t *color, int *pnIters, float *pIndex, fate_t *pFate) const
+    rgba_t *color, int *pnIters, float *pIndex, fate_t *pFate,
+    const double *params_lo, double *state) const
 {
+    if (m_orbit)
+    {
+        calc_perturbed(params, nIters, color, pnIters, pIndex, pFate);
+        return;
+    }
     double dist = 0.0;
     int fate = 0;
     int solid = 0;
     int fUseColors = 0;
     double colors[4] = {0.0};
     int inside = 0;
-    m_pfo->vtbl->calc(
-        m_pfo, params,
-        nIters, warp_param,
-        min_period_iters, period_tolerance,
-        x, y, aa,
-        pnIters, &fate, &dist, &solid,
-        &fUseColors, &colors[0]);
+    if (params_lo && is_precise())
+    {
+        const double precise_params[8] = {
+            params[0], params[1], params[2], params[3],
+            params_lo[0], params_lo[1], params_lo[2], params_lo[3]};
+        m_pfo->vtbl->calc_dd(
+            m_pfo, precise_params,
+            nIters, warp_param,
+            min_period_iters, period_tolerance,
+            x, y, aa,
+            pnIters, &fate, &dist, &solid,
+            &fUseColors, &colors[0]);
+    }
+    else if (state && can_resume())
+    {
+        m_pfo->vtbl->calc_resume(
+            m_pfo, params,
+            nIters, warp_param,
+            min_period_iters, period_tolerance,
+            x, y, aa,
+            state,
+            pnIters, &fate, &dist, &solid,
+            &fUseColors, &colors[0]);
+    }
+    else
+    {
+        m_pfo->vtbl->calc(
+            m_pfo, params,
+            nIters, warp_param,
+            min_period_iters, period_tolerance,
+            x, y, aa,
+            pnIters, &fate, &dist, &solid,
+            &fUseColors, &colors[0]);
+    }
+    if (fate == FATE_INTERRUPTED)
+    {
+        // leave the point to be calculated next time
+        *pFate = FATE_UNKNOWN;
+        *pIndex = 0.0f;
+        *color = {0, 0, 0, 255};
+        return;
+    }
     if (fate & FATE_INSIDE)
     {
         *pnIters = -1;
@@ -46,3 +91,95 @@ void pointFunc::calc(
     *pFate = (fate_t)fate;
     *pIndex = (float)dist;
 }
+
+void pointFunc::calc_perturbed(
+    const double *params, int nIters,
+    rgba_t *color, int *pnIters, float *pIndex, fate_t *pFate) const
+{
+    const ReferenceOrbit::settings &settings = m_orbit->get_settings();
+    double mag = 0.0;
+    const int iters = m_orbit->iterate(params, nIters, settings.bailout, &mag);
+    if (iters >= nIters)
+    {
+        *pnIters = -1;
+        *pIndex = 0.0f;
+        *pFate = FATE_INSIDE | FATE_SOLID;
+        *color = m_cmap->lookup_with_transfer(0.0, 1, 1);
+        return;
+    }
+    const double dist =
+        (iters + settings.potential / (mag + 1.0e-9)) / 256.0 * settings.density +
+        settings.offset;
+    *pnIters = iters;
+    *pIndex = (float)dist;
+    *pFate = 0;
+    *color = m_cmap->lookup_with_transfer(dist, 0, 0);
+}
+
+void pointFunc::calc_batch(
+    int n,
+    // in params
+    const double *xs, const double *ys, const double *zs, const double *ws,
+    int nIters,
+    // periodicity
+    bool periodicity, int last_iters, double period_tolerance,
+    // warping
+    int warp_param,
+    // only used for debugging
+    const int *px, int y, int aa,
+    double *const *states,
+    // out params
+    rgba_t *colors, int *pnIters, float *pIndex, fate_t *pFate) const
+{
+    assert(n <= BATCH_SIZE);
+    double dists[BATCH_SIZE];
+    int fates[BATCH_SIZE];
+    int solids[BATCH_SIZE];
+    int use_colors[BATCH_SIZE];
+    double direct_colors[4 * BATCH_SIZE];
+    m_pfo->vtbl->calc_batch(
+        m_pfo, n,
+        xs, ys, zs, ws,
+        nIters, warp_param,
+        periodicity, &last_iters, period_tolerance,
+        px, y, aa,
+        can_resume() ? states : nullptr,
+        pnIters, fates, dists, solids,
+        use_colors, direct_colors);
+    for (int i = 0; i < n; ++i)
+    {
+        int fate = fates[i];
+        int inside = 0;
+        if (fate == FATE_INTERRUPTED)
+        {
+            pFate[i] = FATE_UNKNOWN;
+            pIndex[i] = 0.0f;
+            colors[i] = {0, 0, 0, 255};
+            continue;
+        }
+        if (fate & FATE_INSIDE)
+        {
+            pnIters[i] = -1;
+            inside = 1;
+        }
+        if (use_colors[i])
+        {
+            double point_colors[4] = {
+                direct_colors[i], direct_colors[n + i],
+                direct_colors[2 * n + i], direct_colors[3 * n + i]
+            };
+            colors[i] = m_cmap->lookup_with_dca(solids[i], inside, point_colors);
+            fate |= FATE_DIRECT;
+        }
+        else
+        {
+            colors[i] = m_cmap->lookup_with_transfer(dists[i], solids[i], inside);
+        }
+        if (solids[i])
+        {
+            fate |= FATE_SOLID;
+        }
+        pFate[i] = (fate_t)fate;
+        pIndex[i] = (float)dists[i];
+    }
+}
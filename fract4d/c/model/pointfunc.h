@@ -5,15 +5,25 @@
 #include "model/color.h"
 #include "model/colormap.h"
 
+class ReferenceOrbit;
+
 /* interface for function object which computes and/or colors a single point */
 class pointFunc
 {
     pf_obj *m_pfo;
     ColorMap *m_cmap;
+    const ReferenceOrbit *m_orbit;
 public:
     pointFunc(
         pf_obj *pfo,
-        ColorMap *cmap) : m_pfo(pfo), m_cmap(cmap) {}
+        ColorMap *cmap) : m_pfo(pfo), m_cmap(cmap), m_orbit(nullptr) {}
+
+    // in deep zoom mode, points are offsets from the reference orbit's
+    // center and are calculated by perturbation instead of by the formula
+    inline void set_reference_orbit(const ReferenceOrbit *orbit)
+    {
+        m_orbit = orbit;
+    }
 
     void calc(
         // in params
@@ -25,6 +35,64 @@ public:
         // only used for debugging
         int x, int y, int aa,
         // out params
+        rgba_t *color, int *pnIters, float *pIndex, fate_t *pFate,
+        // low-order parts of params, used if is_precise()
+        const double *params_lo = nullptr,
+        // iteration state to resume from and save to, used if can_resume()
+        double *state = nullptr) const;
+
+    // was the formula compiled with double-double precision? If so
+    // it's worth passing calc() the low-order parts of each coordinate
+    inline bool is_precise() const
+    {
+        return m_pfo->vtbl->calc_dd != nullptr && !m_orbit;
+    }
+
+    // can the formula save each point's iteration state, so that
+    // more iterations can carry on from it instead of starting again?
+    inline bool can_resume() const
+    {
+        return m_pfo->vtbl->calc_resume != nullptr && !m_orbit;
+    }
+
+    // number of doubles in each point's state
+    inline int state_size() const
+    {
+        return m_pfo->vtbl->state_size;
+    }
+
+    // max number of points passed to calc_batch at once
+    enum { BATCH_SIZE = 64 };
+
+    // does the formula provide a batched entry point? Not worth using
+    // if it would lose the precision of a double-double formula
+    inline bool has_batch() const
+    {
+        return m_pfo->vtbl->calc_batch != nullptr && !m_orbit && !is_precise();
+    }
+
+    // calculate n (<= BATCH_SIZE) points in one call. Equivalent to calling
+    // calc() for each point in turn with the usual periodicity guess
+    void calc_batch(
+        int n,
+        // in params
+        const double *xs, const double *ys, const double *zs, const double *ws,
+        int nIters,
+        // periodicity
+        bool periodicity, int last_iters, double period_tolerance,
+        // warping
+        int warp_param,
+        // only used for debugging
+        const int *px, int y, int aa,
+        // nullptr, or each point's iteration state as for calc()
+        double *const *states,
+        // out params
+        rgba_t *colors, int *pnIters, float *pIndex, fate_t *pFate) const;
+
+    // calculate a point by perturbation, escaping and colored outside as
+    // the reference orbit's settings say, and solid inside
+    void calc_perturbed(
+        const double *params, int nIters,
         rgba_t *color, int *pnIters, float *pIndex, fate_t *pFate) const;
 
     inline rgba_t recolor(double dist, fate_t fate, rgba_t current) const
@@ -0,0 +1,57 @@
+#include "scheduler.h"
+
+#include <chrono>
+
+#include "model/site.h"
+
+CalcScheduler &CalcScheduler::instance()
+{
+    static CalcScheduler scheduler;
+    return scheduler;
+}
+
+void CalcScheduler::enter(priority_t priority)
+{
+    const std::lock_guard<std::mutex> lock(m_lock);
+    ++m_running[priority];
+}
+
+void CalcScheduler::leave(priority_t priority)
+{
+    {
+        const std::lock_guard<std::mutex> lock(m_lock);
+        --m_running[priority];
+    }
+    m_left.notify_all();
+}
+
+bool CalcScheduler::must_wait(priority_t priority) const
+{
+    for (int p = priority + 1; p < NUM_PRIORITIES; ++p)
+    {
+        if (m_running[p] > 0)
+        {
+            return true;
+        }
+    }
+    return false;
+}
+
+void CalcScheduler::wait_turn(priority_t priority, IFractalSite *site)
+{
+    if (!must_wait(priority))
+    {
+        return;
+    }
+    std::unique_lock<std::mutex> lock(m_lock);
+    while (must_wait(priority) && !site->is_interrupted())
+    {
+        // nobody tells us about interruptions, so look now and again
+        m_left.wait_for(lock, std::chrono::milliseconds(50));
+    }
+}
+
+int CalcScheduler::running(priority_t priority) const
+{
+    return m_running[priority];
+}
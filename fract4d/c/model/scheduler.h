@@ -0,0 +1,66 @@
+#ifndef __SCHEDULER_H_INCLUDED__
+#define __SCHEDULER_H_INCLUDED__
+
+#include <atomic>
+#include <condition_variable>
+#include <mutex>
+
+#include "model/enums.h"
+
+class IFractalSite;
+
+/*
+    process-wide arbitration between calculations running at the same
+    time - the main window, explorer-mode subfractals, the render queue
+    and so on. Each of those has its own threads, so with several busy
+    at once the machine is oversubscribed and the one the user is
+    looking at slows to a crawl. Instead, each calculation registers
+    its priority while it runs, and between jobs its workers wait for
+    any more important calculation to finish before carrying on.
+    Calculations with the same priority share the machine as before.
+*/
+
+class CalcScheduler final
+{
+public:
+    static CalcScheduler &instance();
+
+    // a calculation with this priority has started or finished
+    void enter(priority_t);
+    void leave(priority_t);
+    // is something more important than this running? Doesn't lock,
+    // so it's cheap enough to ask before every job
+    bool must_wait(priority_t) const;
+    // block until must_wait is false, or the site is interrupted
+    void wait_turn(priority_t, IFractalSite *);
+    // number of calculations running with this priority
+    int running(priority_t) const;
+
+private:
+    CalcScheduler() = default;
+
+    std::mutex m_lock;
+    std::condition_variable m_left;
+    std::atomic<int> m_running[NUM_PRIORITIES] = {};
+};
+
+// a calculation's registration with the scheduler, for as long as it exists
+class scheduler_ticket final
+{
+public:
+    explicit scheduler_ticket(priority_t priority) : m_priority(priority)
+    {
+        CalcScheduler::instance().enter(m_priority);
+    }
+    ~scheduler_ticket()
+    {
+        CalcScheduler::instance().leave(m_priority);
+    }
+    scheduler_ticket(const scheduler_ticket &) = delete;
+    scheduler_ticket &operator=(const scheduler_ticket &) = delete;
+
+private:
+    priority_t m_priority;
+};
+
+#endif
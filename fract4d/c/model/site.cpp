@@ -1,5 +1,11 @@
 #include <unistd.h>
+#include <fcntl.h>
+#include <cstdint>
+#include <algorithm>
 #include <iostream>
+#ifdef __linux__
+#include <sys/eventfd.h>
+#endif
 
 #include "site.h"
 #include "model/stats.h"
@@ -23,9 +29,11 @@ void IFractalSite::wait()
     {
         if (m_thread.get_id() == std::this_thread::get_id())
         {
-            // something is very wrong
-            std::cerr << this << "Waiting on own thread in IFractalSite::wait()!" << m_thread.get_id() << "\n";
-            throw std::exception();
+            // the calculation thread let go of the last reference to
+            // the site as it finished. It can't join itself, and has
+            // nothing left to do, so let it go
+            m_thread.detach();
+            return;
         }
 #ifdef DEBUG_THREADS
         std::cerr << this << " : CA : WAIT(" << m_thread.get_id() << ")\n";
@@ -34,6 +42,11 @@ void IFractalSite::wait()
     }
 }
 
+const volatile int *IFractalSite::get_interrupt_flag()
+{
+    return nullptr;
+}
+
 /*********
 * FDSite *
 **********/
@@ -46,7 +59,7 @@ inline void FDSite::send(msg_type_t type, int size, void *buf)
     write(fd, buf, size);
 }
 
-FDSite::FDSite(int fd_) : fd(fd_), interrupted(false)
+FDSite::FDSite(int fd_) : fd(fd_), interrupted(false), interrupt_flag(0)
 {
 #ifdef DEBUG_CREATION
     fprintf(stderr, "%p : FD : CTOR\n", this);
@@ -125,11 +138,18 @@ void FDSite::interrupt()
     std::cerr << this << " : CA : INT(" << m_thread.get_id() << ")\n";
 #endif
     interrupted = true;
+    interrupt_flag = 1;
 }
 
 void FDSite::start()
 {
     interrupted = false;
+    interrupt_flag = 0;
+}
+
+const volatile int *FDSite::get_interrupt_flag()
+{
+    return &interrupt_flag;
 }
 
 FDSite::~FDSite()
@@ -139,3 +159,183 @@ FDSite::~FDSite()
 #endif
     // close(fd); // don't close something you didn't open
 }
+
+/*************
+* StatusSite *
+**************/
+
+StatusSite::StatusSite() : read_fd(-1), write_fd(-1), interrupted(false), interrupt_flag(0), woken(false)
+{
+#ifdef __linux__
+    read_fd = write_fd = eventfd(0, EFD_NONBLOCK | EFD_CLOEXEC);
+#else
+    int fds[2];
+    if (pipe(fds) == 0)
+    {
+        read_fd = fds[0];
+        write_fd = fds[1];
+        fcntl(read_fd, F_SETFL, O_NONBLOCK);
+        fcntl(write_fd, F_SETFL, O_NONBLOCK);
+    }
+#endif
+#ifdef DEBUG_CREATION
+    fprintf(stderr, "%p : SS : CTOR\n", this);
+#endif
+}
+
+void StatusSite::wake()
+{
+    if (woken)
+    {
+        return;
+    }
+    woken = true;
+    // an eventfd wants 8 bytes. Any will do for a pipe
+    const uint64_t one = 1;
+    [[maybe_unused]] const auto written = write(write_fd, &one, sizeof(one));
+}
+
+void StatusSite::iters_changed(int numiters)
+{
+    const std::lock_guard<std::mutex> lock(status_lock);
+    status.has_iters = true;
+    status.iterations = numiters;
+    wake();
+}
+
+void StatusSite::tolerance_changed(double tolerance)
+{
+    const std::lock_guard<std::mutex> lock(status_lock);
+    status.has_tolerance = true;
+    status.tolerance = tolerance;
+    wake();
+}
+
+void StatusSite::image_changed(int x1, int y1, int x2, int y2)
+{
+    if (is_interrupted())
+    {
+        return;
+    }
+    const std::lock_guard<std::mutex> lock(status_lock);
+    if (status.has_image)
+    {
+        status.x1 = std::min(status.x1, x1);
+        status.y1 = std::min(status.y1, y1);
+        status.x2 = std::max(status.x2, x2);
+        status.y2 = std::max(status.y2, y2);
+    }
+    else
+    {
+        status.has_image = true;
+        status.x1 = x1;
+        status.y1 = y1;
+        status.x2 = x2;
+        status.y2 = y2;
+    }
+    wake();
+}
+
+void StatusSite::progress_changed(float progress)
+{
+    if (is_interrupted())
+    {
+        return;
+    }
+    const std::lock_guard<std::mutex> lock(status_lock);
+    status.has_progress = true;
+    status.progress = progress;
+    wake();
+}
+
+void StatusSite::stats_changed(pixel_stat_t &stats)
+{
+    if (is_interrupted())
+    {
+        return;
+    }
+    const std::lock_guard<std::mutex> lock(status_lock);
+    status.has_stats = true;
+    status.stats = stats;
+    wake();
+}
+
+void StatusSite::status_changed(int status_val)
+{
+    const std::lock_guard<std::mutex> lock(status_lock);
+    status.statuses.push_back(status_val);
+    wake();
+}
+
+bool StatusSite::is_interrupted()
+{
+    return interrupted;
+}
+
+#ifdef DEBUG_PIXEL
+void StatusSite::pixel_changed(
+    [[maybe_unused]] const double *params, [[maybe_unused]] int maxIters,
+    [[maybe_unused]] int nNoPeriodIters,
+    [[maybe_unused]] int x, [[maybe_unused]] int y, [[maybe_unused]] int aa,
+    [[maybe_unused]] double dist, [[maybe_unused]] int fate, [[maybe_unused]] int nIters,
+    [[maybe_unused]] int r, [[maybe_unused]] int g, [[maybe_unused]] int b, [[maybe_unused]] int a)
+{
+}
+#endif
+
+void StatusSite::interrupt()
+{
+    interrupted = true;
+    interrupt_flag = 1;
+}
+
+void StatusSite::start()
+{
+    interrupted = false;
+    interrupt_flag = 0;
+}
+
+const volatile int *StatusSite::get_interrupt_flag()
+{
+    return &interrupt_flag;
+}
+
+int StatusSite::get_fd() const
+{
+    return read_fd;
+}
+
+site_status StatusSite::read()
+{
+    const std::lock_guard<std::mutex> lock(status_lock);
+    if (woken)
+    {
+        // empty the eventfd or pipe, so the reader isn't woken again
+        // until there's something new
+        uint64_t buf;
+        while (::read(read_fd, &buf, sizeof(buf)) > 0)
+        {
+        }
+        woken = false;
+    }
+    site_status ret;
+    std::swap(ret, status);
+    return ret;
+}
+
+StatusSite::~StatusSite()
+{
+#ifdef DEBUG_CREATION
+    fprintf(stderr, "%p : SS : DTOR\n", this);
+#endif
+    // the calculation thread may still be using the site
+    wait();
+    if (read_fd != -1)
+    {
+        close(read_fd);
+    }
+    if (write_fd != -1 && write_fd != read_fd)
+    {
+        close(write_fd);
+    }
+}
@@ -4,10 +4,10 @@
 #include <thread>
 #include <mutex>
 #include <atomic>
+#include <vector>
 
 #include "model/enums.h"
-
-typedef struct s_pixel_stat pixel_stat_t;
+#include "model/stats.h"
 
 // a type which must be implemented by the user of
 // libfract4d. We use this to inform them of the progress
@@ -49,6 +49,9 @@ public:
     // tell an asynchronous fractal to stop calculating
     virtual void interrupt() = 0;
     virtual void start() = 0;
+    // NULL, or a flag which is non-zero while is_interrupted() is true,
+    // for compiled formulas to check while iterating (see pf.h)
+    virtual const volatile int *get_interrupt_flag();
     // having started it, set the thread id of the calc thread to wait for
     virtual void set_thread(std::thread t);
     // wait for it to finish
@@ -78,13 +81,75 @@ public:
 #endif
     void interrupt();
     void start();
+    const volatile int *get_interrupt_flag();
     ~FDSite();
 private:
     int fd;
     std::atomic<bool> interrupted;
+    volatile int interrupt_flag;
     std::mutex write_lock;
 
     inline void send(msg_type_t type, int size, void *buf);
 };
 
+// what has happened since a StatusSite was last read. Repeated callbacks
+// of the same kind are merged: only the latest value is kept, and changed
+// rectangles are combined into one which covers them all
+struct site_status
+{
+    bool has_iters = false, has_tolerance = false, has_image = false,
+        has_progress = false, has_stats = false;
+    int iterations = 0;
+    double tolerance = 0.0;
+    int x1 = 0, y1 = 0, x2 = 0, y2 = 0;
+    float progress = 0.0;
+    pixel_stat_t stats;
+    // every status change, in order
+    std::vector<int> statuses;
+};
+
+// keep the callbacks in memory shared with the reader, and wake it
+// through a file descriptor when there's something new. However many
+// callbacks there are between reads, the reader is only woken once
+class StatusSite : public IFractalSite
+{
+public:
+    StatusSite();
+    void iters_changed(int numiters);
+    void tolerance_changed(double tolerance);
+    void image_changed(int x1, int y1, int x2, int y2);
+    void progress_changed(float progress);
+    void stats_changed(pixel_stat_t &stats);
+    void status_changed(int status_val);
+    bool is_interrupted();
+#ifdef DEBUG_PIXEL
+    void pixel_changed(
+        const double *params, int maxIters, int nNoPeriodIters,
+        int x, int y, int aa,
+        double dist, int fate, int nIters,
+        int r, int g, int b, int a);
+#endif
+    void interrupt();
+    void start();
+    const volatile int *get_interrupt_flag();
+    ~StatusSite();
+
+    // readable when there's something new, or -1 if it couldn't be made
+    int get_fd() const;
+    // take everything which has happened since the last read
+    site_status read();
+private:
+    // an eventfd, or the ends of a pipe where there's no eventfd
+    int read_fd, write_fd;
+    std::atomic<bool> interrupted;
+    volatile int interrupt_flag;
+    std::mutex status_lock;
+    site_status status;
+    // has the reader been woken since it last read?
+    bool woken;
+
+    // call with status_lock held
+    void wake();
+};
+
 #endif
\ No newline at end of file
@@ -5,16 +5,36 @@
    a linked list to to a templated array. This has the advantage that
    we don't need to call new() to introduce new work items.
 
+   Since then the single shared queue has been replaced by one deque
+   per thread. New work is dealt out round-robin; each thread takes
+   work from the front of its own deque and, when that runs dry,
+   steals from the back of the busiest other deque. A stolen item
+   which is big enough is split in two so the tail of a pass (where
+   the expensive rows near the set boundary tend to end up) can be
+   shared out too.
 */
 
 #ifndef _THREADPOOL_H_
 #define _THREADPOOL_H_
 
 #include "pthread.h"
-#include <csignal>
+#include <algorithm>
+#include <atomic>
 #include <cassert>
+#include <cerrno>
+#include <chrono>
+#include <cmath>
+#include <csignal>
 #include <climits>
+#include <cstddef>
+#include <ctime>
 #include <iostream>
+#include <vector>
+
+/* data which one thread writes to often is aligned to this, so that it
+   doesn't share a cache line with another thread's and the line isn't
+   passed back and forth between their cores (false sharing) */
+constexpr std::size_t TPOOL_CACHE_LINE_SIZE = 64;
 
 /* one unit of work */
 template <class work_t, class threadInfo>
@@ -31,6 +51,117 @@ struct tpool_threadInfo
 {
     void *pool; /* can't work out how to declare this right now */
     T *info;
+    int index; /* which deque belongs to this thread */
+};
+
+/* how busy one thread was. Only meaningful after flush().
+   Each thread updates its own after every item */
+struct alignas(TPOOL_CACHE_LINE_SIZE) tpool_thread_stats
+{
+    double busy_seconds; /* time spent running work */
+    double idle_seconds; /* time work was outstanding but this thread had none */
+    long jobs;           /* work items run, including split-off halves */
+    long steals;         /* items taken from another thread's deque */
+    long splits;         /* stolen items which were divided in two */
+};
+
+/* how the pool estimates and divides work. The default treats all
+   work items as the same size and never divides them; specialize it
+   to give the scheduler something better to go on */
+template <class work_t, class threadInfo>
+struct tpool_traits
+{
+    /* relative cost of an item, used to pick which deque to steal from */
+    static long cost(const work_t &) { return 1; }
+    /* divide job in two, leaving the first part in job and the remainder
+       in rest. Called on the stealing thread before either part is run */
+    static bool split(work_t &, work_t &, threadInfo *) { return false; }
+};
+
+/* a fixed-size double-ended ring of work items, guarded by its own lock.
+   They're allocated together, but mostly used by different threads */
+template <class work_t, class threadInfo>
+class alignas(TPOOL_CACHE_LINE_SIZE) tpool_deque
+{
+public:
+    typedef tpool_work<work_t, threadInfo> item_t;
+    typedef tpool_traits<work_t, threadInfo> traits;
+
+    tpool_deque() : items(NULL), capacity(0), head(0), size(0), cost(0)
+    {
+        pthread_mutex_init(&lock, NULL);
+    }
+
+    ~tpool_deque()
+    {
+        pthread_mutex_destroy(&lock);
+        delete[] items;
+    }
+
+    void init(int capacity_)
+    {
+        capacity = capacity_;
+        items = new item_t[capacity];
+    }
+
+    void push_back(const item_t &item)
+    {
+        pthread_mutex_lock(&lock);
+        assert(size < capacity);
+        items[(head + size) % capacity] = item;
+        ++size;
+        cost += item_cost(item);
+        pthread_mutex_unlock(&lock);
+    }
+
+    bool pop_front(item_t &item)
+    {
+        pthread_mutex_lock(&lock);
+        const bool found = size > 0;
+        if (found)
+        {
+            item = items[head];
+            head = (head + 1) % capacity;
+            --size;
+            cost -= item_cost(item);
+        }
+        pthread_mutex_unlock(&lock);
+        return found;
+    }
+
+    bool pop_back(item_t &item)
+    {
+        pthread_mutex_lock(&lock);
+        const bool found = size > 0;
+        if (found)
+        {
+            --size;
+            item = items[(head + size) % capacity];
+            cost -= item_cost(item);
+        }
+        pthread_mutex_unlock(&lock);
+        return found;
+    }
+
+    /* estimated work remaining - read without the lock, so only a hint */
+    long queued_cost() const
+    {
+        return cost.load(std::memory_order_relaxed);
+    }
+
+private:
+    /* never let an item look free, or nobody would steal it */
+    static long item_cost(const item_t &item)
+    {
+        return std::max(1L, traits::cost(item.arg));
+    }
+
+    pthread_mutex_t lock;
+    item_t *items;
+    int capacity;
+    int head;
+    int size;
+    std::atomic<long> cost;
 };
 
 /* templatized on the unit of work and the type which holds per-thread info */
@@ -38,6 +169,10 @@ template <class work_t, class threadInfo>
 class tpool
 {
 public:
+    typedef tpool_work<work_t, threadInfo> item_t;
+    typedef tpool_traits<work_t, threadInfo> traits;
+    typedef std::chrono::steady_clock clock_t;
+
     tpool(int num_worker_threads_, int max_queue_size_, threadInfo *tinfo_)
     {
         num_threads = num_worker_threads_;
@@ -47,21 +182,24 @@ public:
         {
             tinfo[i].pool = this;
             tinfo[i].info = &tinfo_[i];
+            tinfo[i].index = i;
         }
-        queue = new tpool_work<work_t, threadInfo>[max_queue_size];
+        deques = new tpool_deque<work_t, threadInfo>[num_threads];
+        for (int i = 0; i < num_threads; ++i)
+        {
+            // +1 leaves room for the remainder of a split
+            deques[i].init(max_queue_size + 1);
+        }
+        stats.resize(num_threads);
+        reset_stats();
         threads = new pthread_t[num_threads];
-        cur_queue_size = 0;
-        queue_head = 0;
-        queue_tail = 0;
-        queue_closed = 0;
+        next_deque = 0;
+        pending = 0;
+        outstanding = 0;
         shutdown = 0;
-        total_work_done = -num_threads;
-        target_work_done = INT_MAX;
-        work_queued = 0;
         pthread_mutex_init(&queue_lock, NULL);
         pthread_cond_init(&queue_not_empty, NULL);
         pthread_cond_init(&queue_not_full, NULL);
-        pthread_cond_init(&queue_empty, NULL);
         pthread_cond_init(&queue_work_complete, NULL);
         /* create low-priority attribute block */
         pthread_attr_t lowprio_attr;
@@ -77,13 +215,9 @@ public:
 
     ~tpool()
     {
+        /* wait for the queues to empty */
+        flush();
         pthread_mutex_lock(&queue_lock);
-        queue_closed = 1;
-        /* wait for the queue to empty */
-        while (cur_queue_size != 0)
-        {
-            pthread_cond_wait(&queue_empty, &queue_lock);
-        }
         shutdown = 1;
         pthread_mutex_unlock(&queue_lock);
         /* wake up any sleeping workers */
@@ -93,8 +227,12 @@ public:
         {
             pthread_join(threads[i], NULL);
         }
+        pthread_mutex_destroy(&queue_lock);
+        pthread_cond_destroy(&queue_not_empty);
+        pthread_cond_destroy(&queue_not_full);
+        pthread_cond_destroy(&queue_work_complete);
         delete[] threads;
-        delete[] queue;
+        delete[] deques;
         delete[] tinfo;
     }
 
@@ -102,52 +240,141 @@ public:
     {
         tpool<work_t, threadInfo> *p =
             (tpool<work_t, threadInfo> *)pinfo->pool;
-        p->work(pinfo->info);
+        p->work(pinfo->index);
     }
 
     int add_work(void (*routine)(work_t &, threadInfo *), const work_t &arg)
     {
         pthread_mutex_lock(&queue_lock);
-        while ((cur_queue_size == max_queue_size) &&
-               (!(shutdown || queue_closed)))
+        while (pending >= max_queue_size && !shutdown)
         {
             pthread_cond_wait(&queue_not_full, &queue_lock);
         }
-        if (shutdown || queue_closed)
+        if (shutdown)
         {
             pthread_mutex_unlock(&queue_lock);
             return 0;
         }
+        if (outstanding.fetch_add(1) == 0)
+        {
+            // first work since the last flush: start the clock
+            window_start = clock_t::now();
+        }
         /* fill in work structure */
-        tpool_work<work_t, threadInfo> *workp = &queue[queue_head];
-        workp->routine = routine;
-        workp->arg = arg;
-        /* advance queue head to next position */
-        queue_head = (queue_head + 1) % max_queue_size;
-        /* record keeping */
-        ++cur_queue_size;
-        ++work_queued;
-        if (1 == cur_queue_size)
-        {
-            pthread_cond_broadcast(&queue_not_empty);
-        }
-        assert(cur_queue_size <= max_queue_size);
+        item_t work;
+        work.routine = routine;
+        work.arg = arg;
+        /* record keeping - count it first so pending never undercounts */
+        ++pending;
+        /* deal work out round-robin, so each thread starts with its own share */
+        deques[next_deque].push_back(work);
+        next_deque = (next_deque + 1) % num_threads;
+        pthread_cond_signal(&queue_not_empty);
         pthread_mutex_unlock(&queue_lock);
         return 1;
     }
 
-    void work(threadInfo *pInfo)
+    // block until all currently scheduled work is done
+    void flush()
     {
+        pthread_mutex_lock(&queue_lock);
+        while (outstanding != 0)
+        {
+            pthread_cond_wait(&queue_work_complete, &queue_lock);
+        }
+        close_window();
+        pthread_mutex_unlock(&queue_lock);
+    }
+
+    // block until all currently scheduled work is done, or for at most
+    // this long. Returns true if the work is done
+    bool flush_for(double seconds)
+    {
+        timespec deadline;
+        clock_gettime(CLOCK_REALTIME, &deadline);
+        const double whole = std::floor(seconds);
+        deadline.tv_sec += static_cast<time_t>(whole);
+        deadline.tv_nsec += static_cast<long>((seconds - whole) * 1.0e9);
+        if (deadline.tv_nsec >= 1000000000L)
+        {
+            deadline.tv_sec += 1;
+            deadline.tv_nsec -= 1000000000L;
+        }
+
+        pthread_mutex_lock(&queue_lock);
+        while (outstanding != 0)
+        {
+            if (pthread_cond_timedwait(&queue_work_complete, &queue_lock, &deadline) == ETIMEDOUT)
+            {
+                break;
+            }
+        }
+        const bool done = outstanding == 0;
+        if (done)
+        {
+            close_window();
+        }
+        pthread_mutex_unlock(&queue_lock);
+        return done;
+    }
+
+    threadInfo *thread_info(int n)
+    {
+        return tinfo[n].info;
+    }
+
+    // per-thread busy & idle times since the last reset_stats().
+    // Only call this between flush() and the next add_work()
+    std::vector<tpool_thread_stats> thread_stats() const
+    {
+        std::vector<tpool_thread_stats> result(stats);
+        for (auto &s : result)
+        {
+            s.idle_seconds = std::max(0.0, elapsed - s.busy_seconds);
+        }
+        return result;
+    }
+
+    void reset_stats()
+    {
+        for (auto &s : stats)
+        {
+            s = tpool_thread_stats();
+        }
+        elapsed = 0.0;
+        window_start = clock_t::time_point();
+    }
+
+private:
+    void work(int me)
+    {
+        threadInfo *pInfo = tinfo[me].info;
+        tpool_thread_stats &my_stats = stats[me];
+        item_t my_work;
         while (1)
         {
-            pthread_mutex_lock(&queue_lock);
-            ++total_work_done;
-            while (cur_queue_size == 0 && !(shutdown))
+            bool found = take(me, my_work);
+            if (found)
             {
-                if (total_work_done == target_work_done)
+                const auto start = clock_t::now();
+                try
                 {
-                    pthread_cond_signal(&queue_work_complete);
+                    /* actually do the work */
+                    ((*my_work.routine))(my_work.arg, pInfo);
                 }
+                catch (...)
+                {
+                    /* abort this task, but don't do anything else main thread will notice soon */
+                }
+                my_stats.busy_seconds += seconds_since(start);
+                ++my_stats.jobs;
+                complete();
+                continue;
+            }
+
+            pthread_mutex_lock(&queue_lock);
+            while (pending <= 0 && !shutdown)
+            {
                 pthread_cond_wait(&queue_not_empty, &queue_lock);
             }
             if (shutdown)
@@ -155,78 +382,133 @@ public:
                 pthread_mutex_unlock(&queue_lock);
                 pthread_exit(NULL);
             }
-            tpool_work<work_t, threadInfo> *my_workp = &queue[queue_tail];
-            --cur_queue_size;
-            assert(cur_queue_size >= 0);
-            queue_tail = (queue_tail + 1) % max_queue_size;
-            if (cur_queue_size == max_queue_size - 1)
-            {
-                pthread_cond_broadcast(&queue_not_full);
-            }
-            if (0 == cur_queue_size)
+            pthread_mutex_unlock(&queue_lock);
+        }
+    }
+
+    /* find something for thread 'me' to do: its own work first, then
+       other threads' */
+    bool take(int me, item_t &item)
+    {
+        if (deques[me].pop_front(item))
+        {
+            dequeued();
+            return true;
+        }
+        if (!steal(me, item))
+        {
+            return false;
+        }
+        dequeued();
+        ++stats[me].steals;
+
+        item_t rest;
+        rest.routine = item.routine;
+        if (traits::split(item.arg, rest.arg, tinfo[me].info))
+        {
+            ++stats[me].splits;
+            // the remainder goes on our own deque where others can steal it
+            ++outstanding;
+            pthread_mutex_lock(&queue_lock);
+            ++pending;
+            deques[me].push_back(rest);
+            pthread_cond_signal(&queue_not_empty);
+            pthread_mutex_unlock(&queue_lock);
+        }
+        return true;
+    }
+
+    /* take the last item from whichever other deque has the most work queued */
+    bool steal(int me, item_t &item)
+    {
+        while (pending > 0)
+        {
+            int victim = -1;
+            long most = 0;
+            for (int i = 1; i < num_threads; ++i)
             {
-                pthread_cond_signal(&queue_empty);
+                const int candidate = (me + i) % num_threads;
+                const long cost = deques[candidate].queued_cost();
+                if (cost > most)
+                {
+                    most = cost;
+                    victim = candidate;
+                }
             }
-            void (*my_routine)(work_t &, threadInfo *) = my_workp->routine;
-            /* NOT a work& reference because otherwise data could be
-               overwritten before we can process it */
-            work_t my_arg = my_workp->arg;
-            pthread_mutex_unlock(&queue_lock);
-            try
+            if (victim == -1)
             {
-                /* actually do the work */
-                ((*my_routine))(my_arg, pInfo);
+                return false;
             }
-            catch (...)
+            if (deques[victim].pop_back(item))
             {
-                /* abort this task, but don't do anything else main thread will notice soon */
+                return true;
             }
+            // someone beat us to it, look again
         }
+        return false;
     }
 
-    // block until all currently scheduled work is done
-    void flush()
+    /* an item has been taken off a deque */
+    void dequeued()
     {
-        pthread_mutex_lock(&queue_lock);
-        target_work_done = work_queued;
-        // this signal in case all work already done
-        pthread_cond_broadcast(&queue_not_empty);
-        while (total_work_done != target_work_done)
+        if (pending.fetch_sub(1) == max_queue_size)
         {
-            pthread_cond_wait(&queue_work_complete, &queue_lock);
+            pthread_mutex_lock(&queue_lock);
+            pthread_cond_broadcast(&queue_not_full);
+            pthread_mutex_unlock(&queue_lock);
         }
-        target_work_done = INT_MAX;
-        total_work_done = 0;
-        work_queued = 0;
-        pthread_mutex_unlock(&queue_lock);
     }
 
-    threadInfo *thread_info(int n)
+    /* an item has finished running */
+    void complete()
     {
-        return tinfo[n].info;
+        if (outstanding.fetch_sub(1) == 1)
+        {
+            pthread_mutex_lock(&queue_lock);
+            pthread_cond_broadcast(&queue_work_complete);
+            pthread_mutex_unlock(&queue_lock);
+        }
+    }
+
+    bool window_open() const
+    {
+        return window_start != clock_t::time_point();
+    }
+
+    /* all the work is done: add the time it took to the total */
+    void close_window()
+    {
+        if (window_open())
+        {
+            elapsed += seconds_since(window_start);
+            window_start = clock_t::time_point();
+        }
+    }
+
+    static double seconds_since(const clock_t::time_point &start)
+    {
+        return std::chrono::duration<double>(clock_t::now() - start).count();
     }
 
-private:
     /* pool characteristics */
     int num_threads;
     int max_queue_size;
     tpool_threadInfo<threadInfo> *tinfo;
     /* pool state */
     pthread_t *threads;
-    int cur_queue_size;
-    int total_work_done;
-    int work_queued;
-    int target_work_done;
-    int queue_head;
-    int queue_tail;
-    tpool_work<work_t, threadInfo> *queue;
+    tpool_deque<work_t, threadInfo> *deques;
+    int next_deque;
+    std::atomic<int> pending;     /* items sitting in deques */
+    std::atomic<int> outstanding; /* items queued or running */
     pthread_mutex_t queue_lock;
     pthread_cond_t queue_not_empty;
     pthread_cond_t queue_not_full;
-    pthread_cond_t queue_empty;
     pthread_cond_t queue_work_complete;
-    int queue_closed;
     int shutdown;
+    /* load-balance record keeping */
+    std::vector<tpool_thread_stats> stats;
+    clock_t::time_point window_start;
+    double elapsed;
 };
 
 #endif /* _THREADPOOL_H_ */
@@ -6,6 +6,28 @@ void worker(job_info_t& tdata, STFractWorker *pFunc)
     pFunc->work(tdata);
 }
 
+/* roughly how many pixels a job will calculate */
+long tpool_traits<job_info_t, STFractWorker>::cost(const job_info_t &job)
+{
+    switch (job.job)
+    {
+    case JOB_ROW:
+    case JOB_ROW_AA:
+        return job.param;
+    case JOB_BOX:
+        return job.param * job.param;
+    case JOB_BOX_ROW:
+        return static_cast<long>(job.param2 - job.x) * job.param;
+    case JOB_QBOX_ROW:
+        // one pixel per box plus the ragged edge of the rows
+        return job.x / job.param + job.param * job.param;
+    case JOB_SUBDIVIDE:
+        return static_cast<long>(job.param) * job.param2;
+    default:
+        return 1;
+    }
+}
+
 IFractWorker *IFractWorker::create(
     int numThreads, pf_obj *pfo, ColorMap *cmap, IImage *im_, IFractalSite *site)
 {
@@ -12,6 +12,7 @@
 
 class ColorMap;
 class IImage;
+class ReferenceOrbit;
 class IFractalSite;
 struct calc_options;
 typedef struct s_rgba rgba_t;
@@ -26,7 +27,8 @@ typedef enum
     JOB_BOX_ROW,
     JOB_ROW,
     JOB_ROW_AA,
-    JOB_QBOX_ROW
+    JOB_QBOX_ROW,
+    JOB_SUBDIVIDE
 } job_type_t;
 
 /* one unit of work */
@@ -59,8 +61,17 @@ public:
     virtual const calc_options& get_options() const = 0;
     virtual bool try_finished_cond() const = 0;
     virtual int get_debug_flags() const = 0;
-    virtual void image_changed(int x1, int x2, int y1, int y2) const = 0;
+    // rows [y1, y2) are finished. The site hears about it, along with
+    // any other rows finished meanwhile, the next time the calc thread
+    // reports on progress
+    virtual void rows_changed(int y1, int y2) const = 0;
     virtual void progress_changed(float progress) const = 0;
+    // reference orbit for deep zooms, or nullptr to use the formula
+    virtual const ReferenceOrbit *get_reference_orbit() const = 0;
+    // should the antialiasing pass calculate subpixels for (x,y)?
+    virtual bool needs_aa(int x, int y) const = 0;
+    // called before each job: wait while more important calculations run
+    virtual void wait_turn() const = 0;
 };
 
 class IFractWorker
@@ -72,18 +83,29 @@ public:
     IFractWorker() = default;
 
     virtual void set_context(IWorkerContext *) = 0;
+    // point an existing worker at a new formula, colormap, image and site
+    virtual void rebind(pf_obj *, ColorMap *, IImage *, IFractalSite *) = 0;
     // calculate a row of antialiased pixels
-    virtual void row_aa(int y, int n) = 0;
+    virtual void row_aa(int x, int y, int n) = 0;
     // calculate a row of pixels
     virtual void row(int x, int y, int n) = 0;
     // calculate a row of boxes
     virtual void box_row(int w, int y, int rsize) = 0;
     // calculate a row of boxes, quickly
     virtual void qbox_row(int w, int y, int rsize, int drawsize) = 0;
+    // calculate a w-by-h rectangle by subdividing it
+    virtual void rect(int x, int y, int w, int h) = 0;
+    // fill in a w-by-h rectangle whose border is already calculated
+    virtual void subdivide(int x, int y, int w, int h) = 0;
     // auto-deepening record keeping
     virtual void reset_counts() = 0;
     virtual const pixel_stat_t &get_stats() const = 0;
     virtual void flush() = 0;
+    // wait at most this long for queued jobs to finish; true if they have
+    virtual bool flush_for(double seconds) = 0;
+    // do jobs go to other threads, which tell the context about each one
+    // as it finishes? If not, they're done by the time the call returns
+    virtual bool queues_jobs() const = 0;
 
     virtual ~IFractWorker() = default;
 protected:
@@ -91,8 +113,10 @@ protected:
     IWorkerContext *context;
 };
 
-/* per-worker-thread fractal info */
-class STFractWorker final: public IFractWorker
+/* per-worker-thread fractal info. MTFractWorker keeps these side by
+   side, and each thread updates its own stats for every pixel, so they
+   start on separate cache lines */
+class alignas(TPOOL_CACHE_LINE_SIZE) STFractWorker final: public IFractWorker
 {
 public:
     STFractWorker(pf_obj *pfo, ColorMap *cmap, IImage *im, IFractalSite *site) noexcept:
@@ -100,16 +124,27 @@ public:
 
     // top-level function for multi-threaded workers
     void work(job_info_t &tdata);
+    // divide a stolen job in two for the scheduler
+    bool split_job(job_info_t &job, job_info_t &rest);
 
     // IFractWorker interface
     void set_context(IWorkerContext *);
-    void row_aa(int y, int n);
+    void rebind(pf_obj *, ColorMap *, IImage *, IFractalSite *);
+    void row_aa(int x, int y, int n);
     void row(int x, int y, int n);
     void box_row(int w, int y, int rsize);
     void qbox_row(int w, int y, int rsize, int drawsize);
+    void rect(int x, int y, int w, int h);
+    void subdivide(int x, int y, int w, int h);
     void reset_counts();
     const pixel_stat_t &get_stats() const;
     void flush(){};
+    bool flush_for(double) { return true; }
+    bool queues_jobs() const { return false; }
+
+    // calculate a rectangle, passing the parts it's divided into on to
+    // farm to fill in once they're small enough to share out
+    void rect(int x, int y, int w, int h, IFractWorker *farm);
 
     // @TODO: make these private
     // calculate an rsize-by-rsize box of pixels
@@ -121,13 +156,25 @@ public:
     // ray-tracing machinery
     bool find_root(const dvec4 &eye, const dvec4 &look, dvec4 &root);
 private:
+    // calculate part of a row using the formula's batch entry point
+    void row_batch(int x, int y, int n);
+    // calculate the boxes of a box row which start in [x, end)
+    void box_span(int x, int end, int y, int rsize);
+    // fill in a rectangle whose border is already calculated, passing
+    // the parts small enough to share out on to farm, if there is one
+    void divide(int x, int y, int w, int h, IFractWorker *farm);
+    // is the rectangle's border all the same, so it can be filled in?
+    bool isFlat(int x, int y, int w, int h);
     void compute_stats(const dvec4 &pos, int iter, fate_t, int x, int y);
     void compute_auto_deepen_stats(const dvec4 &pos, int iter, int x, int y);
     void compute_auto_tolerance_stats(const dvec4 &pos, int iter, int x, int y);
     // does the point at (x,y) have the same colour & iteration count as the target?
     bool isTheSame(int targetIter, int targetCol, int x, int y);
-    // calculate this point using antialiasing
-    rgba_t antialias(int x, int y);
+    // calculate this point using antialiasing. If samples isn't null,
+    // it gets the color of each of the 4 subpixels
+    rgba_t antialias(int x, int y, rgba_t *samples = nullptr);
+    // the same with a finer grid of subpixels, unless the first 4 agree
+    rgba_t antialias_adaptive(int x, int y);
     // make an int corresponding to an RGB triple
     int Pixel2INT(int x, int y);
     // heuristic to see if we should use periodicity checking for next point
@@ -168,6 +215,28 @@ private:
     pointFunc m_pf;
     // period guessing
     int m_lastPointIters; // how many iterations did last pixel take?
+
+    // rectangles this many pixels or smaller are passed on whole to the
+    // other threads, rather than divided any further by the one dividing
+    // the image
+    enum
+    {
+        SHARED_RECT_PIXELS = 64 * 64
+    };
+};
+
+// tell the thread pool how big our jobs are and how to divide them
+template <>
+struct tpool_traits<job_info_t, STFractWorker>
+{
+    // don't bother splitting jobs smaller than this many pixels
+    enum { MIN_SPLIT_PIXELS = 32 };
+
+    static long cost(const job_info_t &job);
+    static bool split(job_info_t &job, job_info_t &rest, STFractWorker *worker)
+    {
+        return worker->split_job(job, rest);
+    }
 };
 
 // a composite subclass which holds an array of STFractWorkers and
@@ -182,16 +251,30 @@ public:
         IImage *,
         IFractalSite *
     );
+    ~MTFractWorker();
 
     // IFractWorker interface
     void set_context(IWorkerContext *);
-    void row_aa(int y, int n);
+    void rebind(pf_obj *, ColorMap *, IImage *, IFractalSite *);
+    void row_aa(int x, int y, int n);
     void row(int x, int y, int n);
     void qbox_row(int w, int y, int rsize, int drawsize);
     void box_row(int w, int y, int rsize);
+    void rect(int x, int y, int w, int h);
+    void subdivide(int x, int y, int w, int h);
     void reset_counts();
     const pixel_stat_t &get_stats() const;
     void flush();
+    bool flush_for(double seconds);
+    bool queues_jobs() const;
+
+    // number of threads in the pool (not counting the 0'th worker)
+    int num_threads() const;
+    // how busy each thread has been since the worker was created or rebound
+    std::vector<tpool_thread_stats> thread_stats() const;
+    // delete the threads' copies of the formula, which mustn't outlive
+    // the library it came from. Rebinding makes new ones
+    void kill_clones();
 
 private:
     /* wait for a ready thread then give it some work */
@@ -199,11 +282,17 @@ private:
     void send_quit();
     void send_box(int x, int y, int rsize);
     void send_row(int x, int y, int n);
-    void send_row_aa(int y, int n);
+    void send_row_aa(int x, int y, int n);
     void send_box_row(int w, int y, int rsize);
     void send_qbox_row(int w, int y, int rsize, int drawsize);
+    void send_subdivide(int x, int y, int w, int h);
+
+    // the formula for a pool thread: a copy of pfo if it can be copied,
+    // so that the threads don't all write to the same object and arena
+    pf_obj *clone_formula(pf_obj *pfo);
 
     std::vector<STFractWorker> m_workers;
+    std::vector<pf_obj *> m_clones;
     std::unique_ptr<tpool<job_info_t, STFractWorker>> m_threads;
 };
 
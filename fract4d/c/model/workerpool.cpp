@@ -0,0 +1,82 @@
+#include "workerpool.h"
+
+#include "model/worker.h"
+
+const int WorkerPool::MAX_IDLE_WORKERS = 4;
+
+WorkerPool &WorkerPool::instance()
+{
+    static WorkerPool pool;
+    return pool;
+}
+
+IFractWorker *WorkerPool::acquire(
+    int numThreads, pf_obj *pfo, ColorMap *cmap, IImage *im, IFractalSite *site)
+{
+    if (numThreads > 1)
+    {
+        const std::lock_guard<std::mutex> lock(m_lock);
+        for (auto it = m_idle.begin(); it != m_idle.end(); ++it)
+        {
+            if ((*it)->num_threads() == numThreads)
+            {
+                MTFractWorker *worker = it->release();
+                m_idle.erase(it);
+                worker->rebind(pfo, cmap, im, site);
+                return worker;
+            }
+        }
+    }
+    return IFractWorker::create(numThreads, pfo, cmap, im, site);
+}
+
+void WorkerPool::release(IFractWorker *worker)
+{
+    MTFractWorker *mtworker = dynamic_cast<MTFractWorker *>(worker);
+    if (!mtworker || mtworker->num_threads() < 2)
+    {
+        // nothing worth keeping
+        delete worker;
+        return;
+    }
+    // make sure nothing is still queued before parking it
+    mtworker->flush();
+    mtworker->kill_clones();
+    std::vector<tpool_thread_stats> stats = mtworker->thread_stats();
+
+    std::unique_ptr<MTFractWorker> evicted;
+    {
+        const std::lock_guard<std::mutex> lock(m_lock);
+        m_last_stats.swap(stats);
+        if (static_cast<int>(m_idle.size()) >= MAX_IDLE_WORKERS)
+        {
+            // evict the least-recently used worker
+            evicted = std::move(m_idle.front());
+            m_idle.erase(m_idle.begin());
+        }
+        m_idle.emplace_back(mtworker);
+    }
+    // any evicted worker's threads are joined here, outside the lock
+}
+
+int WorkerPool::idle_count()
+{
+    const std::lock_guard<std::mutex> lock(m_lock);
+    return static_cast<int>(m_idle.size());
+}
+
+void WorkerPool::clear()
+{
+    std::vector<std::unique_ptr<MTFractWorker>> idle;
+    {
+        const std::lock_guard<std::mutex> lock(m_lock);
+        idle.swap(m_idle);
+    }
+    // workers are joined here, outside the lock
+}
+
+std::vector<tpool_thread_stats> WorkerPool::last_thread_stats()
+{
+    const std::lock_guard<std::mutex> lock(m_lock);
+    return m_last_stats;
+}
@@ -0,0 +1,66 @@
+#ifndef __WORKERPOOL_H_INCLUDED__
+#define __WORKERPOOL_H_INCLUDED__
+
+#include <memory>
+#include <mutex>
+#include <vector>
+
+#include "model/threadpool.h"
+
+class IFractWorker;
+class MTFractWorker;
+class ColorMap;
+class IImage;
+class IFractalSite;
+typedef struct s_pf_data pf_obj;
+
+/*
+    a process-wide cache of idle multi-threaded workers. Starting and
+    joining the worker threads for every calculation is a noticeable
+    share of the time taken by small redraws, tiles and animation
+    frames, so instead finished workers are parked here (threads still
+    running but blocked on the empty queue) and handed out again,
+    rebound to the new job, by the next calculation which asks for the
+    same number of threads.
+*/
+
+class WorkerPool final
+{
+public:
+    // upper bound on the number of parked workers we keep around
+    static const int MAX_IDLE_WORKERS;
+
+    static WorkerPool &instance();
+
+    // get a worker, reusing an idle one if possible
+    IFractWorker *acquire(
+        int numThreads, pf_obj *, ColorMap *, IImage *, IFractalSite *);
+    // give a worker back once its calculation is finished
+    void release(IFractWorker *);
+    // number of parked workers
+    int idle_count();
+    // stop and delete all parked workers
+    void clear();
+    // per-thread load balance of the last multi-threaded worker released
+    std::vector<tpool_thread_stats> last_thread_stats();
+
+private:
+    WorkerPool() = default;
+
+    std::mutex m_lock;
+    std::vector<std::unique_ptr<MTFractWorker>> m_idle;
+    std::vector<tpool_thread_stats> m_last_stats;
+};
+
+// deleter which returns a worker to the pool instead of destroying it
+struct pooled_worker_deleter
+{
+    void operator()(IFractWorker *worker) const
+    {
+        WorkerPool::instance().release(worker);
+    }
+};
+
+typedef std::unique_ptr<IFractWorker, pooled_worker_deleter> pooled_worker_t;
+
+#endif
@@ -47,6 +47,9 @@ typedef unsigned char fate_t;
 #define FATE_SOLID 0x80
 #define FATE_DIRECT 0x40
 #define FATE_INSIDE 0x20
+/* the calculation was interrupted before the point's fate was known.
+   Attractor 31 is never reached, so this can't be a real fate */
+#define FATE_INTERRUPTED 0x1F
 
 typedef enum
 {
@@ -108,11 +111,94 @@ struct s_pf_vtable {
     void (*kill)(
 	struct s_pf_data *p
 	);
+
+    /* calculate a batch of n points, structure-of-arrays style.
+       Optional: NULL if the formula doesn't provide it.
+       xs, ys, zs, ws : the 4 coordinates of each point
+       min_period_iter is not passed per point but guessed the same way
+       the workers do, from the iteration count of the previous point
+       (-1 if it was inside), starting with *pLastIters, which is
+       updated on return. If periodicity is 0 it is never checked.
+       states is NULL, or n pointers to each point's iteration state
+       as for calc_resume (used only if calc_resume isn't NULL).
+       Each out param has n entries, except pColors which holds
+       4 planes of n (all the reds, then all the greens, ...)
+    */
+    void (*calc_batch)(
+	struct s_pf_data *p,
+	int n,
+        // in params
+        const double *xs, const double *ys,
+        const double *zs, const double *ws,
+        int nIters, int warp_param,
+	// tolerance params
+	int periodicity, int *pLastIters, double period_tolerance,
+	// only used for debugging
+	const int *px, int y, int aa,
+	double *const *states,
+        // out params
+        int *pnIters, int *pFate, double *pDist, int *pSolid,
+	int *pDirectColorFlag, double *pColors
+	);
+
+    /* calculate one point, like calc, for formulas compiled with
+       double-double precision. params holds the 4 coordinates
+       followed by the low-order part of each, so 8 doubles in all.
+       NULL if the formula was compiled with plain double precision */
+    void (*calc_dd)(
+	struct s_pf_data *p,
+        // in params
+        const double *params, int nIters, int warp_param,
+	// tolerance params
+	int min_period_iter, double period_tolerance,
+	// only used for debugging
+	int x, int y, int aa,
+        // out params
+        int *pnIters, int *pFate, double *pDist, int *pSolid,
+	int *pDirectColorFlag, double *pColors
+	);
+
+    /* calculate one point, like calc, saving its iteration state in
+       state (an array of state_size doubles, or NULL) so that a later
+       call with more iterations can carry on from where this one
+       stopped instead of starting again. If state[0] is 0 the point
+       is calculated from scratch, otherwise it resumes from the rest
+       of state, which must come from an earlier call for the same
+       point. On return, state[0] is 0 unless the point is inside.
+       NULL if the formula can't save its state */
+    void (*calc_resume)(
+	struct s_pf_data *p,
+        // in params
+        const double *params, int nIters, int warp_param,
+	// tolerance params
+	int min_period_iter, double period_tolerance,
+	// only used for debugging
+	int x, int y, int aa,
+	double *state,
+        // out params
+        int *pnIters, int *pFate, double *pDist, int *pSolid,
+	int *pDirectColorFlag, double *pColors
+	);
+    /* number of doubles calc_resume needs for each point's state */
+    int state_size;
+
+    /* make a copy of p, with the same params but its own arena, which
+       can calculate points at the same time as p on another thread.
+       Delete it with kill as usual. NULL if the formula can't be copied,
+       in which case all the threads have to share p */
+    struct s_pf_data *(*clone)(
+	struct s_pf_data *p
+	);
 } ;
 
 struct s_pf_data {
     struct s_pf_vtable *vtbl;
     void *arena;
+    /* NULL, or a flag which becomes non-zero when the calculation
+       should stop. calc and its relatives check it every so often
+       during long loops and give up on the point with a fate of
+       FATE_INTERRUPTED. pf_new sets it to NULL */
+    const volatile int *interrupted;
 } ;
 
 typedef struct s_pf_vtable pf_vtable;
@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 
+import collections
+import concurrent.futures
 import copy
+import decimal
 import enum
 import io
 import math
+import os
 import random
+import weakref
 from time import time as now
 
-from fract4d_compiler import fc, fctutils
+from fract4d_compiler import fc, fctutils, fracttypes, optimize
 from . import colorizer, formsettings, fract4dc, gradient
 
 # the version of the earliest gf4d release which can parse all the files
@@ -24,6 +29,7 @@ class AntialiasModes(enum.IntEnum):
     none = 0
     fast = 1
     best = 2
+    adaptive = 3
 
 
 class T(fctutils.T):
@@ -42,6 +48,17 @@ class T(fctutils.T):
     FORMULA = 0
     OUTER = 1
     INNER = 2
+    # doubles tell apart points about this far apart, relative to the
+    # size of the center's coordinates, with some digits to spare for
+    # the iteration to eat into. Pixels closer together than that are
+    # drawn by perturbation if the formula allows, else with double-doubles
+    DOUBLE_RESOLUTION = 2.0 ** -42
+    # "auto" picks the precision for the widest image we expect to draw
+    AUTO_PRECISION_WIDTH = 4096
+    precisions = [
+        "auto",
+        fracttypes.DoublePrecision,
+        fracttypes.DoubleDoublePrecision]
     DEFAULT_FORMULA_FILE = "gf4d.frm"
     DEFAULT_FORMULA_FUNC = "Mandelbrot"
     paramnames = [
@@ -72,7 +89,12 @@ class T(fctutils.T):
 
         self.transforms = []
         self.next_transform_id = 0
-        self.compiler_options = {"optimize": 1}
+        self.compiler_options = {
+            "optimize": optimize.Peephole | optimize.InteriorTests}
+        # compile the formula with doubles, double-doubles, or "auto" to
+        # use double-doubles once doubles run out and perturbation can't
+        self.precision = "auto"
+        self.compiled_precision = None
         self.yflip = False
         self.periodicity = True
         self.period_tolerance = 1.0E-9
@@ -80,6 +102,17 @@ class T(fctutils.T):
         self.auto_deepen = True  # automatically adjust maxiter
         self.auto_tolerance = True  # automatically adjust periodicity
         self.antialias = AntialiasModes.fast.value
+        # approximate the gradient with a table this size, 0 for exact colors
+        self.gradient_lut_size = 0
+        # guess pixels from boxes, or subdivide rectangles (Mariani-Silver)
+        self.draw_type = fract4dc.DRAW_GUESSING
+        # when subdividing, only fill in rectangles bordered by inside pixels
+        self.safe_subdivide = False
+        # with adaptive antialiasing, how many subpixels to use on edges
+        # (4, 9 or 16), stopping early once the variance of their average
+        # color is at most aa_variance
+        self.aa_samples = 4
+        self.aa_variance = 4.0
         self.compiler = compiler
         self.outputfile = None
         self.render_type = 0
@@ -104,6 +137,10 @@ class T(fctutils.T):
         self.dirtyFormula = True  # formula needs recompiling
         self.dirty = True  # parameters have changed
         self.clear_image = True
+        # the image last drawn, if only its colors have changed since,
+        # and the size it was drawn at
+        self.recolor_image = None
+        self.recolor_size = None
 
         self.reset()
 
@@ -144,8 +181,8 @@ class T(fctutils.T):
             main_file = file
             file = fctutils.Compressor()
 
-        for pair in zip(self.paramnames, self.params):
-            print("%s=%.17f" % pair, file=file)
+        for (n, name) in enumerate(self.paramnames):
+            print("%s=%s" % (name, self.format_param(n)), file=file)
 
         print("maxiter=%d" % self.maxiter, file=file)
         print("yflip=%s" % self.yflip, file=file)
@@ -176,6 +213,19 @@ class T(fctutils.T):
         if update_saved_flag:
             self.saved = True
 
+    def format_param(self, n):
+        "A location parameter as text, with every digit it has"
+        val = self.params[n]
+        if n <= self.WCENTER and \
+                self.get_center(n) != decimal.Decimal(repr(val)):
+            # more digits than a float has
+            return format(self.get_center(n), "f")
+        text = "%.17f" % val
+        if float(text) != val:
+            # too small for that many decimal places
+            text = repr(val)
+        return text
+
     def get_gradient(self):
         try:
             g = self.forms[0].get_named_param_value("@_gradient")
@@ -189,12 +239,7 @@ class T(fctutils.T):
         old_g = self.get_gradient()
         if old_g != g:
             self.forms[0].set_gradient(g)
-            #needs_redraw = False
-            # if self.forms[1].is_direct() or \
-            #   self.forms[2].is_direct():
-            #    needs_redraw = True
-
-            self.changed(True)  # needs_redraw)
+            self.colors_changed()
 
     def set_gradient_from_file(self, file, name):
         g = self.compiler.get_gradient(file, name)
@@ -286,6 +331,7 @@ class T(fctutils.T):
 
         c.maxiter = self.maxiter
         c.params = copy.copy(self.params)
+        c.center_digits = copy.copy(self.center_digits)
 
         c.bailfunc = self.bailfunc
 
@@ -300,9 +346,15 @@ class T(fctutils.T):
         c.solids = copy.copy(self.solids)
         c.yflip = self.yflip
         c.periodicity = self.periodicity
+        c.precision = self.precision
         c.period_tolerance = self.period_tolerance
         c.auto_deepen = self.auto_deepen
         c.auto_tolerance = self.auto_tolerance
+        c.gradient_lut_size = self.gradient_lut_size
+        c.draw_type = self.draw_type
+        c.safe_subdivide = self.safe_subdivide
+        c.aa_samples = self.aa_samples
+        c.aa_variance = self.aa_variance
         c.saved = self.saved
         c.clear_image = self.clear_image
         c.warp_param = self.warp_param
@@ -348,9 +400,12 @@ class T(fctutils.T):
         """Create a new fractal which blends this and the other's parameter sets using ratio.
         'angle_options' can be used to override the default method of interpolating angles."""
         new = copy.copy(self)
-        for i in range(self.XCENTER, self.MAGNITUDE):
-            a, b = self.params[i], other.params[i]
-            new.set_param(i, a * (1 - ratio) + b * ratio)
+        with decimal.localcontext() as ctx:
+            ctx.prec = max(self.center_precision(), other.center_precision())
+            r = decimal.Decimal(ratio)
+            for i in range(self.XCENTER, self.MAGNITUDE):
+                a, b = self.get_center(i), other.get_center(i)
+                new.set_center(i, a * (1 - r) + b * r)
 
         # magnitude is exponential
         a, b = self.params[self.MAGNITUDE], other.params[self.MAGNITUDE]
@@ -389,6 +444,8 @@ class T(fctutils.T):
             4.0,  # size
             0.0, 0.0, 0.0, 0.0, 0.0, 0.0  # angles
         ]
+        # the center with more digits than params can hold, for deep zooms
+        self.center_digits = [None] * 4
 
         self.bailout = 0.0
         self.maxiter = 256
@@ -416,7 +473,7 @@ class T(fctutils.T):
     def copy_colors(self, f):
         self.set_gradient(copy.copy(f.get_gradient()))
         self.set_solids(f.solids)
-        self.changed(False)
+        self.colors_changed()
 
     def set_warp_param(self, param):
         if self.warp_param != param:
@@ -429,7 +486,7 @@ class T(fctutils.T):
             c.parse_map_file(file)
         self.set_gradient(c.gradient)
         self.set_solids(c.solids)
-        self.changed(False)
+        self.colors_changed()
 
     def get_initparam(self, n, param_type):
         params = self.forms[param_type].params
@@ -442,7 +499,7 @@ class T(fctutils.T):
         if self.solids[i] == newsolid:
             return
         self.solids[i] = newsolid
-        self.changed(False)
+        self.colors_changed()
 
     def set_solids(self, solids):
         same = True
@@ -454,7 +511,7 @@ class T(fctutils.T):
             return
 
         self.solids[0:len(solids)] = solids[:]
-        self.changed(False)
+        self.colors_changed()
 
     def refresh(self):
         for i in range(3):
@@ -531,6 +588,25 @@ class T(fctutils.T):
         self.dirty = True
         self.saved = False
         self.clear_image = clear_image
+        self.recolor_image = None
+
+    def can_recolor(self):
+        # formulas which color pixels directly may use the gradient
+        # themselves, so need recalculating
+        if any(form.is_direct() for form in self.forms):
+            return False
+        # so do edges averaged from a grid of subpixels, since the image
+        # only keeps 4 of them
+        return self.antialias != AntialiasModes.adaptive or \
+            self.aa_samples == 4
+
+    def colors_changed(self):
+        "The gradient or solid colors have changed, and nothing else"
+        if not self.can_recolor():
+            self.changed()
+            return
+        self.dirty = True
+        self.saved = False
 
     def formula_changed(self):
         self.dirtyFormula = True
@@ -612,10 +688,24 @@ class T(fctutils.T):
         if options.antialias is not None:
             self.antialias = AntialiasModes[options.antialias].value
 
+        if options.precision is not None:
+            self.set_precision(options.precision)
+
+    def formula_precision(self):
+        """The precision to compile the formula at to draw this view"""
+        if self.precision != "auto":
+            return self.precision
+        if self.needs_precision(
+                self.AUTO_PRECISION_WIDTH, self.DOUBLE_RESOLUTION) and \
+                self.perturbation_settings() is None:
+            return fracttypes.DoubleDoublePrecision
+        return fracttypes.DoublePrecision
+
     def compile(self):
         if self.forms[0].formula is None:
             raise ValueError("no formula")
-        if self.dirtyFormula is False:
+        precision = self.formula_precision()
+        if self.dirtyFormula is False and precision == self.compiled_precision:
             return self.outputfile
 
         outputfile = self.compiler.compile_all(
@@ -623,12 +713,13 @@ class T(fctutils.T):
             self.forms[1].formula,
             self.forms[2].formula,
             [x.formula for x in self.transforms],
-            self.compiler_options)
+            dict(self.compiler_options, precision=precision))
 
         if outputfile is not None:
             self.set_output_file(outputfile)
 
         self.dirtyFormula = False
+        self.compiled_precision = precision
         return self.outputfile
 
     def set_output_file(self, outputfile):
@@ -720,6 +811,16 @@ class T(fctutils.T):
         if dx == 0 and dy == 0 and zoom == 1.0:
             return
 
+        # moving the view sideways by whole pixels keeps the part of the
+        # last image which is still in view, and zooming keeps the pixels
+        # which land exactly on old ones
+        if axis != 0:
+            kept = False
+        elif zoom == 1.0:
+            kept = self.shift_image(dx, dy)
+        else:
+            kept = self.rescale_image(dx, dy, zoom)
+
         m = fract4dc.rot_matrix(self.params)
 
         deltax = self.mul_vs(m[axis], dx)
@@ -728,12 +829,63 @@ class T(fctutils.T):
         else:
             deltay = self.mul_vs(m[axis + 1], -dy)
 
-        self.params[self.XCENTER] += deltax[0] + deltay[0]
-        self.params[self.YCENTER] += deltax[1] + deltay[1]
-        self.params[self.ZCENTER] += deltax[2] + deltay[2]
-        self.params[self.WCENTER] += deltax[3] + deltay[3]
+        # add the move to all the center's digits, so zooming in further
+        # than a float can describe still lands in the right place
+        with decimal.localcontext() as ctx:
+            ctx.prec = self.center_precision()
+            for i in range(self.XCENTER, self.MAGNITUDE):
+                digits = self.get_center(i) + \
+                    decimal.Decimal(deltax[i] + deltay[i])
+                self.center_digits[i] = digits
+                self.params[i] = float(digits)
         self.params[self.MAGNITUDE] *= zoom
-        self.changed()
+        self.changed(not kept)
+
+    def set_recolor_image(self, image):
+        "Recolor image next time if only the colors change before then"
+        self.recolor_image = weakref.ref(image)
+        self.recolor_size = (image.xsize, image.ysize)
+
+    def get_recolor_image(self):
+        "The image last drawn, unless it's been resized since"
+        image = self.recolor_image() if self.recolor_image is not None else None
+        if image is None or (image.xsize, image.ysize) != self.recolor_size:
+            return None
+        return image
+
+    def last_image(self):
+        "The image last drawn, if it's still complete"
+        image = self.get_recolor_image()
+        if image is None or self.render_type != 0:
+            return None
+        return image
+
+    def shift_image(self, dx, dy):
+        "Move the last image drawn to match a move of dx, dy image widths"
+        image = self.last_image()
+        if image is None:
+            return False
+        # dy is in widths too
+        px = dx * image.total_xsize
+        py = dy * image.total_xsize
+        if abs(px - round(px)) > 1.0e-6 or abs(py - round(py)) > 1.0e-6:
+            return False
+        image.shift(round(px), round(py))
+        return True
+
+    def rescale_image(self, dx, dy, zoom):
+        "Keep the pixels of the last image drawn which a zoom lands on"
+        image = self.last_image()
+        if image is None:
+            return False
+        (w, h) = (image.xsize, image.ysize)
+        # the new center, in pixels of the old image
+        cx = w / 2.0 + dx * image.total_xsize
+        cy = h / 2.0 + dy * image.total_xsize
+        # which old pixel the first new one's center is on
+        x0 = cx + zoom * (0.5 - w / 2.0) - 0.5
+        y0 = cy + zoom * (0.5 - h / 2.0) - 0.5
+        return image.rescale(x0, y0, zoom)
 
     def flip_to_julia(self):
         self.params[self.XZANGLE] += self.rot_by
@@ -785,7 +937,8 @@ class T(fctutils.T):
         return p
 
     def get_colormap(self):
-        cmap = fract4dc.cmap_create_gradient(self.get_gradient().segments)
+        cmap = fract4dc.cmap_create_gradient(
+            self.get_gradient().segments, self.gradient_lut_size)
 
         (r, g, b, a) = self.solids[0]
         fract4dc.cmap_set_solid(cmap, 0, r, g, b, a)
@@ -798,6 +951,12 @@ class T(fctutils.T):
         initparams = self.all_params()
         fract4dc.pf_init(self.pfunc, self.params, initparams)
 
+    def make_pfunc(self):
+        "Another instance of the formula, for a calculation running alongside"
+        pfunc = fract4dc.pf_create(self.handle)
+        fract4dc.pf_init(pfunc, self.params, self.all_params())
+        return pfunc
+
     def get_warp(self):
         if self.warp_param:
             warp = self.forms[0].order_of_name(self.warp_param)
@@ -815,17 +974,58 @@ class T(fctutils.T):
             self.antialias = aa
             self.changed(True)
 
+    def set_precision(self, precision):
+        if precision not in self.precisions:
+            raise ValueError(f"unknown precision {precision!r}")
+        if precision != self.precision:
+            self.precision = precision
+            self.changed(True)
+
     def set_auto_deepen(self, auto_deepen):
         if auto_deepen != self.auto_deepen:
             self.auto_deepen = auto_deepen
             self.changed(True)
 
+    def set_gradient_lut_size(self, lut_size):
+        if lut_size != self.gradient_lut_size:
+            self.gradient_lut_size = lut_size
+            self.colors_changed()
+
+    def set_draw_type(self, draw_type):
+        if draw_type != self.draw_type:
+            self.draw_type = draw_type
+            self.changed()
+
+    def set_safe_subdivide(self, safe_subdivide):
+        if safe_subdivide != self.safe_subdivide:
+            self.safe_subdivide = safe_subdivide
+            self.changed()
+
+    def set_aa_samples(self, aa_samples):
+        if aa_samples not in (4, 9, 16):
+            raise ValueError(f"aa_samples must be 4, 9 or 16, not {aa_samples}")
+        if aa_samples != self.aa_samples:
+            self.aa_samples = aa_samples
+            self.changed(True)
+
+    def set_aa_variance(self, aa_variance):
+        if aa_variance != self.aa_variance:
+            self.aa_variance = aa_variance
+            self.changed(True)
+
     def set_auto_tolerance(self, auto_tolerance):
         if auto_tolerance != self.auto_tolerance:
             self.auto_tolerance = auto_tolerance
             self.changed(True)
 
-    def calc(self, image, colormap, nthreads, site, asynchronous):
+    def calc(self, image, colormap, nthreads, site, asynchronous,
+             priority=fract4dc.PRIORITY_INTERACTIVE, pfunc=None):
+        tolerance = self.period_tolerance
+        if self.compiled_precision == fracttypes.DoubleDoublePrecision:
+            # orbits of neighbouring pixels come closer together than
+            # the usual tolerance without being periodic
+            pixel = abs(self.params[self.MAGNITUDE]) / image.total_xsize
+            tolerance = min(tolerance, pixel)
         fract4dc.calc(
             params=self.params,
             antialias=self.antialias,
@@ -833,17 +1033,23 @@ class T(fctutils.T):
             yflip=self.yflip,
             periodicity=self.periodicity,
             nthreads=nthreads,
-            pfo=self.pfunc,
+            pfo=pfunc or self.pfunc,
             cmap=colormap,
             auto_deepen=self.auto_deepen,
             auto_tolerance=self.auto_tolerance,
-            tolerance=self.period_tolerance,
+            tolerance=tolerance,
             render_type=self.render_type,
+            draw_type=self.draw_type,
+            safe_subdivide=self.safe_subdivide,
+            aa_samples=self.aa_samples,
+            aa_variance=self.aa_variance,
             warp_param=self.get_warp(),
             image=image._img,
             site=site,
             dirty=self.clear_image,
-            asynchronous=asynchronous)
+            priority=priority,
+            asynchronous=asynchronous,
+            **self.deep_zoom_args(image))
 
     def drawpoint(self, repeats=1000):
         self.init_pfunc()
@@ -858,11 +1064,25 @@ class T(fctutils.T):
             result)
         print("duration:\t%.4g" % duration)
 
-    def draw(self, image, nthreads=1):
+    def draw(self, image, nthreads=1, tiles_in_flight=2):
         self.init_pfunc()
 
         colormap = self.get_colormap()
-        for (xoff, yoff, xres, yres) in image.get_tile_list():
+        tiles = image.get_tile_list()
+        if self.get_recolor_image() is image and self.can_recolor():
+            # only the colors have changed since we drew this
+            fract4dc.recolor(image._img, colormap, nthreads)
+            image.save_tile()
+            return
+
+        # deepening or tightening on one tile changes the settings the
+        # next one is drawn with, so those have to go one at a time
+        if len(tiles) > 1 and tiles_in_flight > 1 and \
+                not self.auto_deepen and not self.auto_tolerance:
+            self.draw_tiles(image, tiles, colormap, nthreads, tiles_in_flight)
+            return
+
+        for (xoff, yoff, xres, yres) in tiles:
             image.resize_tile(xres, yres)
             image.set_offset(xoff, yoff)
 
@@ -870,15 +1090,153 @@ class T(fctutils.T):
 
             image.save_tile()
 
+        if len(tiles) == 1 and image.buffers == fract4dc.IMAGE_BUFFERS_FULL:
+            # with more than one, only the last tile is left to recolor
+            self.set_recolor_image(image)
+
+    def draw_tiles(self, image, tiles, colormap, nthreads, tiles_in_flight):
+        """Draw several tiles at once, each into an image of its own, so
+        no thread waits for the last rows of one tile before the next
+        starts. Finished tiles are saved in order"""
+        def draw_tile(tile_image, pfunc, tile):
+            (xoff, yoff, xres, yres) = tile
+            tile_image.resize_tile(xres, yres)
+            tile_image.set_offset(xoff, yoff)
+            self.calc(tile_image, colormap, nthreads, self.site, False,
+                      pfunc=pfunc)
+            return tile_image
+
+        # each calculation needs a formula instance of its own, too
+        free = collections.deque([(image, self.pfunc)])
+        free.extend(
+            (image.new_tile(), self.make_pfunc())
+            for i in range(min(tiles_in_flight, len(tiles)) - 1))
+        in_flight = collections.deque()
+        with concurrent.futures.ThreadPoolExecutor(len(free)) as executor:
+            for tile in tiles:
+                if not free:
+                    # save the oldest tile to make room for this one
+                    (future, slot) = in_flight.popleft()
+                    image.save_tile(future.result())
+                    free.append(slot)
+                slot = free.popleft()
+                in_flight.append(
+                    (executor.submit(draw_tile, *slot, tile), slot))
+            for (future, slot) in in_flight:
+                image.save_tile(future.result())
+
     def clean(self):
         self.dirty = False
 
     def set_param(self, n, val):
+        if n <= self.WCENTER:
+            self.set_center(n, val)
+            return
         val = float(val)
         if self.params[n] != val:
             self.params[n] = val
             self.changed()
 
+    def get_center(self, n):
+        """One coordinate of the center as a Decimal, with all the digits
+        it was last given"""
+        digits = self.center_digits[n]
+        if digits is None or float(digits) != self.params[n]:
+            # params has been changed directly since
+            return decimal.Decimal(repr(self.params[n]))
+        return digits
+
+    def set_center(self, n, val):
+        """Set one coordinate of the center. Strings and Decimals keep all
+        their digits, for zooms deeper than a float can describe"""
+        if isinstance(val, str):
+            try:
+                digits = decimal.Decimal(val.strip())
+            except decimal.InvalidOperation:
+                raise ValueError(f"could not convert string to number: {val!r}")
+        elif isinstance(val, decimal.Decimal):
+            digits = val
+        elif float(val) == self.params[n]:
+            # the same place, perhaps with fewer digits than we have
+            return
+        else:
+            digits = decimal.Decimal(repr(float(val)))
+        if digits != self.get_center(n):
+            self.center_digits[n] = digits
+            self.params[n] = float(digits)
+            self.changed()
+
+    def center_precision(self):
+        """How many significant digits the center needs to pick out a
+        pixel at the current magnification"""
+        size = abs(self.params[self.MAGNITUDE])
+        depth = -math.floor(math.log10(size)) if size > 0.0 else 0
+        return max(decimal.getcontext().prec, depth + 20)
+
+    def needs_precision(self, width, resolution):
+        """Are the pixels of an image this wide too close together for
+        numbers which tell apart points resolution apart, relative to the
+        size of the center?"""
+        pixel = abs(self.params[self.MAGNITUDE]) / width
+        scale = max(abs(x) for x in self.params[self.XCENTER:self.MAGNITUDE])
+        return pixel < scale * resolution
+
+    def perturbation_settings(self):
+        """If perturbation can draw the formula and its colorfuncs, return
+        its deep_zoom_bailout and deep_zoom_coloring arguments to calc().
+        Otherwise None"""
+        if self.transforms or self.warp_param or self.render_type != 0:
+            return None
+        shape = optimize.mandelbrot_shape(self.forms[0].formula)
+        if shape is None:
+            return None
+        (start, limit) = shape
+        if start is None and any(
+                self.params[i] != 0.0 for i in (
+                    self.ZCENTER, self.WCENTER, self.XZANGLE,
+                    self.XWANGLE, self.YZANGLE, self.YWANGLE)):
+            # perturbation starts z at the pixel's zw coordinates
+            return None
+        if isinstance(limit, str):
+            limit = self.forms[0].get_named_param_value(limit)
+
+        # outside, continuous potential or iteration count; inside, solid
+        (outer, inner) = self.forms[1:]
+        if os.path.basename(inner.funcFile) != "gf4d.cfrm" or \
+                inner.funcName != "zero" or \
+                os.path.basename(outer.funcFile) != "gf4d.cfrm" or \
+                outer.get_func_value("@_transfer") != "ident":
+            return None
+        if outer.funcName == "continuous_potential":
+            potential = outer.get_named_param_value("@bailout")
+        elif outer.funcName == "default":
+            potential = 0.0
+        else:
+            return None
+        coloring = (
+            potential,
+            outer.get_named_param_value("@_density"),
+            outer.get_named_param_value("@_offset"))
+        return (limit, coloring)
+
+    def deep_zoom_args(self, image):
+        """Extra arguments to calc() for an image too deep for doubles:
+        perturbation if it can draw it, else the center's digits for a
+        formula compiled with double-doubles"""
+        center = tuple(str(self.get_center(i)) for i in range(4))
+        if self.compiled_precision == fracttypes.DoubleDoublePrecision:
+            return {"precise_center": center}
+        if not self.needs_precision(image.total_xsize, self.DOUBLE_RESOLUTION):
+            return {}
+        settings = self.perturbation_settings()
+        if settings is None:
+            return {}
+        (bailout, coloring) = settings
+        return {
+            "deep_zoom": center,
+            "deep_zoom_bailout": bailout,
+            "deep_zoom_coloring": coloring}
+
     def get_param(self, n):
         return self.params[n]
 
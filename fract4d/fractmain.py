@@ -4,7 +4,7 @@ import os
 import shutil
 
 from fract4d_compiler import fc
-from . import fractal, image
+from . import fractal, fract4dc, image
 
 
 class T:
@@ -41,7 +41,12 @@ class T:
         if options.singlepoint:
             self.f.drawpoint()
         else:
-            im = image.T(width, height)
+            # without antialiasing the image is only saved, never
+            # recolored, so it needn't keep each pixel's color index
+            buffers = fract4dc.IMAGE_BUFFERS_FULL if self.f.antialias \
+                else fract4dc.IMAGE_BUFFERS_RGB_ITER
+            im = image.T(width, height, buffers=buffers,
+                         backing_dir=options.scratch_dir)
             self.f.draw(im, threads)
 
         if options.save_filename:
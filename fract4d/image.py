@@ -27,8 +27,18 @@ class T:
     BLACK = [0, 0, 0]
     WHITE = [255, 255, 255]
 
-    def __init__(self, xsize, ysize, txsize=-1, tysize=-1):
-        self._img = fract4dc.image_create(xsize, ysize, txsize, tysize)
+    def __init__(self, xsize, ysize, txsize=-1, tysize=-1,
+                 buffers=fract4dc.IMAGE_BUFFERS_FULL, backing_dir=None):
+        # lean buffers save memory, but can't be antialiased or recolored.
+        # With a backing_dir, the buffers are kept in a scratch file there
+        # which the OS pages in and out, for images too big for RAM
+        self._img = fract4dc.image_create(
+            xsize, ysize, txsize, tysize, buffers, backing_dir)
+        self.buffers = buffers
+        self.backing_dir = backing_dir
+        # only full images keep a fate for each subpixel
+        self.fate_size = T.FATE_SIZE \
+            if buffers == fract4dc.IMAGE_BUFFERS_FULL else 1
         self.update_bufs()
         self.writer = None
         self.fp = None
@@ -98,10 +108,15 @@ class T:
         self.writer = fract4dc.image_writer_create(self._img, name, ft)
         fract4dc.image_save_header(self.writer)
 
-    def save_tile(self):
+    def save_tile(self, tile=None):
+        # tile is another image the same size as this one, holding rows
+        # drawn separately
         if self.writer is None:
             return
-        fract4dc.image_save_tile(self.writer)
+        if tile is None or tile is self:
+            fract4dc.image_save_tile(self.writer)
+        else:
+            fract4dc.image_save_tile(self.writer, tile._img)
 
     def finish_save(self):
         fract4dc.image_save_footer(self.writer)
@@ -123,6 +138,11 @@ class T:
             x = 0
         return tiles
 
+    def new_tile(self):
+        "Another image like this one, to draw a different tile into"
+        return T(self.xsize, self.ysize, self.total_xsize, self.total_ysize,
+                 self.buffers, self.backing_dir)
+
     def set_offset(self, x, y):
         fract4dc.image_set_offset(self._img, x, y)
 
@@ -144,6 +164,17 @@ class T:
     def clear(self):
         fract4dc.image_clear(self._img)
 
+    def shift(self, dx, dy):
+        # keep what's already been drawn when the view moves dx pixels
+        # right and dy down, leaving the newly exposed pixels to calculate
+        fract4dc.image_shift(self._img, dx, dy)
+
+    def rescale(self, x0, y0, scale):
+        # keep the pixels of a zoomed view whose centers are exactly on
+        # those of old pixels: the new pixel (x, y) is the old pixel
+        # (x0 + x * scale, y0 + y * scale). Returns False if there aren't any
+        return fract4dc.image_rescale(self._img, x0, y0, scale)
+
     def pos(self, x, y, size):
         return size * (y * self.xsize + x)
 
@@ -154,7 +185,7 @@ class T:
         return fract4dc.image_buffer(self._img, x, y)
 
     def get_fate(self, x, y):
-        n = self.fate_buf[self.pos(x, y, T.FATE_SIZE)]
+        n = self.fate_buf[self.pos(x, y, self.fate_size)]
         if n == T.UNKNOWN:
             return None
         elif n & T.SOLID:
@@ -165,8 +196,8 @@ class T:
         return (is_solid, fate)
 
     def get_all_fates(self, x, y):
-        pos = self.pos(x, y, T.FATE_SIZE)
-        return list(self.fate_buf[pos:pos + T.FATE_SIZE])
+        pos = self.pos(x, y, self.fate_size)
+        return list(self.fate_buf[pos:pos + self.fate_size])
 
     def get_color(self, x, y):
         pos = self.pos(x, y, T.COL_SIZE)
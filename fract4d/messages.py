@@ -18,6 +18,12 @@ def parse(type, buffer):
         return Stats(buffer)
 
 
+def read_status(site):
+    "Everything a status site has saved up since the last read, parsed"
+    return [(t, parse(t, buffer))
+            for (t, buffer) in fract4dc.statussite_read(site)]
+
+
 class T:
     pass
 
@@ -92,10 +98,16 @@ class Stats(T):
         instance.pixels_inside = list[6]
         instance.pixels_outside = list[7]
         instance.pixels_periodic = list[8]
+        instance.pixels_resumed = list[13] if len(list) > 13 else 0
+        instance.pixels_antialiased = list[14] if len(list) > 14 else 0
+        instance.subpixels_antialiased = list[15] if len(list) > 15 else 0
         return instance
     fromList = staticmethod(fromList)
 
     def __init__(self, buffer=None):
+        self.pixels_resumed = 0
+        self.pixels_antialiased = 0
+        self.subpixels_antialiased = 0
         if buffer:
             (self.iterations,
              self.pixels,
@@ -109,7 +121,10 @@ class Stats(T):
              dummy,
              dummy,
              dummy,
-             dummy) = struct.unpack("13L", buffer)
+             dummy,
+             self.pixels_resumed,
+             self.pixels_antialiased,
+             self.subpixels_antialiased) = struct.unpack("16L", buffer)
 
     def _get_name(self):
         return "Stats"
@@ -1,5 +1,6 @@
 import argparse
 import collections
+import decimal
 import os.path
 import sys
 from . import fractal as fract4d_fractal
@@ -113,13 +114,28 @@ class Arguments(argparse.ArgumentParser):
         output.add_argument("-j", "--height", type=int, metavar="N",
                             help="Make image N pixels tall")
 
+        output.add_argument("--scratch-dir", metavar="DIR",
+                            help="Keep the image in a file in DIR while drawing, "
+                            "for images too big to fit in memory")
+
         aa_modes = [i.name for i in fract4d_fractal.AntialiasModes]
         output.add_argument("--antialias", metavar="MODE",
                             choices=aa_modes,
                             help=f"Antialiasing MODE (one of {'|'.join(aa_modes)})")
 
+        precisions = fract4d_fractal.T.precisions
+        fractal.add_argument("--precision", metavar="P",
+                             choices=precisions,
+                             help=f"Compute with precision P (one of {'|'.join(precisions)}), "
+                             "'auto' to use more only for deep zooms")
+
         for p in POSITION_ARGUMENTS:
-            position.add_argument("--%s" % p, type=int, metavar="N")
+            if p.endswith("center"):
+                # as many digits as a deep zoom needs
+                position.add_argument(
+                    "--%s" % p, type=decimal.Decimal, metavar="N")
+            else:
+                position.add_argument("--%s" % p, type=int, metavar="N")
 
         obscure.add_argument("--nogui", action="store_true",
                              help="Run with no UI (doesn't require X or GTK+)")
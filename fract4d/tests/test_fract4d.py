@@ -4,6 +4,7 @@ import os.path
 import struct
 import math
 import select
+import time
 
 from . import testbase
 
@@ -109,6 +110,51 @@ class Test(testbase.ClassSetup):
         pfunc = None
         handle = None
 
+    def testCalcBatch(self):
+        self.compileMandel()
+        handle = fract4dc.pf_load(Test.pf_name)
+        pfunc = fract4dc.pf_create(handle)
+
+        fract4dc.pf_init(pfunc, pos_params, [self.gradient, 4.0, 0.5])
+
+        points = [(0.15, 0.0, 0.0, 0.0),
+                  (1.0, 1.0, 0.0, 0.0),
+                  (17.5, 14.0, 0.0, 0.0),
+                  (-0.75, 0.1, 0.0, 0.0)]
+
+        # without periodicity a batch matches calculating each point alone
+        results = fract4dc.pf_calc_batch(pfunc, points, 100)
+        self.assertEqual(
+            [fract4dc.pf_calc(pfunc, p, 100) for p in points], results)
+
+        self.assertEqual([], fract4dc.pf_calc_batch(pfunc, [], 100))
+
+    def testBrentPeriodCheck(self):
+        points = [(0.15, 0.0, 0.0, 0.0),
+                  (1.0, 1.0, 0.0, 0.0),
+                  (-0.1, 0.2, 0.0, 0.0),
+                  (-1.0, 0.05, 0.0, 0.0),
+                  (-0.75, 0.1, 0.0, 0.0)]
+
+        results = []
+        for period_check in ["interval", "brent"]:
+            f = self.compiler.get_formula("gf4d.frm", "Mandelbrot")
+            cg = self.compiler.compile(f, {"period_check": period_check})
+            self.compiler.generate_code(f, cg, Test.pf_name)
+            handle = fract4dc.pf_load(Test.pf_name)
+            pfunc = fract4dc.pf_create(handle)
+            fract4dc.pf_init(pfunc, pos_params, [self.gradient, 4.0, 0.5])
+            results.append(fract4dc.pf_calc_batch(pfunc, points, 1000, 1))
+
+        # both ways of looking for cycles spot the same points inside,
+        # well before maxiter
+        for result in results:
+            self.assertEqual(
+                [32, 0, 32, 32, 0],
+                [fate for (iters, fate, dist, solid) in result])
+            for (iters, fate, dist, solid) in result:
+                self.assertLess(iters, 1000)
+
     def makeWorkerAndFunc(self, image, cmap):
         siteobj = FractalSite()
         site = fract4dc.site_create(siteobj)
@@ -318,6 +364,91 @@ class Test(testbase.ClassSetup):
             im, 3, 1, [im.UNKNOWN] * 4,
             [79, 88, 41], [100, 101, 102], im.OUT)
 
+    def testUpdateRate(self):
+        xsize = 64
+        ysize = 48
+        file = self.compileColorMandel()
+        handle = fract4dc.pf_load(file)
+        pfunc = fract4dc.pf_create(handle)
+        fract4dc.pf_init(pfunc, pos_params, self.color_mandel_params)
+        cmap = fract4dc.cmap_create([(1.0, 255, 255, 255, 255)])
+
+        def calc(update_rate):
+            im = image.T(xsize, ysize)
+            siteobj = FractalSite()
+            fract4dc.calc(
+                params=[0.0, 0.0, 0.0, 0.0,
+                        4.0,
+                        0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+                antialias=0,
+                maxiter=100,
+                nthreads=4,
+                pfo=pfunc,
+                cmap=cmap,
+                image=im._img,
+                site=fract4dc.site_create(siteobj),
+                update_rate=update_rate)
+            return siteobj
+
+        # every finished part of the image gets reported
+        every_row = calc(0)
+        # finished parts get saved up and reported together
+        coalesced = calc(1)
+        self.assertLess(
+            len(coalesced.image_list), len(every_row.image_list))
+        self.assertLess(
+            len(coalesced.progress_list), len(every_row.progress_list))
+
+        for siteobj in [every_row, coalesced]:
+            self.assertEqual((0, 0, xsize, ysize), siteobj.image_list[-1])
+            self.assertEqual([1.0, 0.0], siteobj.progress_list[-2:])
+            for (x1, y1, x2, y2) in siteobj.image_list:
+                self.assertEqual((0, xsize), (x1, x2))
+                self.assertLess(y1, y2)
+
+    def testUpdatesDuringPass(self):
+        # the calc thread hands a whole pass to the worker threads then
+        # waits for it. The site should hear how they're getting on
+        # meanwhile, not just when the pass is over
+        xsize = 128
+        ysize = 96
+        file = self.compileColorMandel()
+        handle = fract4dc.pf_load(file)
+        pfunc = fract4dc.pf_create(handle)
+        fract4dc.pf_init(pfunc, pos_params, self.color_mandel_params)
+        cmap = fract4dc.cmap_create([(1.0, 255, 255, 255, 255)])
+
+        im = image.T(xsize, ysize)
+        siteobj = FractalSite()
+        # a period-4 bulb, which the interior checks don't skip
+        fract4dc.calc(
+            params=[-1.31, 0.0, 0.0, 0.0,
+                    0.2,
+                    0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+            antialias=0,
+            maxiter=20000,
+            periodicity=0,
+            nthreads=2,
+            pfo=pfunc,
+            cmap=cmap,
+            image=im._img,
+            site=fract4dc.site_create(siteobj),
+            update_rate=100)
+
+        # the first pass's first half runs from 0 to 0.15 and starts and
+        # ends by redrawing the whole image
+        whole = (0, 0, xsize, ysize)
+        first = siteobj.image_list.index(whole)
+        second = siteobj.image_list.index(whole, first + 1)
+        partial = siteobj.image_list[first + 1:second]
+        self.assertGreaterEqual(len(partial), 3)
+        for (x1, y1, x2, y2) in partial:
+            self.assertEqual((0, xsize), (x1, x2))
+            self.assertLess(y2 - y1, ysize)
+
+        during = set(p for p in siteobj.progress_list if 0.0 < p < 0.149)
+        self.assertGreaterEqual(len(during), 3)
+
     def testMultiThreadedCalc(self):
         xsize = 64
         ysize = int(xsize * 3.0 / 4.0)
@@ -382,6 +513,271 @@ class Test(testbase.ClassSetup):
 
         self.assertPixelCount(xsize, ysize, siteobj)
 
+    def testWorkerPoolReuse(self):
+        fract4dc.pool_clear()
+        self.assertEqual(0, fract4dc.pool_idle_count())
+
+        file = self.compileColorMandel()
+        handle = fract4dc.pf_load(file)
+        pfunc = fract4dc.pf_create(handle)
+        fract4dc.pf_init(pfunc, pos_params, self.color_mandel_params)
+        cmap = fract4dc.cmap_create(
+            [(0.0, 0, 0, 0, 255),
+             (1 / 256.0, 255, 255, 255, 255),
+             (1.0, 255, 255, 255, 255)])
+
+        buffers = []
+        for xsize in [64, 48, 64]:
+            ysize = int(xsize * 3.0 / 4.0)
+            im = image.T(xsize, ysize)
+            siteobj = FractalSite()
+            site = fract4dc.site_create(siteobj)
+            fract4dc.calc(
+                params=pos_params,
+                antialias=1,
+                maxiter=100,
+                nthreads=3,
+                pfo=pfunc,
+                cmap=cmap,
+                image=im._img,
+                site=site)
+
+            # the worker is parked for the next calculation, not destroyed
+            self.assertEqual(1, fract4dc.pool_idle_count())
+            self.assertPixelCount(xsize, ysize, siteobj)
+            buffers.append(bytes(im.image_buffer()))
+
+        # a reused worker draws the same image as a fresh one
+        self.assertEqual(buffers[0], buffers[2])
+
+        fract4dc.pool_clear()
+        self.assertEqual(0, fract4dc.pool_idle_count())
+
+    def testWorkStealing(self):
+        file = self.compileColorMandel()
+        handle = fract4dc.pf_load(file)
+        pfunc = fract4dc.pf_create(handle)
+        fract4dc.pf_init(pfunc, pos_params, self.color_mandel_params)
+        cmap = fract4dc.cmap_create(
+            [(0.0, 0, 0, 0, 255),
+             (1 / 256.0, 255, 255, 255, 255),
+             (1.0, 255, 255, 255, 255)])
+
+        (xsize, ysize) = (320, 240)
+        buffers = []
+        for nthreads in [1, 4]:
+            im = image.T(xsize, ysize)
+            siteobj = FractalSite()
+            site = fract4dc.site_create(siteobj)
+            # no periodicity so the result doesn't depend on which
+            # thread calculated the previous pixel
+            fract4dc.calc(
+                params=pos_params,
+                antialias=0,
+                maxiter=200,
+                periodicity=0,
+                auto_deepen=0,
+                nthreads=nthreads,
+                pfo=pfunc,
+                cmap=cmap,
+                image=im._img,
+                site=site)
+
+            # splitting jobs mustn't calculate any pixel twice
+            self.assertPixelCount(xsize, ysize, siteobj)
+            buffers.append(bytes(im.image_buffer()))
+
+        self.assertEqual(buffers[0], buffers[1])
+
+        stats = fract4dc.pool_thread_stats()
+        self.assertEqual(4, len(stats))
+        for (busy, idle, jobs, steals, splits) in stats:
+            self.assertTrue(busy >= 0.0)
+            self.assertTrue(idle >= 0.0)
+            self.assertTrue(steals <= jobs)
+            self.assertTrue(splits <= steals)
+        self.assertTrue(sum([s[2] for s in stats]) > 0)
+
+        fract4dc.pool_clear()
+
+    def testDeepZoom(self):
+        cf1 = self.compiler.get_formula(
+            "gf4d.cfrm", "continuous_potential", "cf0")
+        cf2 = self.compiler.get_formula("gf4d.cfrm", "zero", "cf1")
+        f = self.compiler.get_formula("gf4d.frm", "Mandelbrot")
+        handle = fract4dc.pf_load(self.compiler.compile_all(f, cf1, cf2, []))
+        pfunc = fract4dc.pf_create(handle)
+        fract4dc.pf_init(
+            pfunc, pos_params,
+            f.symbols.default_params() +
+            cf1.symbols.default_params() +
+            cf2.symbols.default_params())
+        cmap = fract4dc.cmap_create(
+            [(0.0, 0, 0, 0, 255),
+             (1.0, 255, 255, 255, 255)])
+
+        (xsize, ysize) = (64, 48)
+
+        def draw(params, maxiter, deep_zoom=None, series_approximation=1):
+            im = image.T(xsize, ysize)
+            siteobj = FractalSite()
+            site = fract4dc.site_create(siteobj)
+            fract4dc.calc(
+                params=params,
+                maxiter=maxiter,
+                periodicity=0,
+                nthreads=2,
+                pfo=pfunc,
+                cmap=cmap,
+                image=im._img,
+                site=site,
+                deep_zoom=deep_zoom,
+                series_approximation=series_approximation)
+            return [im.get_color_index(x, y)
+                    for y in range(ysize) for x in range(xsize)]
+
+        # at low magnification perturbation agrees with the formula,
+        # give or take rounding on the boundary
+        plain = draw(pos_params, 256)
+        deep = draw(pos_params, 256, ("0.0", "0.0"))
+        same = [abs(a - b) < 1.0e-4 for (a, b) in zip(plain, deep)]
+        self.assertTrue(same.count(True) > 0.99 * len(same))
+
+        # at 1e-20 doubles can't tell the pixels apart, but deltas can
+        params = pos_params[:]
+        params[0] = -0.7436438870371587
+        params[1] = 0.1318259042053119
+        params[4] = 1.0e-20
+        plain = draw(params, 20000)
+        deep = draw(params, 20000, (
+            "-0.743643887037158704752191506114774",
+            "0.131825904205311970493132056385139"))
+        self.assertTrue(len(set(plain)) < 10)
+        self.assertTrue(len(set(deep)) > 0.5 * len(deep))
+
+        # skipping iterations by series approximation gives the same picture
+        exact = draw(params, 20000, (
+            "-0.743643887037158704752191506114774",
+            "0.131825904205311970493132056385139"),
+            series_approximation=0)
+        same = [abs(a - b) < 1.0e-4 for (a, b) in zip(exact, deep)]
+        self.assertTrue(same.count(True) > 0.98 * len(same))
+
+        self.assertRaises(
+            ValueError, draw, pos_params, 256, ("0.0", "not a number"))
+        self.assertRaises(
+            ValueError, draw, pos_params, 256, ("0.0",))
+
+    def testDoubleDouble(self):
+        cf1 = self.compiler.get_formula(
+            "gf4d.cfrm", "continuous_potential", "cf0")
+        cf2 = self.compiler.get_formula("gf4d.cfrm", "zero", "cf1")
+        f = self.compiler.get_formula("gf4d.frm", "Mandelbrot")
+        initparams = (
+            f.symbols.default_params() +
+            cf1.symbols.default_params() +
+            cf2.symbols.default_params())
+        cmap = fract4dc.cmap_create(
+            [(0.0, 0, 0, 0, 255),
+             (1.0, 255, 255, 255, 255)])
+
+        pfuncs = {}
+        for precision in ["double", "double-double"]:
+            handle = fract4dc.pf_load(self.compiler.compile_all(
+                f, cf1, cf2, [], {"precision": precision}))
+            pfuncs[precision] = fract4dc.pf_create(handle)
+            fract4dc.pf_init(pfuncs[precision], pos_params, initparams)
+
+        (xsize, ysize) = (32, 24)
+
+        def draw(precision, params, maxiter, precise_center=None):
+            im = image.T(xsize, ysize)
+            siteobj = FractalSite()
+            site = fract4dc.site_create(siteobj)
+            fract4dc.calc(
+                params=params,
+                maxiter=maxiter,
+                periodicity=0,
+                nthreads=2,
+                pfo=pfuncs[precision],
+                cmap=cmap,
+                image=im._img,
+                site=site,
+                precise_center=precise_center)
+            return [im.get_color_index(x, y)
+                    for y in range(ysize) for x in range(xsize)]
+
+        # at low magnification the two agree
+        plain = draw("double", pos_params, 256)
+        dd = draw("double-double", pos_params, 256)
+        same = [abs(a - b) < 1.0e-4 for (a, b) in zip(plain, dd)]
+        self.assertTrue(same.count(True) > 0.99 * len(same))
+
+        # at 1e-20 doubles can't tell the pixels apart, double-doubles can
+        params = pos_params[:]
+        params[4] = 1.0e-20
+        center = (
+            "-0.743643887037158704752191506114774",
+            "0.131825904205311970493132056385139")
+        plain = draw("double", params, 10000, center)
+        dd = draw("double-double", params, 10000, center)
+        self.assertTrue(len(set(plain)) < 10)
+        self.assertTrue(len(set(dd)) > 0.5 * len(dd))
+
+        self.assertRaises(
+            ValueError, draw, "double", pos_params, 256, ("0.0", "nan?"))
+
+    def testResumeAutoDeepen(self):
+        cf1 = self.compiler.get_formula(
+            "gf4d.cfrm", "continuous_potential", "cf0")
+        cf2 = self.compiler.get_formula("gf4d.cfrm", "zero", "cf1")
+        f = self.compiler.get_formula("gf4d.frm", "Mandelbrot")
+        handle = fract4dc.pf_load(self.compiler.compile_all(f, cf1, cf2, []))
+        pfunc = fract4dc.pf_create(handle)
+        fract4dc.pf_init(
+            pfunc, pos_params,
+            f.symbols.default_params() +
+            cf1.symbols.default_params() +
+            cf2.symbols.default_params())
+        cmap = fract4dc.cmap_create(
+            [(0.0, 0, 0, 0, 255),
+             (1.0, 255, 255, 255, 255)])
+
+        params = pos_params[:]
+        params[0] = -0.75
+        params[1] = 0.1
+        params[4] = 0.05
+        (xsize, ysize) = (64, 48)
+
+        def draw(maxiter, auto_deepen):
+            im = image.T(xsize, ysize)
+            siteobj = FractalSite()
+            site = fract4dc.site_create(siteobj)
+            fract4dc.calc(
+                params=params,
+                maxiter=maxiter,
+                periodicity=0,
+                auto_deepen=auto_deepen,
+                nthreads=2,
+                pfo=pfunc,
+                cmap=cmap,
+                image=im._img,
+                site=site)
+            return ([im.get_color_index(x, y)
+                     for y in range(ysize) for x in range(xsize)],
+                    siteobj)
+
+        (deepened, siteobj) = draw(64, 1)
+        self.assertTrue(len(siteobj.iters_list) > 1)
+        # the pixels left inside by each pass carry on in the next
+        self.assertTrue(siteobj.stats_list[-1].pixels_resumed > 0)
+
+        # and end up the same as starting at the final depth
+        (direct, siteobj) = draw(siteobj.iters_list[-1], 0)
+        self.assertEqual(0, siteobj.stats_list[-1].pixels_resumed)
+        same = [abs(a - b) < 1.0e-4 for (a, b) in zip(direct, deepened)]
+        self.assertTrue(same.count(True) > 0.98 * len(same))
+
     def assertPixelCount(self, xsize, ysize, siteobj):
         # total pixels calculated should == w*h
         self.assertEqual(xsize * ysize, siteobj.stats_list[-1].pixels)
@@ -507,6 +903,49 @@ class Test(testbase.ClassSetup):
                                 "pixel %d is %d" % (i, byte))
             i += 1
 
+    def testRecolor(self):
+        file = self.compileColorMandel()
+        handle = fract4dc.pf_load(file)
+        pfunc = fract4dc.pf_create(handle)
+        fract4dc.pf_init(pfunc, pos_params, self.color_mandel_params)
+        white = fract4dc.cmap_create(
+            [(0.0, 0, 0, 0, 255),
+             (1 / 256.0, 255, 255, 255, 255),
+             (1.0, 255, 255, 255, 255)])
+        rainbow = fract4dc.cmap_create(
+            [(0.0, 255, 0, 0, 255),
+             (0.5, 0, 255, 0, 255),
+             (1.0, 0, 0, 255, 255)])
+        fract4dc.cmap_set_solid(rainbow, 1, 10, 20, 30, 255)
+
+        (xsize, ysize) = (64, 48)
+
+        def draw(cmap, antialias):
+            im = image.T(xsize, ysize)
+            siteobj = FractalSite()
+            site = fract4dc.site_create(siteobj)
+            fract4dc.calc(
+                params=pos_params,
+                antialias=antialias,
+                maxiter=100,
+                auto_deepen=0,
+                nthreads=2,
+                pfo=pfunc,
+                cmap=cmap,
+                image=im._img,
+                site=site)
+            return im
+
+        for antialias in [0, 1]:
+            im = draw(white, antialias)
+            fract4dc.recolor(im._img, rainbow, 4)
+            expected = draw(rainbow, antialias)
+
+            # the stored index is only a float, so allow for rounding
+            diffs = [abs(a - b) for (a, b) in
+                     zip(im.image_buffer(), expected.image_buffer())]
+            self.assertTrue(max(diffs) <= 2, "antialias %d" % antialias)
+
     def testRotMatrix(self):
         params = [0.0, 0.0, 0.0, 0.0,
                   1.0,
@@ -599,6 +1038,182 @@ class Test(testbase.ClassSetup):
                     # fract4dc.interrupt(site)
                     break
 
+    def testStatusSite(self):
+        xsize = 64
+        ysize = 48
+        im = image.T(xsize, ysize)
+        site = fract4dc.statussite_create()
+        fd = fract4dc.statussite_fd(site)
+
+        file = self.compileColorMandel()
+        handle = fract4dc.pf_load(file)
+        pfunc = fract4dc.pf_create(handle)
+        fract4dc.pf_init(pfunc, pos_params, self.color_mandel_params)
+        cmap = fract4dc.cmap_create([(1.0, 255, 255, 255, 255)])
+
+        def calc(asynchronous):
+            fract4dc.calc(
+                params=[0.0, 0.0, 0.0, 0.0,
+                        4.0,
+                        0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+                antialias=0,
+                maxiter=100,
+                nthreads=2,
+                pfo=pfunc,
+                cmap=cmap,
+                image=im._img,
+                site=site,
+                update_rate=0,
+                asynchronous=asynchronous)
+
+        # nothing to read yet
+        self.assertEqual([], messages.read_status(site))
+        (r, w, e) = select.select([fd], [], [], 0)
+        self.assertEqual([], r)
+
+        # everything that happened gets merged into one read
+        calc(False)
+        (r, w, e) = select.select([fd], [], [], 0)
+        self.assertEqual([fd], r)
+        msgs = messages.read_status(site)
+        self.assertEqual(
+            ["Image", "Progress", "Stats", "Status", "Status"],
+            [m.name for (t, m) in msgs])
+        self.assertEqual((0, 0, xsize, ysize), (msgs[0][1].x, msgs[0][1].y,
+                                               msgs[0][1].w, msgs[0][1].h))
+        self.assertEqual(xsize * ysize, msgs[2][1].pixels)
+        self.assertEqual([fract4dc.CALC_CALCULATING, fract4dc.CALC_DONE],
+                         [m.status for (t, m) in msgs[3:]])
+
+        # having been read, it's not readable again
+        (r, w, e) = select.select([fd], [], [], 0)
+        self.assertEqual([], r)
+        self.assertEqual([], messages.read_status(site))
+
+        # an asynchronous calculation wakes us until it's done
+        calc(True)
+        done = False
+        while not done:
+            (r, w, e) = select.select([fd], [], [], 1)
+            if fd not in r:
+                self.fail("no one on the other side")
+            for (t, m) in messages.read_status(site):
+                if m.name == "Status" and m.status == fract4dc.CALC_DONE:
+                    done = True
+
+    def testInterruptIterating(self):
+        # every point is inside and takes seconds to give up on, so only
+        # the formula checking as it iterates can stop the calculation
+        f = self.compiler.get_formula("gf4d.frm", "Mandelbrot")
+        cg = self.compiler.compile(f, {"interrupt_check": 100})
+        pf_name = os.path.join(Test.tmpdir.name, "test-interrupt-pf.so")
+        self.compiler.generate_code(f, cg, pf_name)
+        handle = fract4dc.pf_load(pf_name)
+        pfunc = fract4dc.pf_create(handle)
+        fract4dc.pf_init(pfunc, pos_params, [self.gradient, 4.0, 0.5])
+        cmap = fract4dc.cmap_create([(1.0, 255, 255, 255, 255)])
+        im = image.T(8, 6)
+        site = fract4dc.statussite_create()
+        fd = fract4dc.statussite_fd(site)
+
+        fract4dc.calc(
+            params=[-0.1, 0.0, 0.0, 0.0,
+                    0.01,
+                    0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+            antialias=0,
+            maxiter=2 ** 31 - 1,
+            nthreads=1,
+            pfo=pfunc,
+            cmap=cmap,
+            auto_deepen=0,
+            periodicity=0,
+            image=im._img,
+            site=site,
+            asynchronous=True)
+
+        def wait_for(status):
+            while True:
+                (r, w, e) = select.select([fd], [], [], 10)
+                if fd not in r:
+                    self.fail("no one on the other side")
+                for (t, m) in messages.read_status(site):
+                    if m.name == "Status" and m.status == status:
+                        return
+
+        wait_for(fract4dc.CALC_CALCULATING)
+        start = time.time()
+        fract4dc.interrupt(site)
+        wait_for(fract4dc.CALC_DONE)
+        self.assertLess(time.time() - start, 1.0)
+
+        # the point it gave up on is left to be calculated next time
+        for y in range(6):
+            for x in range(8):
+                self.assertIsNone(im.get_fate(x, y))
+
+    def testPriorities(self):
+        # a slow background calculation pauses between rows while an
+        # interactive one runs, then carries on to the end
+        f = self.compiler.get_formula("gf4d.frm", "Mandelbrot")
+        cg = self.compiler.compile(f)
+        pf_name = os.path.join(Test.tmpdir.name, "test-priority-pf.so")
+        self.compiler.generate_code(f, cg, pf_name)
+        handle = fract4dc.pf_load(pf_name)
+        cmap = fract4dc.cmap_create([(1.0, 255, 255, 255, 255)])
+
+        def calc(site, priority, maxiter, asynchronous):
+            pfunc = fract4dc.pf_create(handle)
+            fract4dc.pf_init(pfunc, pos_params, [self.gradient, 4.0, 0.5])
+            im = image.T(32, 24)
+            fract4dc.calc(
+                params=[-0.1, 0.0, 0.0, 0.0,
+                        0.01,
+                        0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+                antialias=0,
+                maxiter=maxiter,
+                nthreads=1,
+                pfo=pfunc,
+                cmap=cmap,
+                auto_deepen=0,
+                periodicity=0,
+                image=im._img,
+                site=site,
+                update_rate=0,
+                priority=priority,
+                asynchronous=asynchronous)
+            return (pfunc, im)
+
+        background = fract4dc.statussite_create()
+        fd = fract4dc.statussite_fd(background)
+        statuses = []
+
+        def read_statuses(timeout):
+            (r, w, e) = select.select([fd], [], [], timeout)
+            if timeout and fd not in r:
+                self.fail("no one on the other side")
+            for (t, m) in messages.read_status(background):
+                if m.name == "Status":
+                    statuses.append(m.status)
+
+        # keep the background calculation's formula and image alive
+        running = calc(background, fract4dc.PRIORITY_BACKGROUND, 500000, True)
+        while fract4dc.CALC_CALCULATING not in statuses:
+            read_statuses(10)
+
+        calc(fract4dc.statussite_create(), fract4dc.PRIORITY_INTERACTIVE,
+             100000, False)
+        read_statuses(0)
+        self.assertIn(fract4dc.CALC_PAUSED, statuses)
+        self.assertNotIn(fract4dc.CALC_DONE, statuses)
+
+        while fract4dc.CALC_DONE not in statuses:
+            read_statuses(10)
+        paused = statuses.index(fract4dc.CALC_PAUSED)
+        self.assertEqual(fract4dc.CALC_CALCULATING, statuses[paused + 1])
+
+        self.assertRaises(
+            ValueError, calc, background, -1, 100, False)
+
     def testDirtyFlagFullRender(self):
         '''Render the same image 2x with different colormaps.
 
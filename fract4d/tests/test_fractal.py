@@ -3,6 +3,7 @@
 import io
 import math
 import copy
+import decimal
 import os.path
 import time
 import filecmp
@@ -10,8 +11,8 @@ from unittest.mock import patch
 
 from . import testbase
 
-from fract4d_compiler import fc, fracttypes
-from fract4d import fractal, image, formsettings
+from fract4d_compiler import fc, fracttypes, optimize
+from fract4d import fractal, image, formsettings, messages, fract4dc
 from fract4d.options import Arguments
 
 g_testfile = '''gnofract4d parameter file
@@ -1307,6 +1308,426 @@ The image may not display correctly. Please upgrade to version 99.9 or higher.''
                     # because 3 subpixels are white and 1 black
                     self.assertColor(buf, x, y, w, (255 * 3) // 4)
 
+        # changing the colors alone doesn't recalculate anything
+        f.set_solids([(255, 0, 0, 255), (255, 0, 0, 255)])
+        with patch.object(f, "calc") as calc:
+            f.draw(im)
+            calc.assert_not_called()
+
+        buf = im.image_buffer(0, 0)
+        for y in range(h):
+            for x in range(w):
+                if x > y:
+                    self.assertWhite(buf, x, y, w)
+                elif y > x:
+                    off = (x + y * w) * 3
+                    self.assertEqual([255, 0, 0], list(buf[off:off + 3]))
+
+        # and gives the same image as drawing from scratch
+        im2 = image.T(w, h)
+        f2 = copy.copy(f)
+        f2.compile()
+        f2.draw(im2)
+        self.assertEqual(bytes(im2.image_buffer()), bytes(im.image_buffer()))
+
+        # an image being saved as it's drawn gets saved when recolored too
+        recolored = os.path.join(Test.tmpdir.name, "recolored.tga")
+        drawn = os.path.join(Test.tmpdir.name, "drawn.tga")
+        im.start_save(recolored)
+        f.draw(im)
+        im.finish_save()
+        im2.save(drawn)
+        with open(recolored, "rb") as a, open(drawn, "rb") as b:
+            self.assertEqual(b.read(), a.read())
+
+        # nor does approximating the gradient with a lookup table
+        f.set_gradient_lut_size(4096)
+        with patch.object(f, "calc") as calc:
+            f.draw(im)
+            calc.assert_not_called()
+        self.assertEqual(4096, copy.copy(f).gradient_lut_size)
+
+        # but a resized image has nothing to recolor
+        im.resize_full(w // 2, h // 2)
+        f.set_solids([(0, 255, 0, 255), (0, 255, 0, 255)])
+        with patch.object(f, "calc") as calc:
+            f.draw(im)
+            calc.assert_called()
+        im.resize_full(w, h)
+
+        # anything else does
+        f.set_param(f.MAGNITUDE, 3.0)
+        with patch.object(f, "calc") as calc:
+            f.draw(im)
+            calc.assert_called()
+
+    def testPan(self):
+        f = fractal.T(Test.g_comp)
+        f.set_param(f.XCENTER, -0.75)
+        f.set_param(f.MAGNITUDE, 0.4)
+        f.set_antialias(0)
+        f.set_auto_deepen(False)
+        f.compile()
+        (w, h) = (40, 30)
+        im = image.T(w, h)
+        f.draw(im)
+        old = bytes(im.image_buffer())
+
+        # moving 8 pixels left and 4 down keeps the rest of the image
+        (dx, dy) = (-8, 4)
+        f.relocate(dx / w, dy / w, 1.0)
+        self.assertFalse(f.clear_image)
+        with patch.object(f, "stats_changed") as stats_changed:
+            f.draw(im)
+            stats = messages.Stats.fromList(stats_changed.call_args[0][0])
+        exposed = w * h - (w - abs(dx)) * (h - abs(dy))
+        self.assertEqual(
+            exposed, stats.pixels_calculated + stats.pixels_skipped)
+
+        new = bytes(im.image_buffer())
+        for y in range(h - dy):
+            for x in range(-dx, w):
+                pos = (y * w + x) * 3
+                old_pos = ((y + dy) * w + x + dx) * 3
+                self.assertEqual(old[old_pos:old_pos + 3], new[pos:pos + 3])
+
+        # and the image matches a fresh one, apart from a few pixels
+        # which were guessed differently
+        f2 = copy.copy(f)
+        f2.compile()
+        im2 = image.T(w, h)
+        f2.draw(im2)
+        fresh = bytes(im2.image_buffer())
+        differences = 0
+        for y in range(h):
+            for x in range(w):
+                pos = (y * w + x) * 3
+                if fresh[pos:pos + 3] != new[pos:pos + 3]:
+                    differences += 1
+        self.assertLess(differences, w * h // 20)
+
+        # part-pixel moves, zooms and other changes start again
+        f.relocate(0.5 / w, 0, 1.0)
+        self.assertTrue(f.clear_image)
+        f.draw(im)
+        f.relocate(0, 0, 0.5)
+        self.assertTrue(f.clear_image)
+
+    def testSubdivide(self):
+        f = fractal.T(Test.g_comp)
+        f.set_param(f.MAGNITUDE, 3.0)
+        f.set_antialias(0)
+        f.set_auto_deepen(False)
+        f.compile()
+        (w, h) = (80, 60)
+
+        def draw():
+            im = image.T(w, h)
+            with patch.object(f, "stats_changed") as stats_changed:
+                f.draw(im)
+                stats = messages.Stats.fromList(stats_changed.call_args[0][0])
+            self.assertEqual(
+                w * h, stats.pixels_calculated + stats.pixels_skipped)
+            return (bytes(im.image_buffer()), stats)
+
+        (guessed, guessed_stats) = draw()
+
+        f.set_draw_type(fract4dc.DRAW_SUBDIVIDE)
+        self.assertTrue(f.clear_image)
+        (subdivided, stats) = draw()
+        # the inside of the set gets filled in in big pieces
+        self.assertLess(
+            stats.pixels_calculated, guessed_stats.pixels_calculated)
+        self.assertEqual(guessed, subdivided)
+
+        # safe mode only fills in inside pixels
+        f.set_safe_subdivide(True)
+        (safe, safe_stats) = draw()
+        self.assertGreater(
+            safe_stats.pixels_calculated, stats.pixels_calculated)
+        self.assertEqual(guessed, safe)
+
+        f2 = copy.copy(f)
+        self.assertEqual(fract4dc.DRAW_SUBDIVIDE, f2.draw_type)
+        self.assertEqual(True, f2.safe_subdivide)
+
+    def testSubdivideLargeInterior(self):
+        f = fractal.T(Test.g_comp)
+        f.set_param(f.XCENTER, -0.2)
+        f.set_antialias(0)
+        f.set_auto_deepen(False)
+        f.set_draw_type(fract4dc.DRAW_SUBDIVIDE)
+        f.compile()
+        (w, h) = (160, 160)
+
+        def pixels_calculated(magnitude):
+            f.set_param(f.MAGNITUDE, magnitude)
+            im = image.T(w, h)
+            with patch.object(f, "stats_changed") as stats_changed:
+                f.draw(im)
+                stats = messages.Stats.fromList(stats_changed.call_args[0][0])
+            return stats.pixels_calculated
+
+        # zooming into the main cardioid, the more of the image is inside
+        # the set, the less of it gets calculated
+        counts = [pixels_calculated(m) for m in [1.5, 1.2, 1.0, 0.5]]
+        self.assertEqual(sorted(counts, reverse=True), counts)
+        self.assertEqual(len(set(counts)), len(counts))
+
+        # once it's all inside, that's just the edges of the image
+        self.assertEqual(2 * (w + h) - 4, counts[-1])
+
+    def testLeanImages(self):
+        f = fractal.T(Test.g_comp)
+        f.set_param(f.MAGNITUDE, 3.0)
+        f.set_antialias(fractal.AntialiasModes.none)
+        f.set_auto_deepen(False)
+        f.compile()
+        (w, h) = (80, 60)
+
+        def draw(buffers):
+            im = image.T(w, h, buffers=buffers)
+            with patch.object(f, "stats_changed") as stats_changed:
+                f.draw(im)
+                stats = messages.Stats.fromList(stats_changed.call_args[0][0])
+            self.assertEqual(
+                w * h, stats.pixels_calculated + stats.pixels_skipped)
+            # every pixel got done
+            self.assertNotIn(
+                im.UNKNOWN, list(im.fate_buffer())[::im.fate_size])
+            return (bytes(im.image_buffer()), stats)
+
+        for draw_type in [fract4dc.DRAW_GUESSING, fract4dc.DRAW_SUBDIVIDE]:
+            f.set_draw_type(draw_type)
+            (full, full_stats) = draw(fract4dc.IMAGE_BUFFERS_FULL)
+
+            # the color indexes aren't needed to guess the same pixels
+            (rgb_iter, stats) = draw(fract4dc.IMAGE_BUFFERS_RGB_ITER)
+            self.assertEqual(full, rgb_iter)
+            self.assertEqual(full_stats.pixels_skipped, stats.pixels_skipped)
+
+            # without iterations there's no guessing, just calculating
+            (rgb, stats) = draw(fract4dc.IMAGE_BUFFERS_RGB)
+            self.assertEqual(w * h, stats.pixels_calculated)
+            different = sum(
+                1 for i in range(0, len(full), 3)
+                if full[i:i + 3] != rgb[i:i + 3])
+            self.assertLess(different, w * h // 100)
+
+        # there's nowhere to keep subpixels
+        f.set_antialias(fractal.AntialiasModes.best)
+        (aa, stats) = draw(fract4dc.IMAGE_BUFFERS_RGB_ITER)
+        self.assertEqual(0, stats.pixels_antialiased)
+        self.assertEqual(full, aa)
+
+    def testMappedImage(self):
+        f = fractal.T(Test.g_comp)
+        f.set_param(f.MAGNITUDE, 3.0)
+        f.set_antialias(fractal.AntialiasModes.best)
+        f.compile()
+
+        def draw(backing_dir):
+            im = image.T(80, 60, 80, 120, backing_dir=backing_dir)
+            name = os.path.join(
+                Test.tmpdir.name, "mapped%s.png" % bool(backing_dir))
+            im.start_save(name)
+            f.draw(im)
+            im.finish_save()
+            return name
+
+        # drawn in two tiles, each saved as it's finished
+        self.assertTrue(filecmp.cmp(
+            draw(None), draw(Test.tmpdir.name), shallow=False))
+
+    def testTilesInFlight(self):
+        f = fractal.T(Test.g_comp)
+        f.set_param(f.MAGNITUDE, 3.0)
+        f.set_auto_deepen(False)
+        f.set_auto_tolerance(False)
+        f.compile()
+
+        def draw(tiles_in_flight):
+            # 7 tiles, the last one shorter
+            im = image.T(64, 7, 64, 46)
+            name = os.path.join(
+                Test.tmpdir.name, "inflight%d.png" % tiles_in_flight)
+            im.start_save(name)
+            f.draw(im, 2, tiles_in_flight)
+            im.finish_save()
+            return name
+
+        one_at_a_time = draw(1)
+        # however many are drawn at once, they're saved in order
+        for tiles_in_flight in [2, 3, 10]:
+            self.assertTrue(filecmp.cmp(
+                one_at_a_time, draw(tiles_in_flight), shallow=False))
+
+    def testAdaptiveAntialias(self):
+        f = fractal.T(Test.g_comp)
+        f.set_param(f.MAGNITUDE, 3.0)
+        f.set_auto_deepen(False)
+        f.compile()
+        (w, h) = (80, 60)
+
+        def draw(aa):
+            f.set_antialias(aa)
+            im = image.T(w, h)
+            with patch.object(f, "stats_changed") as stats_changed:
+                f.draw(im)
+                stats = messages.Stats.fromList(stats_changed.call_args[0][0])
+            buf = bytes(im.image_buffer())
+            return ([buf[i:i + 3] for i in range(0, len(buf), 3)], stats)
+
+        (plain, plain_stats) = draw(fractal.AntialiasModes.none)
+        self.assertEqual(0, plain_stats.pixels_antialiased)
+        (best, best_stats) = draw(fractal.AntialiasModes.best)
+        self.assertEqual(w * h, best_stats.pixels_antialiased)
+
+        # only the pixels on an edge get antialiased, the same way as before
+        (adaptive, stats) = draw(fractal.AntialiasModes.adaptive)
+        self.assertLess(0, stats.pixels_antialiased)
+        self.assertLess(stats.pixels_antialiased, w * h // 2)
+        self.assertNotEqual(plain, adaptive)
+        for (p, b, a) in zip(plain, best, adaptive):
+            self.assertIn(a, [p, b])
+
+        # more subpixels on the same pixels
+        f.set_aa_samples(16)
+        self.assertTrue(f.clear_image)
+        (adaptive16, stats16) = draw(fractal.AntialiasModes.adaptive)
+        self.assertEqual(stats.pixels_antialiased, stats16.pixels_antialiased)
+        self.assertNotEqual(adaptive, adaptive16)
+        self.assertLess(0, stats16.subpixels_antialiased)
+
+        # unless the first 4 are always close enough
+        f.set_aa_variance(256.0 * 256.0)
+        (adaptive_stopped, stopped_stats) = draw(
+            fractal.AntialiasModes.adaptive)
+        self.assertEqual(adaptive, adaptive_stopped)
+
+        f2 = copy.copy(f)
+        self.assertEqual(16, f2.aa_samples)
+        self.assertEqual(256.0 * 256.0, f2.aa_variance)
+
+        # since the image only keeps 4 subpixels, changing the colors
+        # means drawing it again
+        self.assertFalse(f.can_recolor())
+        f.changed(False)
+        f.set_solids([(255, 0, 0, 255), (255, 0, 0, 255)])
+        self.assertTrue(f.clear_image)
+
+        # there's no grid for other numbers of subpixels
+        self.assertRaises(ValueError, f.set_aa_samples, 8)
+        f.aa_samples = 8
+        self.assertRaises(ValueError, draw, fractal.AntialiasModes.adaptive)
+
+    def testAdaptiveAntialiasEarlyStop(self):
+        f = fractal.T(Test.g_comp)
+        with open("testdata/std.fct") as fh:
+            f.loadFctFile(fh)
+        f.set_auto_deepen(False)
+        f.set_antialias(fractal.AntialiasModes.adaptive)
+        f.set_aa_samples(16)
+        f.compile()
+
+        def subpixels(aa_variance):
+            f.set_aa_variance(aa_variance)
+            with patch.object(f, "stats_changed") as stats_changed:
+                f.draw(image.T(80, 60))
+                stats = messages.Stats.fromList(stats_changed.call_args[0][0])
+            return stats.subpixels_antialiased
+
+        # the grid is sampled in rounds of 4, and stops after any of them
+        # once the average color is close enough, so with a gradient to
+        # blend some pixels only use part of it
+        some = subpixels(4.0)
+        self.assertEqual(0, some % 4)
+        self.assertNotEqual(0, some % 16)
+        self.assertLess(subpixels(16.0), some)
+        self.assertLess(some, subpixels(1.0))
+
+    def testAntialiasThreads(self):
+        f = fractal.T(Test.g_comp)
+        f.set_param(f.MAGNITUDE, 3.0)
+        f.set_auto_deepen(False)
+        f.compile()
+
+        def draw(nthreads):
+            f.changed()
+            im = image.T(120, 90)
+            f.draw(im, nthreads)
+            return bytes(im.image_buffer())
+
+        # which pixels to antialias doesn't depend on which neighbours
+        # other threads have antialiased already
+        for aa in [fractal.AntialiasModes.fast,
+                   fractal.AntialiasModes.adaptive]:
+            f.set_antialias(aa)
+            self.assertEqual(draw(1), draw(4))
+
+    def testWarpThreads(self):
+        # each thread writes the warped param into its own copy of the
+        # formula, so they can't see each other's pixels
+        f = fractal.T(Test.g_comp)
+        f.set_formula("test.frm", "test_warp_param")
+        f.set_warp_param("@p1")
+        f.set_auto_deepen(False)
+        f.compile()
+
+        def draw(nthreads):
+            f.changed()
+            im = image.T(120, 90)
+            f.draw(im, nthreads)
+            return bytes(im.image_buffer())
+
+        self.assertEqual(draw(1), draw(4))
+
+    def testZoomReuse(self):
+        f = fractal.T(Test.g_comp)
+        f.set_param(f.XCENTER, -0.75)
+        f.set_param(f.MAGNITUDE, 0.4)
+        f.set_antialias(0)
+        f.set_auto_deepen(False)
+        f.compile()
+        (w, h) = (40, 30)
+        im = image.T(w, h)
+        f.draw(im)
+        old = bytes(im.image_buffer())
+
+        # zoom in 2x around a point which puts new pixels on old ones
+        f.relocate((10.25 - w / 2) / w, (8.25 - h / 2) / w, 0.5)
+        self.assertFalse(f.clear_image)
+        with patch.object(f, "stats_changed") as stats_changed:
+            f.draw(im)
+            stats = messages.Stats.fromList(stats_changed.call_args[0][0])
+        # a quarter of the pixels came from the old image
+        self.assertEqual(
+            w * h * 3 // 4, stats.pixels_calculated + stats.pixels_skipped)
+
+        new = bytes(im.image_buffer())
+        for y in range(1, h, 2):
+            for x in range(0, w, 2):
+                pos = (y * w + x) * 3
+                old_pos = ((y + 1) // 2 * w + x // 2) * 3
+                self.assertEqual(old[old_pos:old_pos + 3], new[pos:pos + 3])
+
+        f2 = copy.copy(f)
+        f2.compile()
+        im2 = image.T(w, h)
+        f2.draw(im2)
+        fresh = bytes(im2.image_buffer())
+        differences = 0
+        for y in range(h):
+            for x in range(w):
+                pos = (y * w + x) * 3
+                if fresh[pos:pos + 3] != new[pos:pos + 3]:
+                    differences += 1
+        self.assertLess(differences, w * h // 20)
+
+        # if no new pixels line up with old ones, start again
+        f.relocate(0.5 / w, 0.5 / w, 0.5)
+        self.assertTrue(f.clear_image)
+
     def testDiagonalWithColorFuncs(self):
         f = fractal.T(Test.g_comp)
         f.set_formula("test.frm", "test_simpleshape")
@@ -1668,6 +2089,117 @@ solids=[
         f.set_compiler_option("optimize", 1)
         self.assertEqual({"optimize": 1}, f.compiler_options)
 
+    def testInteriorTests(self):
+        f = fractal.T(Test.g_comp)
+        f.set_antialias(0)
+        f.set_auto_deepen(False)
+        f.set_periodicity(False)
+        self.assertTrue(
+            f.compiler_options["optimize"] & optimize.InteriorTests)
+
+        def draw():
+            f.compile()
+            im = image.T(40, 30)
+            with patch.object(f, "stats_changed") as stats_changed:
+                f.draw(im)
+                stats = messages.Stats.fromList(stats_changed.call_args[0][0])
+            return (bytes(im.image_buffer()), stats)
+
+        (tested, tested_stats) = draw()
+        f.set_compiler_option("optimize", optimize.Peephole)
+        (iterated, iterated_stats) = draw()
+        self.assertEqual(iterated, tested)
+        self.assertEqual(
+            iterated_stats.pixels_inside, tested_stats.pixels_inside)
+
+    def testDeepZoom(self):
+        f = fractal.T(Test.g_comp)
+        f.set_auto_deepen(False)
+        x = "-0.743643887037158704752191506114774"
+        y = "0.131825904205311970493132056385139"
+        f.set_param(f.XCENTER, x)
+        f.set_param(f.YCENTER, y)
+        f.set_maxiter(20000)
+        f.compile()
+        im = image.T(64, 48)
+
+        # doubles are fine until the pixels get too close together
+        self.assertEqual({}, f.deep_zoom_args(im))
+        f.set_param(f.MAGNITUDE, 1.0e-20)
+        args = f.deep_zoom_args(im)
+        self.assertEqual((x, y, "0.0", "0.0"), args["deep_zoom"])
+        self.assertEqual(4.0, args["deep_zoom_bailout"])
+        self.assertEqual((4.0, 1.0, 0.0), args["deep_zoom_coloring"])
+
+        f.draw(im)
+        colors = set(im.get_color_index(x, y)
+                     for y in range(im.ysize) for x in range(im.xsize))
+        self.assertGreater(len(colors), im.xsize * im.ysize // 2)
+
+        # the extra digits survive saving, loading and moving around
+        g = fractal.T(Test.g_comp)
+        g.loadFctFile(io.StringIO(f.serialize()))
+        self.assertEqual(decimal.Decimal(x), g.get_center(f.XCENTER))
+        self.assertEqual(f.params, g.params)
+        g.relocate(0.25, 0.0, 0.5)
+        self.assertLess(
+            abs(g.get_center(f.XCENTER) - decimal.Decimal(x) -
+                decimal.Decimal("0.25e-20")), decimal.Decimal("1e-35"))
+        # a float which is no change doesn't lose them
+        g.set_param(f.XCENTER, g.params[f.XCENTER])
+        self.assertGreater(len(str(g.get_center(f.XCENTER))), 30)
+
+        # the formula's own bailout and colorfunc parameters are used
+        f.forms[0].set_named_param("@bailout", 100.0)
+        f.forms[1].set_named_param("@_density", 2.0)
+        f.forms[1].set_named_param("@bailout", 8.0)
+        args = f.deep_zoom_args(im)
+        self.assertEqual(100.0, args["deep_zoom_bailout"])
+        self.assertEqual((8.0, 2.0, 0.0), args["deep_zoom_coloring"])
+
+        # but perturbation can't do other formulas or colorings
+        f.set_outer("gf4d.cfrm", "external_angle")
+        self.assertEqual({}, f.deep_zoom_args(im))
+        f.set_outer("gf4d.cfrm", "continuous_potential")
+        f.set_formula("gf4d.frm", "Mandelbar")
+        self.assertEqual({}, f.deep_zoom_args(im))
+
+    def testDeepZoomPrecision(self):
+        f = fractal.T(Test.g_comp)
+        f.set_auto_deepen(False)
+        x = "-0.743643887037158704752191506114774"
+        f.set_param(f.XCENTER, x)
+        f.set_param(f.YCENTER, "0.131825904205311970493132056385139")
+        f.set_param(f.MAGNITUDE, 1.0e-20)
+        f.set_maxiter(20000)
+        # perturbation can't draw this coloring
+        f.set_outer("gf4d.cfrm", "external_angle")
+        im = image.T(32, 24)
+
+        def draw():
+            f.compile()
+            f.draw(im)
+            return len(set(im.get_color_index(x, y)
+                           for y in range(im.ysize) for x in range(im.xsize)))
+
+        self.assertEqual("auto", f.precision)
+        detailed = draw()
+        self.assertEqual("double-double", f.compiled_precision)
+        self.assertEqual(x, f.deep_zoom_args(im)["precise_center"][0])
+        self.assertGreater(detailed, im.xsize * im.ysize // 2)
+
+        # the user can insist on doubles, which run out of digits
+        f.set_precision("double")
+        self.assertLess(draw(), detailed // 4)
+        self.assertEqual({}, f.deep_zoom_args(im))
+        self.assertRaises(ValueError, f.set_precision, "quad")
+
+        # shallow zooms stay with doubles
+        f.set_precision("auto")
+        f.set_param(f.MAGNITUDE, 1.0e-3)
+        f.compile()
+        self.assertEqual("double", f.compiled_precision)
+
     def testImage(self):
         f = fractal.T(Test.g_comp)
         f.set_formula("test.frm", "ident")
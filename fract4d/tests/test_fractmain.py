@@ -19,6 +19,19 @@ class Test(testbase.TestSetup):
         self.assertTrue(os.path.exists("foo.png"))
         os.remove("foo.png")
 
+    def testScratchDir(self):
+        c = self.userConfig
+        fm = fractmain.T(c)
+        scratch_dir = os.path.join(self.tmpdir.name, "scratch")
+        os.mkdir(scratch_dir)
+        options = Arguments().parse_args(
+            ["--save", "foo.png", "--scratch-dir", scratch_dir])
+        fm.run(options)
+        self.assertTrue(os.path.exists("foo.png"))
+        os.remove("foo.png")
+        # the scratch file goes as soon as it's opened
+        self.assertEqual([], os.listdir(scratch_dir))
+
     def testBuildOnly(self):
         c = self.userConfig
         fm = fractmain.T(c)
@@ -243,6 +243,45 @@ opacity:
         g = self.create_rgb_gradient()
         self.checkCGradientAndPyGradientEquivalent(g)
 
+    def testGradientCmapLookupTable(self):
+        # a lookup table should be close to the exact calculation
+        g = gradient.Gradient()
+        g.load_list([
+            (0.0, 255, 0, 0, 255), (0.2, 0, 255, 0, 255),
+            (0.4, 0, 0, 255, 128), (0.6, 255, 255, 0, 255),
+            (0.8, 0, 255, 255, 0), (1.0, 255, 0, 255, 255)])
+        for (i, seg) in enumerate(g.segments):
+            seg.bmode = i % 5
+            seg.cmode = i % 3
+            seg.mid = seg.left + (seg.right - seg.left) * 0.3
+        # and a discontinuity, which mustn't get blurred
+        g.segments[2].right_color = self.white
+
+        exact = fract4dc.cmap_create_gradient(g.segments)
+        self.assertEqual(
+            fract4dc.cmap_lookup(exact, 0.3),
+            fract4dc.cmap_lookup(
+                fract4dc.cmap_create_gradient(g.segments, 0), 0.3))
+
+        # the sphere blends are steep at their ends, so they're the
+        # furthest out
+        for (size, tolerance) in [(4096, 8), (65536, 3)]:
+            cmap = fract4dc.cmap_create_gradient(g.segments, size)
+            for i in range(10007):
+                fi = i / 10007.0
+                self.assertNearlyEqual(
+                    fract4dc.cmap_lookup(exact, fi),
+                    fract4dc.cmap_lookup(cmap, fi),
+                    "lookup(%s) with %d entries" % (fi, size), tolerance)
+            # including either side of the discontinuity
+            for fi in [0.6 - 1.0e-9, 0.6, 0.6 + 1.0e-9, 1.0, 1.5, -0.25]:
+                self.assertEqual(
+                    fract4dc.cmap_lookup(exact, fi),
+                    fract4dc.cmap_lookup(cmap, fi))
+
+        self.assertRaises(
+            ValueError, fract4dc.cmap_create_gradient, g.segments, -1)
+
     def create_rgb_gradient(self):
         # make a simple gradient which goes from R -> G -> B
         g = gradient.Gradient()
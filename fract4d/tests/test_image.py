@@ -6,7 +6,7 @@ import subprocess
 
 from . import testbase
 
-from fract4d import image
+from fract4d import image, fract4dc
 
 
 class Test(testbase.ClassSetup):
@@ -31,7 +31,7 @@ class Test(testbase.ClassSetup):
             pass
 
     def assertImageInvariants(self, im):
-        self.assertEqual(im.xsize * im.ysize * im.FATE_SIZE,
+        self.assertEqual(im.xsize * im.ysize * im.fate_size,
                          len(im.fate_buffer()))
         self.assertEqual(im.xsize * im.ysize * im.COL_SIZE,
                          len(im.image_buffer()))
@@ -240,6 +240,68 @@ class Test(testbase.ClassSetup):
         buf = im.image_buffer()
         self.assertEqual(list(buf), [0] * xsize * ysize * im.COL_SIZE)
 
+    def testShift(self):
+        (xsize, ysize) = (7, 5)
+        im = image.T(xsize, ysize)
+        buf = im.image_buffer()
+        fate_buf = im.fate_buffer()
+        for y in range(ysize):
+            for x in range(xsize):
+                pos = im.pos(x, y, im.COL_SIZE)
+                buf[pos:pos + im.COL_SIZE] = bytes([x, y, 1])
+                pos = im.pos(x, y, im.FATE_SIZE)
+                fate_buf[pos:pos + im.FATE_SIZE] = bytes([im.OUT] * im.FATE_SIZE)
+
+        # view moves 3 pixels right and 2 up
+        im.shift(3, -2)
+        for y in range(ysize):
+            for x in range(xsize):
+                if x + 3 < xsize and y - 2 >= 0:
+                    self.assertEqual([x + 3, y - 2, 1], im.get_color(x, y))
+                    self.assertEqual((False, im.OUT), im.get_fate(x, y))
+                else:
+                    self.assertEqual(None, im.get_fate(x, y))
+                    self.assertEqual(
+                        [im.UNKNOWN] * im.FATE_SIZE, im.get_all_fates(x, y))
+
+        # moving further than the image is wide leaves nothing
+        im.shift(-xsize, 0)
+        self.assertEqual(
+            list(im.fate_buffer()), [im.UNKNOWN] * im.FATE_SIZE * xsize * ysize)
+
+    def testRescale(self):
+        (xsize, ysize) = (8, 6)
+        im = image.T(xsize, ysize)
+        buf = im.image_buffer()
+        fate_buf = im.fate_buffer()
+        for y in range(ysize):
+            for x in range(xsize):
+                pos = im.pos(x, y, im.COL_SIZE)
+                buf[pos:pos + im.COL_SIZE] = bytes([x, y, 1])
+                pos = im.pos(x, y, im.FATE_SIZE)
+                fate_buf[pos] = im.OUT
+        # an antialiased pixel, whose first subpixel isn't its center
+        pos = im.pos(2, 3, im.FATE_SIZE)
+        fate_buf[pos:pos + im.FATE_SIZE] = bytes([im.OUT, im.IN, im.OUT, im.OUT])
+
+        # zoom in 2x: every other pixel lands on an old one
+        self.assertTrue(im.rescale(1.0, 2.0, 0.5))
+        for y in range(ysize):
+            for x in range(xsize):
+                (old_x, old_y) = (1 + x // 2, 2 + y // 2)
+                if x % 2 == 0 and y % 2 == 0 and (old_x, old_y) != (2, 3):
+                    self.assertEqual([old_x, old_y, 1], im.get_color(x, y))
+                    self.assertEqual(
+                        [im.OUT] + [im.UNKNOWN] * (im.FATE_SIZE - 1),
+                        im.get_all_fates(x, y))
+                else:
+                    self.assertEqual(None, im.get_fate(x, y))
+
+        # none of them are on old pixels' centers
+        self.assertFalse(im.rescale(0.25, 0.25, 0.5))
+        self.assertEqual(
+            list(im.fate_buffer()), [im.UNKNOWN] * im.FATE_SIZE * xsize * ysize)
+
     def testBufferBounds(self):
         im = image.T(40, 30)
         im.resize_full(80, 60)
@@ -262,6 +324,73 @@ class Test(testbase.ClassSetup):
         self.assertEqual(len(buf), 80 * 60 * im.FATE_SIZE -
                          (10 * 80 + 5) * im.FATE_SIZE)
 
+    def testLeanBuffers(self):
+        self.assertRaises(ValueError, image.T, 40, 30, -1, -1, -1)
+        self.assertRaises(
+            ValueError, image.T, 40, 30, -1, -1,
+            fract4dc.IMAGE_BUFFERS_FULL + 1)
+
+        for buffers in [fract4dc.IMAGE_BUFFERS_RGB,
+                        fract4dc.IMAGE_BUFFERS_RGB_ITER]:
+            im = image.T(40, 30, buffers=buffers)
+            # only one subpixel
+            self.assertEqual(1, im.fate_size)
+            self.assertImageInvariants(im)
+            self.assertEqual([im.UNKNOWN], im.get_all_fates(39, 29))
+            self.assertRaises(ValueError, im.get_color_index, 0, 0, 1)
+            self.assertEqual(0.0, im.get_color_index(0, 0))
+
+            # the profile survives a resize
+            im.resize_full(80, 60)
+            self.assertImageInvariants(im)
+            im.shift(3, -2)
+            self.assertImageInvariants(im)
+
+    def testSaveOtherTile(self):
+        im = image.T(40, 15, 40, 30)
+        other = im.new_tile()
+        other.set_offset(0, 15)
+        other.image_buffer()[0:3] = bytes([10, 20, 30])
+        name = os.path.join(Test.tmpdir.name, "tiles.png")
+        im.start_save(name)
+        im.save_tile()
+        # only tiles of the same image can be saved
+        self.assertRaises(IOError, im.save_tile, image.T(40, 15))
+        im.save_tile(other)
+        im.finish_save()
+
+        saved = image.T(1, 1)
+        saved.load(name)
+        self.assertEqual([10, 20, 30], list(saved.image_buffer(0, 15)[0:3]))
+
+    def testMappedImage(self):
+        self.assertRaises(
+            OSError, image.T, 40, 30,
+            backing_dir=os.path.join(Test.tmpdir.name, "nonexistent"))
+
+        for buffers in [fract4dc.IMAGE_BUFFERS_RGB,
+                        fract4dc.IMAGE_BUFFERS_FULL]:
+            im = image.T(40, 30, buffers=buffers,
+                         backing_dir=Test.tmpdir.name)
+            self.assertImageInvariants(im)
+            self.assertEqual([0] * im.COL_SIZE, im.get_color(39, 29))
+            self.assertEqual(None, im.get_fate(39, 29))
+
+            buf = im.image_buffer()
+            buf[0:3] = bytes([10, 20, 30])
+            self.assertEqual([10, 20, 30], im.get_color(0, 0))
+            im.shift(-1, 0)
+            self.assertEqual([10, 20, 30], im.get_color(1, 0))
+
+            im.resize_full(80, 60)
+            self.assertImageInvariants(im)
+            self.assertEqual([0] * im.COL_SIZE, im.get_color(79, 59))
+
+        # the scratch files are removed as soon as they're mapped
+        self.assertEqual(
+            [], [f for f in os.listdir(Test.tmpdir.name)
+                 if f.startswith("fract4d-image")])
+
     def testLookupOnePixel(self):
         im = image.T(1, 1)
         rgba = im.lookup(0, 0)
@@ -66,6 +66,20 @@ class Test(unittest.TestCase):
         self.assertEqual(780, ns.width)
         self.assertEqual(445, ns.height)
 
+    def testCenter(self):
+        o = Arguments()
+        x = "-0.743643887037158704752191506114774"
+        ns = o.parse_args(["--xcenter", x, "--xyangle", "1"])
+        # the center keeps all its digits
+        self.assertEqual(x, str(ns.paramchanges[0]))
+        self.assertEqual(1, ns.paramchanges[5])
+
+    def testPrecision(self):
+        o = Arguments()
+        self.assertEqual(None, o.parse_args([]).precision)
+        ns = o.parse_args(["--precision", "double-double"])
+        self.assertEqual("double-double", ns.precision)
+
     def testArgument(self):
         o = Arguments()
         ns = o.parse_args(["foo"])
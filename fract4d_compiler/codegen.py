@@ -8,6 +8,16 @@ from . import absyn, fracttypes, ir, optimize
 from .fracttypes import Bool, Int, Float, Complex, Hyper, Color, IntArray, FloatArray, ComplexArray, VoidArray
 from .instructions import *
 
+# ways for the generated code to spot that an orbit has become periodic:
+# compare z with a value saved at lengthening intervals, or
+# Brent's algorithm, which keeps each saved value twice as long as the last
+IntervalPeriodCheck = "interval"
+BrentPeriodCheck = "brent"
+
+# how often the generated code looks at the interrupt flag by default.
+# Checking is cheap, but not free, so not every iteration
+DefaultInterruptCheck = 1000
+
 
 class Formatter:
     ' fed to print to fill the output template'
@@ -31,10 +41,57 @@ class Formatter:
 class T:
     'code generator'
 
+    # types of variable which can be saved in a point's state
+    state_types = [
+        fracttypes.Bool, fracttypes.Int, fracttypes.Float,
+        fracttypes.Complex, fracttypes.Color, fracttypes.Hyper]
+
+    # types of variable which are allocated from the formula's arena
+    arena_types = [
+        fracttypes.VoidArray, fracttypes.IntArray,
+        fracttypes.FloatArray, fracttypes.ComplexArray]
+
+    # an entry point which passes its arguments on to another
+    calc_wrapper_template = '''
+static void %(name)s(
+    struct s_pf_data *t__p_stub,
+    const double *t__params, int maxiter, int t__warp_param,
+    int min_period_iter, double period_tolerance,
+    int t__p_x, int t__p_y, int t__p_aa,%(params)s
+    int *t__p_pnIters, int *t__p_pFate, double *t__p_pDist, int *t__p_pSolid,
+    int *t__p_pDirectColorFlag, double *t__p_pColors
+    )
+{%(setup)s
+    %(call)s(
+        t__p_stub, %(call_params)s, maxiter, t__warp_param,
+        min_period_iter, period_tolerance,
+        t__p_x, t__p_y, t__p_aa, %(state)s,
+        t__p_pnIters, t__p_pFate, t__p_pDist, t__p_pSolid,
+        t__p_pDirectColorFlag, t__p_pColors);
+}
+'''
+
     def __init__(self, symbols, options={}):
         self.symbols = symbols
         self.out = []
         self.optimize_flags = options.get("optimize", optimize.Nothing)
+        # floating-point values are generated as self.real, which is
+        # double, or a C++ double-double type for deeper zooms
+        self.precision = options.get(
+            "precision", fracttypes.DoublePrecision)
+        self.real = fracttypes.realTypeOf(self.precision)
+        self.period_check = options.get("period_check", IntervalPeriodCheck)
+        if self.period_check not in (IntervalPeriodCheck, BrentPeriodCheck):
+            raise fracttypes.TranslationError(
+                "Unknown period check %s" % self.period_check)
+        # how many iterations to do between checks of whether the
+        # calculation has been interrupted, or 0 never to check
+        self.interrupt_check = options.get(
+            "interrupt_check", DefaultInterruptCheck)
+        if not isinstance(self.interrupt_check, int) or \
+                self.interrupt_check < 0:
+            raise fracttypes.TranslationError(
+                "Invalid interrupt check %s" % self.interrupt_check)
         # a list of templates and associated actions
         # this must be ordered with largest, most efficient templates first
         # thus performing a crude 'maximal munch' instruction generation
@@ -52,6 +109,11 @@ class T:
         ])
 
         self.generate_trace = False
+        # set by output_decls
+        self.state_vars = None
+        self.uses_arena = False
+        # set by output_interior_test
+        self.interior_guards = None
 
         self.generate_trace = options.get("trace", False)
         self.log_z = options.get("tracez", False)
@@ -115,7 +177,7 @@ static void pf_get_defaults(
     */
 }
 
-static void pf_calc(
+static void %(calc_name)s(
     // "object" pointer
     struct s_pf_data *t__p_stub,
     // in params
@@ -124,6 +186,8 @@ static void pf_calc(
     int min_period_iter, double period_tolerance,
     // only used for debugging
     int t__p_x, int t__p_y, int t__p_aa,
+    // iteration state to resume from and save to, or NULL
+    double *t__p_state,
     // out params
     int *t__p_pnIters, int *t__p_pFate, double *t__p_pDist, int *t__p_pSolid,
     int *t__p_pDirectColorFlag, double *t__p_pColors
@@ -131,26 +195,23 @@ static void pf_calc(
 {
     pf_real *t__pfo = (pf_real *)t__p_stub;
 
-    double pixel_re = t__params[0];
-    double pixel_im = t__params[1];
-    double t__h_zwpixel_re = t__params[2];
-    double t__h_zwpixel_im = t__params[3];
+    %(pixel_init)s
 
-    double t__h_index = 0.0;
+    %(real)s t__h_index = 0.0;
     int t__h_solid = 0;
     int t__h_fate = 0;
     int t__h_inside = 0;
-    double t__h_color_re = 0.0;
-    double t__h_color_i = 0.0;
-    double t__h_color_j = 0.0;
-    double t__h_color_k = 0.0;
+    %(real)s t__h_color_re = 0.0;
+    %(real)s t__h_color_i = 0.0;
+    %(real)s t__h_color_j = 0.0;
+    %(real)s t__h_color_k = 0.0;
 
     *t__p_pDirectColorFlag = %(dca_init)s;
 
     if(t__warp_param != -1)
     {
-        t__pfo->p[t__warp_param].doubleval = t__h_zwpixel_re;
-        t__pfo->p[t__warp_param+1].doubleval = t__h_zwpixel_im;
+        t__pfo->p[t__warp_param].doubleval = (double)t__h_zwpixel_re;
+        t__pfo->p[t__warp_param+1].doubleval = (double)t__h_zwpixel_im;
         t__h_zwpixel_re = t__h_zwpixel_im = 0.0;
     }
 
@@ -158,6 +219,9 @@ static void pf_calc(
     %(var_inits)s
     %(decl_period)s
     int t__h_numiter = 0;
+    %(decl_interrupt)s
+
+    %(restore_state)s
 
     %(t_transform)s
 
@@ -169,8 +233,11 @@ static void pf_calc(
     %(cf1_init)s
 
     %(init_period)s
+    %(interior_test)s
     do
     {
+        %(check_interrupt)s
+        %(resume_loop)s
         %(loop)s
 
         %(loop_inserts)s
@@ -178,18 +245,22 @@ static void pf_calc(
 
         %(bailout_inserts)s
         if(!%(bailout_var)s) break;
+        %(resume_period)s
         %(check_period)s
         %(cf0_loop)s
         %(cf1_loop)s
 
         t__h_numiter++;
     }while(t__h_numiter < maxiter);
+    %(resume_done)s
+    %(interior_done)s
 
     /* fate of 0 = escaped, 1 = trapped */
     t__h_inside = (t__h_numiter >= maxiter);
     *t__p_pFate = (t__h_numiter >= maxiter);
 
     loop_done:
+    %(save_state)s
     %(pre_final_inserts)s
     %(final)s
     %(done_inserts)s
@@ -206,12 +277,81 @@ static void pf_calc(
             ;
     }
     *t__p_pFate = t__h_fate | (t__h_inside ? FATE_INSIDE : 0);
-    *t__p_pDist = t__h_index;
+    *t__p_pDist = (double)t__h_index;
     *t__p_pSolid = t__h_solid;
     %(save_colors)s
     %(return_inserts)s
-    arena_clear((arena_t)(t__p_stub->arena));
+    %(clear_arena)s
     return;
+    %(interrupted)s
+}
+%(calc_wrapper)s
+
+static void pf_calc_batch(
+    // "object" pointer
+    struct s_pf_data *t__p_stub,
+    int t__n,
+    // in params, one array per coordinate
+    const double *t__xs, const double *t__ys,
+    const double *t__zs, const double *t__ws,
+    int maxiter, int t__warp_param,
+    // periodicity params
+    int t__periodicity, int *t__p_lastIters, double period_tolerance,
+    // only used for debugging
+    const int *t__p_xs, int t__p_y, int t__p_aa,
+    // NULL, or the iteration state of each point, as for pf_calc_resume
+    double *const *t__p_states,
+    // out params, one entry per point (4 planes of t__n for colors)
+    int *t__p_pnIters, int *t__p_pFate, double *t__p_pDist, int *t__p_pSolid,
+    int *t__p_pDirectColorFlag, double *t__p_pColors
+    )
+{
+    int t__last_iters = *t__p_lastIters;
+    int t__i;
+
+    for(t__i = 0; t__i < t__n; ++t__i)
+    {
+        double t__params[4];
+        double t__colors[4] = { 0.0, 0.0, 0.0, 0.0 };
+        int t__min_period_iter;
+
+        t__params[0] = t__xs[t__i];
+        t__params[1] = t__ys[t__i];
+        t__params[2] = t__zs[t__i];
+        t__params[3] = t__ws[t__i];
+
+        /* same guess as the workers use for single points */
+        if(!t__periodicity)
+        {
+            t__min_period_iter = maxiter;
+        }
+        else if(t__last_iters == -1)
+        {
+            t__min_period_iter = 0;
+        }
+        else
+        {
+            t__min_period_iter = t__last_iters + 10;
+        }
+
+        pf_calc_resume(
+            t__p_stub, t__params, maxiter, t__warp_param,
+            t__min_period_iter, period_tolerance,
+            t__p_xs[t__i], t__p_y, t__p_aa,
+            t__p_states ? t__p_states[t__i] : NULL,
+            &t__p_pnIters[t__i], &t__p_pFate[t__i],
+            &t__p_pDist[t__i], &t__p_pSolid[t__i],
+            &t__p_pDirectColorFlag[t__i], t__colors);
+
+        t__p_pColors[t__i] = t__colors[0];
+        t__p_pColors[t__n + t__i] = t__colors[1];
+        t__p_pColors[2 * t__n + t__i] = t__colors[2];
+        t__p_pColors[3 * t__n + t__i] = t__colors[3];
+
+        t__last_iters = (t__p_pFate[t__i] & FATE_INSIDE) ?
+            -1 : t__p_pnIters[t__i];
+    }
+    *t__p_lastIters = t__last_iters;
 }
 
 static void pf_kill(
@@ -221,12 +361,27 @@ static void pf_kill(
     free(p_stub);
 }
 
+static struct s_pf_data *pf_clone(
+    struct s_pf_data *p_stub)
+{
+    pf_real *p = (pf_real *)malloc(sizeof(pf_real));
+    if(!p) return NULL;
+    *p = *(pf_real *)p_stub;
+    p->parent.arena = arena_create(100000,1);
+    return (struct s_pf_data *)p;
+}
+
 static struct s_pf_vtable vtbl =
 {
     pf_get_defaults,
     pf_init,
     pf_calc,
-    pf_kill
+    pf_kill,
+    pf_calc_batch,
+    %(calc_dd)s,
+    %(calc_resume)s,
+    %(state_size)s,
+    pf_clone
 };
 
 pf_obj *pf_new()
@@ -235,6 +390,7 @@ pf_obj *pf_new()
     if(!p) return NULL;
     p->parent.vtbl = &vtbl;
     p->parent.arena = arena_create(100000,1);
+    p->parent.interrupted = NULL;
     return (pf_obj*)p;
 }
 
@@ -337,7 +493,7 @@ pf_obj *pf_new()
         decls = [None] * len(parts)
         for i in range(len(parts)):
             decls[i] = Decl(
-                f"{sym.ctype} {sym.cname}{parts[i]} = {vals[i]};")
+                f"{sym.ctype_at(self.precision)} {sym.cname}{parts[i]} = {vals[i]};")
 
         return decls
 
@@ -345,7 +501,7 @@ pf_obj *pf_new()
         """Declare a variable for sym"""
         parts = sym.part_names
         decls = [
-            Decl(f"{sym.ctype} {sym.cname}{part};")
+            Decl(f"{sym.ctype_at(self.precision)} {sym.cname}{part};")
             for part in parts]
         return decls
 
@@ -418,16 +574,16 @@ pf_obj *pf_new()
             "t__h_index": "",
             "maxiter": "",
             "t__h_tolerance":
-            "double t__h_tolerance = period_tolerance;",
+            f"{self.real} t__h_tolerance = period_tolerance;",
             "t__h_solid": "",
             "t__h_color": "",
             "t__h_fate": "",
             "t__h_inside": "",
             "t__h_magn":
-                "double t__h_magn = log(4.0/t__pfo->pos_params[4])/log(2.0) + 1.0;",
+                f"{self.real} t__h_magn = log(4.0/t__pfo->pos_params[4])/log(2.0) + 1.0;",
             "t__h_center":
-                """double t__h_center_re = t__pfo->pos_params[0];
-                double t__h_center_im = t__pfo->pos_params[1];"""
+                f"""{self.real} t__h_center_re = t__pfo->pos_params[0];
+                {self.real} t__h_center_im = t__pfo->pos_params[1];"""
         }
 
         for (k, v) in list(user_overrides.items()):
@@ -438,11 +594,33 @@ pf_obj *pf_new()
         for (key, sym) in list(ir.symbols.items()):
             self.output_symbol(key, sym, out, overrides)
 
+        self.state_vars = self.find_state_vars(ir, overrides)
+        self.uses_arena = any(
+            isinstance(sym, fracttypes.Var) and sym.type in T.arena_types
+            for sym in ir.symbols.values())
+
         if hasattr(ir, "output_sections"):
             ir.output_sections["var_inits"] = out
 
         return out
 
+    def find_state_vars(self, ir, overrides):
+        """The local variables which can carry a value from one iteration
+        to the next, and so make up a point's state. None if some of them
+        can't be saved as doubles"""
+        state_vars = []
+        for key in sorted(ir.symbols.keys()):
+            sym = ir.symbols[key]
+            if not isinstance(sym, fracttypes.Var) or sym.is_temp or \
+                    self.symbols.is_param(key) or \
+                    overrides.get(key) is not None:
+                continue
+            if sym.type not in T.state_types:
+                # arrays live in the arena, which is cleared each time
+                return None
+            state_vars.append(sym)
+        return state_vars
+
     def output_return_syms(self, ir):
         out = []
         for key in sorted(ir.symbols):
@@ -476,38 +654,200 @@ pf_obj *pf_new()
     def get_bailout_var(self, t):
         return t.symbols["__bailout"].cname
 
-    def output_c(self, t, inserts={}, output_template=None):
-        inserts["bailout_var"] = self.get_bailout_var(t)
-        inserts["dca_init"] = "%d" % self.is_direct()
+    def output_precision(self, inserts):
+        inserts["real"] = self.real
+        if self.precision == fracttypes.DoublePrecision:
+            inserts["calc_name"] = "pf_calc_resume"
+            inserts["pixel_init"] = '''
+    double pixel_re = t__params[0];
+    double pixel_im = t__params[1];
+    double t__h_zwpixel_re = t__params[2];
+    double t__h_zwpixel_im = t__params[3];'''
+            inserts["calc_wrapper"] = T.calc_wrapper_template % {
+                "name": "pf_calc",
+                "params": "",
+                "call": "pf_calc_resume",
+                "setup": "",
+                "call_params": "t__params",
+                "state": "NULL"
+            }
+            inserts["calc_dd"] = "NULL"
+            return
+
+        # the real work is done by pf_calc_dd_resume, which takes the
+        # low-order parts of the coordinates after the usual 4. The
+        # double entry points pass it zeros
+        inserts["calc_name"] = "pf_calc_dd_resume"
+        inserts["pixel_init"] = f'''
+    {self.real} pixel_re = {self.real}(t__params[0], t__params[4]);
+    {self.real} pixel_im = {self.real}(t__params[1], t__params[5]);
+    {self.real} t__h_zwpixel_re = {self.real}(t__params[2], t__params[6]);
+    {self.real} t__h_zwpixel_im = {self.real}(t__params[3], t__params[7]);'''
+        zero_lo = '''
+    const double t__params_dd[8] = {
+        t__params[0], t__params[1], t__params[2], t__params[3],
+        0.0, 0.0, 0.0, 0.0
+    };
+'''
+        inserts["calc_wrapper"] = "".join([
+            T.calc_wrapper_template % {
+                "name": "pf_calc_dd",
+                "params": "",
+                "call": "pf_calc_dd_resume",
+                "setup": "",
+                "call_params": "t__params",
+                "state": "NULL"
+            },
+            T.calc_wrapper_template % {
+                "name": "pf_calc_resume",
+                "params": "\n    double *t__p_state,",
+                "call": "pf_calc_dd_resume",
+                "setup": zero_lo,
+                "call_params": "t__params_dd",
+                "state": "t__p_state"
+            },
+            T.calc_wrapper_template % {
+                "name": "pf_calc",
+                "params": "",
+                "call": "pf_calc_resume",
+                "setup": "",
+                "call_params": "t__params",
+                "state": "NULL"
+            }])
+        inserts["calc_dd"] = "pf_calc_dd"
+
+    def output_state(self, inserts):
+        """Code for pf_calc_resume to save a point's iteration state when
+        it doesn't escape, and to carry on from it next time.
+
+        The state is an array of doubles: how the loop stopped (0 if
+        nothing is saved, 1 at maxiter, 2 when periodicity was
+        detected), the iteration count, then the periodicity checking
+        variables and every local variable which lives from one
+        iteration to the next"""
+        for key in ["restore_state", "resume_loop", "resume_period",
+                    "resume_done", "save_state"]:
+            inserts[key] = ""
+        if self.state_vars is None or \
+                self.precision != fracttypes.DoublePrecision:
+            # double-double values would lose precision
+            inserts["calc_resume"] = "NULL"
+            inserts["state_size"] = "0"
+            return
 
+        ints = ["t__h_numiter"]
+        doubles = []
+        has_period = inserts["check_period"] != ""
+        if has_period:
+            doubles += ["old_z_re", "old_z_im"]
+            if self.period_check == BrentPeriodCheck:
+                ints += ["save_power", "save_age"]
+            else:
+                ints += ["save_mask", "save_incr", "next_save_incr"]
+        ints += ["t__h_solid", "t__h_fate"]
+        doubles += ["t__h_index"]
         if self.is_direct():
-            inserts["save_colors"] = '''
-            t__p_pColors[0] = t__h_color_re;
-            t__p_pColors[1] = t__h_color_i;
-            t__p_pColors[2] = t__h_color_j;
-            t__p_pColors[3] = t__h_color_k;
-            '''
+            doubles += ["t__h_color_re", "t__h_color_i",
+                        "t__h_color_j", "t__h_color_k"]
+        for sym in self.state_vars:
+            names = [sym.cname + part for part in sym.part_names]
+            if sym.ctype == "int":
+                ints += names
+            else:
+                doubles += names
+
+        restores = []
+        saves = []
+        for (i, name) in enumerate(ints + doubles, 1):
+            cast = "(int)" if i <= len(ints) else ""
+            restores.append(f"{name} = {cast}t__p_state[{i}];")
+            saves.append(f"t__p_state[{i}] = {name};")
+
+        goto_period = ""
+        if has_period:
+            inserts["resume_period"] = "t__resume_period: ;"
+            goto_period = "if(t__p_state[0] == 2.0) goto t__resume_period;"
+
+        inserts["restore_state"] = '''
+    if(t__p_state && t__p_state[0] != 0.0)
+    {
+        /* carry on from where an earlier call stopped */
+        %s
+        if(t__h_numiter >= maxiter) goto t__resume_done;
+        %s
+        goto t__resume_loop;
+    }''' % ("\n        ".join(restores), goto_period)
+        inserts["resume_loop"] = "t__resume_loop: ;"
+        inserts["resume_done"] = "t__resume_done: ;"
+        inserts["save_state"] = '''
+    if(t__p_state)
+    {
+        if(t__h_inside)
+        {
+            t__p_state[0] = (t__h_numiter < maxiter) ? 2.0 : 1.0;
+            %s
+        }
+        else
+        {
+            t__p_state[0] = 0.0;
+        }
+    }''' % "\n            ".join(saves)
+        inserts["calc_resume"] = "pf_calc_resume"
+        inserts["state_size"] = str(len(ints) + len(doubles) + 1)
+
+    def output_period_check(self, inserts):
+        """Code to stop iterating once z comes back to (nearly) a value
+        it had before, since it'll go round the same cycle forever"""
+        found_period = '''
+                            period_iters = t__h_numiter;
+                            //t__h_numiter = maxiter;
+                            t__h_inside = 1;
+                            *t__p_pFate = 1;
 
-        if self.log_z:
-            inserts["init_inserts"] = 'printf("%d,%d,%.17g,%.17g : ", t__p_x, t__p_y, pixel_re, pixel_im);'
-            inserts["loop_inserts"] = 'printf("%.17g,%.17g ",z_re, z_im);'
-            inserts["done_inserts"] = 'printf("\\n");'
+                            goto loop_done;'''
+        inserts["init_period"] = '''
+                old_z_re = z_re;
+                old_z_im = z_im;'''
 
-        # can only do periodicity if formula uses z
-        if "z" in self.symbols.data:
-            inserts["decl_period"] = '''
-                double old_z_re;
-                double old_z_im;
+        if self.period_check == BrentPeriodCheck:
+            inserts["decl_period"] = f'''
+                {self.real} old_z_re;
+                {self.real} old_z_im;
+                int period_iters = 0;
+                int save_power = 1;
+                int save_age = 0;
+                '''
+            inserts["check_period"] = '''
+                if ( t__h_numiter >= min_period_iter)
+                {
+                    /* compare to the saved value */
+                    if ( (fabs(z_re - old_z_re) < period_tolerance)
+                       &&(fabs(z_im - old_z_im) < period_tolerance))
+                    {%s
+                    }
+                    if(++save_age == save_power)
+                    {
+                        /* save a new value and keep it twice as long, so
+                           we catch any cycle shorter than save_power
+                           within 2 * save_power iterations of it starting */
+                        old_z_re = z_re;
+                        old_z_im = z_im;
+                        save_power <<= 1;
+                        save_age = 0;
+                    }
+                }
+                ''' % found_period
+            return
+
+        inserts["decl_period"] = f'''
+                {self.real} old_z_re;
+                {self.real} old_z_im;
                 int period_iters = 0;
                 int save_mask = 9;
                 int save_incr = 1;
                 int next_save_incr = 4;
                 '''
-            inserts["init_period"] = '''
-                old_z_re = z_re;
-                old_z_im = z_im;'''
-
-            inserts["check_period"] = '''
+        inserts["check_period"] = '''
                 if ( t__h_numiter >= min_period_iter)
                 {
                     if( (t__h_numiter & save_mask) == 0)
@@ -528,22 +868,122 @@ pf_obj *pf_new()
                         /* compare to an older value */
                         if ( (fabs(z_re - old_z_re) < period_tolerance)
                            &&(fabs(z_im - old_z_im) < period_tolerance))
-                        {
-                            period_iters = t__h_numiter;
-                            //t__h_numiter = maxiter;
-                            t__h_inside = 1;
-                            *t__p_pFate = 1;
-
-                            goto loop_done;
+                        {%s
                         }
                     }
                 }
-                '''
+                ''' % found_period
+
+    def output_interior_test(self, formula, cf0, cf1):
+        """Look for a formula whose inside we can recognize without
+        iterating, given the colorfuncs it's going to be used with"""
+        if self.optimize_flags & optimize.InteriorTests:
+            self.interior_guards = optimize.mandelbrot_interior_guards(
+                formula, cf0, cf1)
+
+    def output_interior(self, inserts):
+        """Code to skip the loop for points in the Mandelbrot set's main
+        cardioid and period-2 bulb, which would otherwise take maxiter
+        iterations or until periodicity checking spots them"""
+        if self.interior_guards is None:
+            inserts["interior_test"] = ""
+            inserts["interior_done"] = ""
+            return
+
+        conditions = []
+        for (kind, sym) in self.interior_guards:
+            if kind == "zero":
+                conditions.append(
+                    f"{sym.cname}_re == 0.0 && {sym.cname}_im == 0.0")
+            else:
+                conditions.append(f"{sym.cname} >= 4.0")
+
+        test = f'''
+    {{
+        {self.real} t__q_re = pixel_re - 0.25;
+        {self.real} t__q = t__q_re * t__q_re + pixel_im * pixel_im;
+        {self.real} t__b_re = pixel_re + 1.0;
+        if(t__q * (t__q + t__q_re) < 0.25 * pixel_im * pixel_im ||
+           t__b_re * t__b_re + pixel_im * pixel_im < 0.0625)
+        {{
+            t__h_numiter = maxiter;
+            goto t__interior_done;
+        }}
+    }}'''
+        if conditions:
+            test = "\n    if(%s)%s" % (" && ".join(conditions), test)
+        inserts["interior_test"] = test
+        inserts["interior_done"] = "t__interior_done: ;"
+
+    def output_interrupt_check(self, inserts):
+        """Every so often, stop iterating if the point's owner has set
+        its interrupt flag, so that very deep calculations can be
+        abandoned quickly"""
+        if self.interrupt_check == 0:
+            inserts["decl_interrupt"] = ""
+            inserts["check_interrupt"] = ""
+            inserts["interrupted"] = ""
+            return
+
+        inserts["decl_interrupt"] = f'''
+    const volatile int *t__h_interrupted = t__p_stub->interrupted;
+    int t__h_poll = {self.interrupt_check};'''
+        inserts["check_interrupt"] = f'''
+        if(--t__h_poll == 0)
+        {{
+            if(t__h_interrupted && *t__h_interrupted) goto t__interrupted;
+            t__h_poll = {self.interrupt_check};
+        }}'''
+        inserts["interrupted"] = f'''
+t__interrupted:
+    /* the point's fate is unknown, so there's nothing to resume */
+    if(t__p_state)
+    {{
+        t__p_state[0] = 0.0;
+    }}
+    *t__p_pnIters = t__h_numiter;
+    *t__p_pFate = FATE_INTERRUPTED;
+    *t__p_pDist = 0.0;
+    *t__p_pSolid = 0;
+    {inserts["clear_arena"]}
+    return;'''
+
+    def output_c(self, t, inserts={}, output_template=None):
+        inserts["bailout_var"] = self.get_bailout_var(t)
+        inserts["dca_init"] = "%d" % self.is_direct()
+        self.output_precision(inserts)
+
+        if self.is_direct():
+            inserts["save_colors"] = '''
+            t__p_pColors[0] = (double)t__h_color_re;
+            t__p_pColors[1] = (double)t__h_color_i;
+            t__p_pColors[2] = (double)t__h_color_j;
+            t__p_pColors[3] = (double)t__h_color_k;
+            '''
+
+        if self.log_z:
+            inserts["init_inserts"] = 'printf("%d,%d,%.17g,%.17g : ", t__p_x, t__p_y, (double)pixel_re, (double)pixel_im);'
+            inserts["loop_inserts"] = 'printf("%.17g,%.17g ",(double)z_re, (double)z_im);'
+            inserts["done_inserts"] = 'printf("\\n");'
+
+        # can only do periodicity if formula uses z
+        if "z" in self.symbols.data:
+            self.output_period_check(inserts)
         else:
             inserts["decl_period"] = ""
             inserts["init_period"] = ""
             inserts["check_period"] = ""
 
+        # arrays are allocated afresh for each point. Formulas without
+        # any, which is most of them, never touch the arena, so don't pay
+        # for a call to clear it after every point of a batch
+        inserts["clear_arena"] = \
+            "arena_clear((arena_t)(t__p_stub->arena));" if self.uses_arena else ""
+
+        self.output_state(inserts)
+        self.output_interior(inserts)
+        self.output_interrupt_check(inserts)
+
         f = Formatter(self, t, inserts)
         if output_template is None:
             output_template = self.output_template
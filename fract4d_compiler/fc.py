@@ -270,6 +270,7 @@ class Compiler:
         # create temp empty formula and merge everything into that
         t = translate.T(absyn.Formula("", [], -1))
         cg = self.compile(t, options)
+        cg.output_interior_test(formula, cf0, cf1)
         t.merge(formula, "")
         t.merge(cf0, "cf0_")
         t.merge(cf1, "cf1_")
@@ -416,15 +417,25 @@ class Compiler:
                 # skip compilation - we already have this code
                 return outputfile
 
+        flags = self.flags
+        if cg.precision != fracttypes.DoublePrecision:
+            # double-double arithmetic relies on the exact rounding
+            # -ffast-math allows the compiler to optimize away
+            flags += " -fno-fast-math"
+
         if cfile is None:
-            cfile = self.cache.makefilename(hash, ".c")
+            # double-double precision relies on C++ operator overloading
+            if cg.precision == fracttypes.DoublePrecision:
+                cfile = self.cache.makefilename(hash, ".c")
+            else:
+                cfile = self.cache.makefilename(hash, ".cpp")
 
         with open(cfile, "w") as f:
             f.write(self.c_code)
 
         # -march=i686 for 10% speed gain
         cmd = "%s \"%s\" %s %s %s\"%s\"" % \
-              (self.compiler_name, cfile, self.flags, self.include_path, self.output_flag, outputfile)
+              (self.compiler_name, cfile, flags, self.include_path, self.output_flag, outputfile)
         cmd += " %s" % self.libs
 
         (status, output) = subprocess.getstatusoutput(cmd)
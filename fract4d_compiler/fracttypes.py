@@ -17,6 +17,24 @@ FloatArray = 11
 ComplexArray = 12
 
 
+# floating-point precisions code can be generated for
+DoublePrecision = "double"
+DoubleDoublePrecision = "double-double"
+
+# the C type used for each floating-point value at each precision
+_realTypes = {
+    DoublePrecision: "double",
+    DoubleDoublePrecision: "dd_real"
+}
+
+
+def realTypeOf(precision):
+    try:
+        return _realTypes[precision]
+    except KeyError:
+        raise TranslationError("Unknown precision %s" % precision)
+
+
 class Type:
     def __init__(self, **kwds):
         self.suffix = kwds["suffix"]
@@ -27,10 +45,17 @@ class Type:
         self.cname = kwds["cname"]
         self.typeid = kwds["id"]
         self.part_names = kwds.get("parts", [""])
+        # are the parts floating-point numbers?
+        self.real = kwds.get("real", False)
 
     def init_val(self, var):
         return "0"
 
+    def ctype(self, precision=DoublePrecision):
+        if self.real:
+            return realTypeOf(precision)
+        return self.cname
+
 
 class FloatType(Type):
     def __init__(self, **kwds):
@@ -116,21 +141,22 @@ typeObjectList = [
             default=0, cname="int"),
 
     FloatType(id=Float, suffix="f", printf="%g", typename="float",
-              default=0.0, cname="double"),
+              default=0.0, cname="double", real=True),
 
     ComplexType(id=Complex, suffix="c", typename="complex",
-                default=[0.0, 0.0], slots=2, cname="double", parts=["_re", "_im"]),
+                default=[0.0, 0.0], slots=2, cname="double", parts=["_re", "_im"],
+                real=True),
 
     QuadType(id=Color, suffix="C", typename="color",
              default=[0.0, 0.0, 0.0, 0.0], slots=4, cname="double",
-             parts=["_re", "_i", "_j", "_k"]),
+             parts=["_re", "_i", "_j", "_k"], real=True),
 
     Type(id=String, suffix="S", typename="string",
          default="", slots=0, cname="<Error>"),
 
     QuadType(id=Hyper, suffix="h", typename="hyper",
              default=[0.0, 0.0, 0.0, 0.0], slots=4, cname="double",
-             parts=["_re", "_i", "_j", "_k"]),
+             parts=["_re", "_i", "_j", "_k"], real=True),
 
     GradientType(id=Gradient, suffix="G", typename="gradient",
                  default=0, cname="void *"),
@@ -367,6 +393,9 @@ class Var:
 
     ctype = property(_get_ctype)
 
+    def ctype_at(self, precision):
+        return self._typeobj.ctype(precision)
+
     def struct_name(self):
         return "t__pfo->" + self.cname
 
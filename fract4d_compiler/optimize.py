@@ -8,11 +8,12 @@
 #    trajectories or anything
 # b) we always ignore overflow, NaN, etc
 
-from . import instructions, graph
+from . import instructions, graph, ir, fracttypes
 
 Nothing = 0
 Peephole = 1
 ConstantPropagation = 2
+InteriorTests = 4
 
 
 class FlowGraph:
@@ -111,3 +112,154 @@ class T:
             insns = self.peephole(insns)
 
         return insns
+
+
+# recognizing formulas we know the answer for
+
+def is_var(t, name):
+    return isinstance(t, ir.Var) and t.name == name
+
+
+def const_value(t):
+    "The value of a constant expression, or None if it isn't one"
+    if isinstance(t, ir.Cast):
+        return const_value(t.children[0])
+    if isinstance(t, ir.Const):
+        return t.value
+    return None
+
+
+def is_zero(t):
+    if isinstance(t, ir.Binop) and t.op == "complex":
+        return all(is_zero(child) for child in t.children)
+    value = const_value(t)
+    if isinstance(value, list):
+        return all(v == 0 for v in value)
+    return value is not None and value == 0
+
+
+def is_square(t, name):
+    "Is t name squared?"
+    if isinstance(t, ir.Call) and t.op == "sqr":
+        return is_var(t.children[0], name)
+    if isinstance(t, ir.Binop) and t.op == "*":
+        return is_var(t.children[0], name) and is_var(t.children[1], name)
+    if isinstance(t, ir.Binop) and t.op == "^":
+        return is_var(t.children[0], name) and \
+            const_value(t.children[1]) == 2
+    return False
+
+
+def uses_var(t, names):
+    "Does the tree t read or write any of these variables?"
+    if t is None:
+        return False
+    if isinstance(t, ir.Var) and t.name in names:
+        return True
+    return any(uses_var(child, names) for child in t.children)
+
+
+def only_stm(formula, section):
+    "The single statement in this section, or None"
+    seq = formula.sections.get(section)
+    if seq is None or len(seq.children) != 1:
+        return None
+    return seq.children[0]
+
+
+def mandelbrot_shape(formula):
+    """If the formula is the Mandelbrot set, z = z^2 + #pixel starting from
+    0 or #zwpixel and bailing out once cmag(z) reaches a limit, return
+    (start, limit):
+
+    start: the name of the variable z starts from, or None for 0
+    limit: the bailout, as a float constant or the name of the float
+    parameter holding it
+
+    Returns None for any other formula."""
+
+    if set(formula.sections.keys()) - {"default", "init", "loop", "bailout"}:
+        return None
+
+    init = only_stm(formula, "init")
+    if not isinstance(init, ir.Move) or not is_var(init.children[0], "z"):
+        return None
+    start = init.children[1]
+    if is_var(start, "#zwpixel"):
+        start = "#zwpixel"
+    elif is_zero(start):
+        start = None
+    else:
+        return None
+
+    loop = only_stm(formula, "loop")
+    if not isinstance(loop, ir.Move) or not is_var(loop.children[0], "z"):
+        return None
+    step = loop.children[1]
+    if not isinstance(step, ir.Binop) or step.op != "+":
+        return None
+    (a, b) = step.children
+    if not ((is_square(a, "z") and is_var(b, "#pixel")) or
+            (is_square(b, "z") and is_var(a, "#pixel"))):
+        return None
+
+    bailout = only_stm(formula, "bailout")
+    if not isinstance(bailout, ir.Move):
+        return None
+    test = bailout.children[1]
+    if not isinstance(test, ir.Binop) or test.op not in ("<", "<="):
+        return None
+    (magnitude, limit) = test.children
+    if not isinstance(magnitude, (ir.Unop, ir.Call)) or \
+            not is_var(magnitude.children[0], "z"):
+        return None
+    fname = magnitude.op
+    if fname.startswith("@"):
+        # a function parameter, which is fixed when the formula is compiled
+        fname = formula.symbols[fname][0].fname
+    if fname != "cmag":
+        return None
+    value = const_value(limit)
+    if value is not None:
+        return (start, value)
+    if isinstance(limit, ir.Var) and limit.name.startswith("@") and \
+            limit.datatype == fracttypes.Float:
+        return (start, limit.name)
+    return None
+
+
+def mandelbrot_interior_guards(formula, cf0, cf1):
+    """If the formula is the Mandelbrot set, z = z^2 + #pixel starting from
+    0, return the conditions under which points in its main cardioid and
+    period-2 bulb can be declared inside without iterating them, as a
+    list of (kind, symbol) pairs:
+
+    ("zero", sym): the complex variable sym must be 0
+    ("bailout", sym): the float parameter sym must be at least 4, since
+    the orbits of points in the set never go further than 2 from 0
+
+    Returns None if the formula isn't one we recognize, or if skipping the
+    loop would change the coloring."""
+
+    # the colorfuncs mustn't keep track of the orbit, and inside points
+    # mustn't be colored by it or by how long it took to get there
+    if any("loop" in cf.sections for cf in (cf0, cf1)):
+        return None
+    if any(uses_var(stm, ("z", "#numiter", "#z"))
+           for stm in cf1.sections.values()):
+        return None
+
+    shape = mandelbrot_shape(formula)
+    if shape is None:
+        return None
+    (start, limit) = shape
+
+    guards = []
+    if start is not None:
+        guards.append(("zero", formula.symbols[start]))
+    if isinstance(limit, str):
+        guards.append(("bailout", formula.symbols[limit]))
+    elif limit < 4.0:
+        return None
+
+    return guards
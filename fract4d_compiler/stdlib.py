@@ -936,7 +936,7 @@ def round_c_c(gen, t, srcs):
 
 
 def floor_f_i(gen, t, srcs):
-    return gen.emit_func('floor', srcs, Int)
+    return gen.emit_func('(int)floor', srcs, Int)
 
 
 def floor_c_c(gen, t, srcs):
@@ -945,7 +945,7 @@ def floor_c_c(gen, t, srcs):
 
 
 def ceil_f_i(gen, t, srcs):
-    return gen.emit_func('ceil', srcs, Int)
+    return gen.emit_func('(int)ceil', srcs, Int)
 
 
 def ceil_c_c(gen, t, srcs):
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import re
 import subprocess
 import os.path
 import time
@@ -7,7 +8,7 @@ import time
 from fract4d import fractconfig
 from fract4d.tests import testbase
 
-from fract4d_compiler import fc, translate
+from fract4d_compiler import fc, translate, optimize, codegen, fracttypes
 
 
 class Test(testbase.ClassSetup):
@@ -131,9 +132,155 @@ bailout: abs(real(z)) > 2.0 || abs(imag(z)) > 2.0
         (status, output) = subprocess.getstatusoutput('nm %s' % test_out_file)
         self.assertEqual(status, 0)
         self.assertEqual(output.count("pf_new"), 1)
-        self.assertEqual(output.count("pf_calc"), 1)
+        self.assertEqual(len(re.findall(r"\bpf_calc\b", output)), 1)
+        self.assertEqual(output.count("pf_calc_batch"), 1)
         self.assertEqual(output.count("pf_init"), 1)
         self.assertEqual(output.count("pf_kill"), 1)
+        self.assertEqual(output.count("pf_clone"), 1)
+
+    def testCompileDoubleDouble(self):
+        'Check a double-double formula gets the extra entry point'
+        f = Test.g_comp.get_formula("gf4d.frm", "Mandelbrot")
+        options = {"precision": "double-double"}
+        cg = Test.g_comp.compile(f, options)
+        test_out_file = os.path.join(Test.tmpdir.name, "test-dd-out.so")
+        Test.g_comp.generate_code(f, cg, test_out_file, None)
+        # it's C++, so demangle the names
+        (status, output) = subprocess.getstatusoutput(
+            'nm -C %s' % test_out_file)
+        self.assertEqual(status, 0)
+        self.assertEqual(len(re.findall(r"\bpf_calc\b", output)), 1)
+        self.assertEqual(len(re.findall(r"\bpf_calc_dd\b", output)), 1)
+
+        # and a double one doesn't
+        cg = Test.g_comp.compile(f)
+        test_out_file = os.path.join(Test.tmpdir.name, "test-d-out.so")
+        Test.g_comp.generate_code(f, cg, test_out_file, None)
+        (status, output) = subprocess.getstatusoutput('nm %s' % test_out_file)
+        self.assertEqual(output.count("pf_calc_dd"), 0)
+
+    def testInteriorTests(self):
+        'Check the Mandelbrot set gets its cardioid and bulb tests'
+        def compile_all(formula, inner="zero", outer="continuous_potential",
+                        flags=optimize.InteriorTests):
+            f = Test.g_comp.get_formula(*formula)
+            cf0 = Test.g_comp.get_formula("gf4d.cfrm", outer, "cf0")
+            cf1 = Test.g_comp.get_formula("gf4d.cfrm", inner, "cf1")
+            Test.g_comp.compile_all(f, cf0, cf1, [], {"optimize": flags})
+            return Test.g_comp.c_code
+
+        c_code = compile_all(("gf4d.frm", "Mandelbrot"))
+        self.assertIn("goto t__interior_done;", c_code)
+        # only when we're looking at the plane of the Mandelbrot set and
+        # points with |z| < 2 don't bail out
+        self.assertIn(
+            "if(t__h_zwpixel_re == 0.0 && t__h_zwpixel_im == 0.0 && "
+            "t__a_fbailout >= 4.0)", c_code)
+
+        formulas = '''
+zsquared {
+init:
+z = 0
+loop:
+z = z^2 + #pixel
+bailout:
+|z| < 4.0
+}
+small_bailout {
+init:
+z = 0
+loop:
+z = z*z + #pixel
+bailout:
+|z| < 2.0
+}
+'''
+        frm_file = os.path.join(Test.tmpdir.name, "interior.frm")
+        with open(frm_file, "w") as f:
+            f.write(formulas)
+        Test.g_comp.load_formula_file(frm_file)
+        c_code = compile_all((frm_file, "zsquared"))
+        self.assertIn("goto t__interior_done;", c_code)
+        self.assertNotIn("zwpixel_re == 0.0", c_code)
+
+        for c_code in [
+                # not asked for
+                compile_all(("gf4d.frm", "Mandelbrot"), flags=1),
+                # not the Mandelbrot set
+                compile_all(("gf4d.frm", "Mandelbar")),
+                # some points with |z| < 2 bail out
+                compile_all((frm_file, "small_bailout")),
+                # the inside is colored by where z ended up
+                compile_all(("gf4d.frm", "Mandelbrot"), "decomposition")]:
+            self.assertNotIn("t__interior_done", c_code)
+
+        # perturbation only needs the formula to be the right shape
+        def shape(*formula):
+            return optimize.mandelbrot_shape(Test.g_comp.get_formula(*formula))
+        self.assertEqual(
+            ("#zwpixel", "@bailout"), shape("gf4d.frm", "Mandelbrot"))
+        self.assertEqual((None, 2.0), shape(frm_file, "small_bailout"))
+        self.assertIsNone(shape("gf4d.frm", "Mandelbar"))
+
+    def testPeriodCheck(self):
+        'Check we can choose how the generated code looks for periodicity'
+        def compile_all(options):
+            f = Test.g_comp.get_formula("gf4d.frm", "Mandelbrot")
+            cf0 = Test.g_comp.get_formula("gf4d.cfrm", "default", "cf0")
+            cf1 = Test.g_comp.get_formula("gf4d.cfrm", "zero", "cf1")
+            Test.g_comp.compile_all(f, cf0, cf1, [], options)
+            return Test.g_comp.c_code
+
+        c_code = compile_all({})
+        self.assertIn("save_mask", c_code)
+        self.assertNotIn("save_power", c_code)
+
+        c_code = compile_all({"period_check": codegen.BrentPeriodCheck})
+        self.assertIn("save_power <<= 1;", c_code)
+        self.assertNotIn("save_mask", c_code)
+
+        self.assertRaises(
+            fracttypes.TranslationError, compile_all, {"period_check": "xxx"})
+
+    def testInterruptCheck(self):
+        'Check we can choose how often the generated code can be interrupted'
+        def compile_mandel(options):
+            f = Test.g_comp.get_formula("gf4d.frm", "Mandelbrot")
+            cf0 = Test.g_comp.get_formula("gf4d.cfrm", "default", "cf0")
+            cf1 = Test.g_comp.get_formula("gf4d.cfrm", "zero", "cf1")
+            Test.g_comp.compile_all(f, cf0, cf1, [], options)
+            return Test.g_comp.c_code
+
+        c_code = compile_mandel({})
+        self.assertIn("int t__h_poll = %d;" % codegen.DefaultInterruptCheck,
+                      c_code)
+        self.assertIn("*t__p_pFate = FATE_INTERRUPTED;", c_code)
+
+        c_code = compile_mandel({"interrupt_check": 64})
+        self.assertIn("int t__h_poll = 64;", c_code)
+
+        c_code = compile_mandel({"interrupt_check": 0})
+        self.assertNotIn("t__interrupted", c_code)
+
+        self.assertRaises(
+            fracttypes.TranslationError, compile_mandel,
+            {"interrupt_check": -1})
+
+    def testArenaClear(self):
+        'Check only formulas with arrays clear the arena after each point'
+        def compile_mandel(inner):
+            f = Test.g_comp.get_formula("gf4d.frm", "Mandelbrot")
+            cf0 = Test.g_comp.get_formula("gf4d.cfrm", "default", "cf0")
+            cf1 = Test.g_comp.get_formula(*inner, "cf1")
+            Test.g_comp.compile_all(f, cf0, cf1, [])
+            return Test.g_comp.c_code
+
+        c_code = compile_mandel(("gf4d.cfrm", "zero"))
+        self.assertNotIn("arena_clear", c_code)
+
+        # this one keeps an array of past values of z
+        c_code = compile_mandel(("experiments.cfrm", "Periodicity"))
+        self.assertEqual(2, c_code.count("arena_clear"))
 
     def testErrors(self):
         'Check we raise appropriate exns when formulas are busted'
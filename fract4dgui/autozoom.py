@@ -93,8 +93,9 @@ class AutozoomDialog(Gtk.Window):
         # centers of each quadrant
         coords = [(1, 1), (3, 1), (1, 3), (3, 3)]
 
-        (x, y) = coords[i]
-        self.f.recenter(x * self.f.width / 4, y * self.f.height / 4, 0.75)
+        (x, y) = self.f.snap_to_pixels(
+            coords[i][0] * self.f.width / 4, coords[i][1] * self.f.height / 4, 0.75)
+        self.f.recenter(x, y, 0.75)
 
     def onStatusChanged(self, f, status_val):
         if status_val == 0:
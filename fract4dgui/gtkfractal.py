@@ -1,7 +1,5 @@
 # Subclass of fract4d.fractal.T which works with a GUI
 
-import os
-import struct
 import math
 import copy
 
@@ -43,10 +41,12 @@ class Hidden(GObject.GObject):
 
     }
 
+    # while a calculation is running, any with a lower priority pause
+    priority = fract4dc.PRIORITY_INTERACTIVE
+
     def __init__(self, comp, width, height, total_width=-1, total_height=-1):
         GObject.GObject.__init__(self)
 
-        (self.readfd, self.writefd) = os.pipe()
         self.nthreads = 1
 
         self.compiler = comp
@@ -55,21 +55,23 @@ class Hidden(GObject.GObject):
         self.last_progress = 0.0
         self.skip_updates = False
         self.running = False
+        # false if parameters have changed since the calculation started
+        self.calc_current = False
         self.frozen = False  # if true, don't emit signals
 
-        self.site = fract4dc.fdsite_create(self.writefd)
+        # the calculation thread keeps its updates in here, and wakes us
+        # up through a file descriptor when there are any
+        self.site = fract4dc.statussite_create()
         self.f = None
         self.try_init_fractal()
 
-        self.input_add(self.readfd, self.onData)
+        self.input_add(fract4dc.statussite_fd(self.site), self.onData)
 
         self.width = width
         self.height = height
         self.image = image.T(
             self.width, self.height, total_width, total_height)
 
-        self.msgbuf = b""
-
     def try_init_fractal(self):
         f = fractal.T(self.compiler, self.site)
         self.set_fractal(f)
@@ -84,6 +86,7 @@ class Hidden(GObject.GObject):
 
             # take over fractal's changed function
             f.changed = self.changed
+            f.colors_changed = self.colors_changed
             f.formula_changed = self.formula_changed
             f.warn = self.warn
             self.formula_changed()
@@ -94,6 +97,19 @@ class Hidden(GObject.GObject):
             return
         self.f.dirty = True
         self.f.clear_image = clear_image
+        self.f.recolor_image = None
+        self.calc_current = False
+        self.set_saved(False)
+        if not self.frozen:
+            self.emit('parameters-changed')
+
+    def colors_changed(self):
+        if self.f is None:
+            return
+        if not self.f.can_recolor():
+            self.changed()
+            return
+        self.f.dirty = True
         self.set_saved(False)
         if not self.frozen:
             self.emit('parameters-changed')
@@ -162,23 +178,12 @@ class Hidden(GObject.GObject):
         self.f.set_formula(fname, formula, index)
 
     def onData(self, fd, condition):
-        self.msgbuf = self.msgbuf + os.read(fd, 8 - len(self.msgbuf))
-
-        if len(self.msgbuf) < 8:
-            # print "incomplete message: %s" % list(self.msgbuf)
-            return True
-
-        (t, size) = struct.unpack("2i", self.msgbuf)
-        self.msgbuf = b""
-        bytes = os.read(fd, size)
-        if len(bytes) < size:
-            print(
-                "not enough bytes, got %d instead of %d" %
-                (len(bytes), size))
-            return True
-
-        m = messages.parse(t, bytes)
+        # everything that's happened since we last looked, all at once
+        for (t, m) in messages.read_status(self.site):
+            self.onMessage(t, m)
+        return True
 
+    def onMessage(self, t, m):
         # print "msg: %s %d %d %d %d" % (m,p1,p2,p3,p4)
         if t == fract4dc.MESSAGE_TYPE_ITERS:
             if not self.skip_updates:
@@ -197,6 +202,11 @@ class Hidden(GObject.GObject):
         elif t == fract4dc.MESSAGE_TYPE_STATUS:
             if m.status == fract4dc.CALC_DONE:  # DONE
                 self.running = False
+                # an interrupted calculation finishes during interrupt(),
+                # and its image is incomplete
+                if not self.skip_updates and self.calc_current and \
+                        len(self.image.get_tile_list()) == 1:
+                    self.f.set_recolor_image(self.image)
             if not self.skip_updates:
                 self.status_changed(m.status)
         elif t == fract4dc.MESSAGE_TYPE_PIXEL:
@@ -210,9 +220,7 @@ class Hidden(GObject.GObject):
             if not self.skip_updates:
                 self.stats_changed(m)
         else:
-            print("Unknown message from fractal thread; %s" % list(bytes))
-
-        return True
+            print("Unknown message from fractal thread; %s" % m)
 
     def __getattr__(self, name):
         return getattr(self.f, name)
@@ -296,9 +304,16 @@ class Hidden(GObject.GObject):
 
         self.f.init_pfunc()
         cmap = self.f.get_colormap()
+        if self.f.get_recolor_image() is image and self.f.can_recolor():
+            # only the colors have changed since the last calculation
+            fract4dc.recolor(image._img, cmap, nthreads)
+            self.image_changed(0, 0, width, height)
+            self.status_changed(fract4dc.CALC_DONE)
+            return
         self.running = True
+        self.calc_current = True
         try:
-            self.f.calc(image, cmap, nthreads, self.site, True)
+            self.f.calc(image, cmap, nthreads, self.site, True, self.priority)
         except MemoryError:
             pass
 
@@ -310,6 +325,8 @@ class Hidden(GObject.GObject):
         self.f.compile()
 
         if aa is not None and auto_deepen is not None:
+            if (aa, auto_deepen) != (self.f.antialias, self.f.auto_deepen):
+                self.f.recolor_image = None
             self.f.antialias = aa
             self.f.auto_deepen = auto_deepen
 
@@ -330,6 +347,15 @@ class Hidden(GObject.GObject):
         return ((x - self.width / 2.0) / self.width,
                 (y - self.height / 2.0) / self.width)
 
+    def snap_to_pixels(self, x, y, zoom):
+        # the nearest point to zoom around which puts the middle pixel of
+        # the new image exactly on an old one, so some of the last image's
+        # pixels can be reused
+        def snap(pos, size):
+            offset = zoom * (size // 2 + 0.5 - size / 2.0)
+            return math.floor(pos + offset) + 0.5 - offset
+        return (snap(x, self.width), snap(y, self.height))
+
     def recenter(self, x, y, zoom):
         dx = (x - self.width / 2.0) / self.width
         dy = (y - self.height / 2.0) / self.width
@@ -372,6 +398,8 @@ class Hidden(GObject.GObject):
         self.height = new_height
 
         self.image.resize_full(new_width, new_height)
+        if self.f is not None:
+            self.f.recolor_image = None
         GLib.idle_add(self.changed)
 
 
@@ -379,19 +407,47 @@ class Hidden(GObject.GObject):
 GObject.type_register(Hidden)
 
 
+class TileSlot:
+    "Somewhere for one tile of a HighResolution image to be drawn"
+
+    def __init__(self, image):
+        self.image = image
+        self.site = fract4dc.statussite_create()
+        self.pfunc = None
+        self.index = None
+        self.progress = 0.0
+        self.running = False
+
+
 class HighResolution(Hidden):
     "An invisible GtkFractal which computes in multiple chunks"
 
+    priority = fract4dc.PRIORITY_BACKGROUND
+    # how many tiles are drawn at once. Each has an image of its own, and
+    # finished tiles wait for the ones above them before being saved
+    tiles_in_flight = 2
+
     def __init__(self, comp, width, height):
         (tile_width, tile_height) = self.compute_tile_size(width, height)
 
         Hidden.__init__(self, comp, tile_width, tile_height, width, height)
+        self.slots = [TileSlot(self.image)]
+        self.slots.extend(
+            TileSlot(self.image.new_tile())
+            for i in range(min(self.tiles_in_flight,
+                               len(self.image.get_tile_list())) - 1))
+        for slot in self.slots:
+            self.input_add(
+                fract4dc.statussite_fd(slot.site),
+                lambda fd, condition, slot=slot: self.onSlotData(slot))
         self.reset_render()
 
     def reset_render(self):
         self.tile_list = self.image.get_tile_list()
         self.ntiles = len(self.tile_list)
         self.ncomplete_tiles = 0
+        self.next_tile_index = 0
+        self.finished = {}
         self.last_overall_progress = 0.0
 
     def compute_tile_size(self, w, h):
@@ -399,6 +455,22 @@ class HighResolution(Hidden):
         tile_height = min(h, 128)
         return (tile_width, tile_height)
 
+    def interrupt(self):
+        if self.skip_updates:
+            return
+
+        self.skip_updates = True
+        for slot in self.slots:
+            if slot.running:
+                fract4dc.interrupt(slot.site)
+
+        # wait for every tile's worker to say it has stopped
+        mc = GLib.MainContext.default()
+        while any(slot.running for slot in self.slots):
+            mc.iteration(True)
+
+        self.skip_updates = False
+
     def draw_image(self, name):
         if self.f is None:
             return
@@ -408,34 +480,82 @@ class HighResolution(Hidden):
 
         self.f.auto_deepen = False
         self.f.auto_tolerance = False
+        (xoff, yoff, w, h) = self.tile_list[0]
+        if self.f.auto_epsilon:
+            self.f.set_named_param(
+                "@epsilon", self.f.epsilon_tolerance(w, h),
+                self.f.formula, self.f.initparams)
+        self.f.init_pfunc()
+        self.cmap = self.f.get_colormap()
+
+        # tiles drawn at the same time can't share a formula instance
+        self.slots[0].pfunc = self.f.pfunc
+        for slot in self.slots[1:]:
+            slot.pfunc = self.f.make_pfunc()
+
+        self.reset_render()
         self.image.start_save(name)
-        self.next_tile()
+        for slot in self.slots:
+            self.next_tile(slot)
         return False
 
-    def next_tile(self):
-        # work left to do
-        (xoff, yoff, w, h) = self.tile_list.pop(0)
-        self.image.resize_tile(w, h)
-        self.image.set_offset(xoff, yoff)
-        self.draw(self.image, w, h, self.nthreads)
+    def next_tile(self, slot):
+        if self.next_tile_index >= self.ntiles:
+            return
+        slot.index = self.next_tile_index
+        self.next_tile_index += 1
+        (xoff, yoff, w, h) = self.tile_list[slot.index]
+        slot.image.resize_tile(w, h)
+        slot.image.set_offset(xoff, yoff)
+        slot.progress = 0.0
+        slot.running = True
+        try:
+            self.f.calc(slot.image, self.cmap, self.nthreads, slot.site, True,
+                        self.priority, pfunc=slot.pfunc)
+        except MemoryError:
+            slot.running = False
+
+    def onSlotData(self, slot):
+        for (t, m) in messages.read_status(slot.site):
+            if t == fract4dc.MESSAGE_TYPE_STATUS:
+                if m.status == fract4dc.CALC_DONE:
+                    slot.running = False
+                if not self.skip_updates:
+                    self.slot_status_changed(slot, m.status)
+            elif self.skip_updates:
+                pass
+            elif t == fract4dc.MESSAGE_TYPE_PROGRESS:
+                slot.progress = m.progress
+                self.progress_changed(m.progress)
+            elif t == fract4dc.MESSAGE_TYPE_STATS:
+                self.stats_changed(m)
+        return True
 
-    def status_changed(self, status):
-        if status == 0:
-            # done this chunk
-            self.image.save_tile()
+    def slot_status_changed(self, slot, status):
+        if status != fract4dc.CALC_DONE:
+            self.emit('status-changed', status)
+            return
+
+        # done this chunk; save it and any after it which were waiting on it
+        self.finished[slot.index] = slot
+        while self.ncomplete_tiles in self.finished:
+            done = self.finished.pop(self.ncomplete_tiles)
+            self.image.save_tile(done.image)
+            done.progress = 0.0
             self.ncomplete_tiles += 1
-            if len(self.tile_list) > 0:
-                self.next_tile()
-            else:
-                # completely done
-                self.image.finish_save()
-                self.emit('status-changed', status)
-        else:
+            self.next_tile(done)
+
+        if self.ncomplete_tiles == self.ntiles:
+            # completely done
+            self.image.finish_save()
             self.emit('status-changed', status)
 
     def progress_changed(self, progress):
+        # a tile waiting to be saved counts as done
+        drawn = sum(100.0 if slot.index in self.finished else slot.progress
+                    for slot in self.slots)
         overall_progress = (
-            100.0 * self.ncomplete_tiles + progress) / self.ntiles
+            100.0 * self.ncomplete_tiles + drawn) / self.ntiles
         if overall_progress > self.last_overall_progress:
             self.emit('progress-changed', overall_progress)
             self.last_overall_progress = overall_progress
@@ -616,7 +736,7 @@ class T(Hidden):
                 alpha = grad.segments[i].left_color[3]
                 grad.segments[i].left_color = [r, g, b, alpha]
 
-        self.changed(False)
+        self.colors_changed()
 
     def onButtonRelease(self, gesture, offset_x, offset_y):
         self.selection_rect.clear()
@@ -661,10 +781,13 @@ class T(Hidden):
             self.recenter(self.newx, self.newy, zoom)
 
         if self.thaw():
-            self.changed()
+            # a pan by whole pixels keeps what's still in view
+            self.changed(self.f.clear_image)
 
 
 class Preview(T):
+    priority = fract4dc.PRIORITY_PREVIEW
+
     def __init__(self, comp, width=120, height=90):
         T.__init__(self, comp, None, width, height)
 
@@ -683,6 +806,8 @@ class Preview(T):
 
 
 class SubFract(T):
+    priority = fract4dc.PRIORITY_PREVIEW
+
     def __init__(self, comp, width=640, height=480, master=None):
         T.__init__(self, comp, None, width, height)
         self.master = master
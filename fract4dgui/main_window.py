@@ -454,7 +454,7 @@ class MainWindow(Actions, ApplicationWindow):
             grad = self.f.get_gradient()
             grad.load_from_url(text)
             self.f.set_gradient(grad)
-            self.f.changed()
+            self.f.colors_changed()
 
     def reset(self, *args):
         """Reset all numeric parameters to their defaults."""
@@ -374,7 +374,8 @@ class PrefsDialog(Gtk.Window):
         return widget
 
     def create_antialias_menu(self):
-        optMenu = utils.combo_box_text_with_items(["None", "Fast", "Best"])
+        optMenu = utils.combo_box_text_with_items(
+            ["None", "Fast", "Best", "Adaptive"])
 
         def set_widget(*args):
             optMenu.set_active(self.prefs.getint("display", "antialias"))
@@ -471,7 +471,7 @@ class ColorSettingsTable(Gtk.Box):
 
         segments = self.f.get_gradient().segments
         segments[i - 1].right_color = copy.copy(segments[i].left_color)
-        self.f.changed()
+        self.f.colors_changed()
 
     def copy_right(self, widget):
         i = self.selected_segment
@@ -480,14 +480,14 @@ class ColorSettingsTable(Gtk.Box):
             return
 
         segments[i + 1].left_color = copy.copy(segments[i].right_color)
-        self.f.changed()
+        self.f.colors_changed()
 
     def split(self, widget):
         i = self.selected_segment
         if i == -1:
             return
         self.f.get_gradient().add(i)
-        self.f.changed()
+        self.f.colors_changed()
 
     def remove(self, widget):
         i = self.selected_segment
@@ -497,7 +497,7 @@ class ColorSettingsTable(Gtk.Box):
         grad.remove(i, True)
         if self.selected_segment > 0:
             self.selected_segment -= 1
-        self.f.changed()
+        self.f.colors_changed()
 
     def solid_color_changed(self, r, g, b, index):
         self.f.set_solid(
@@ -511,7 +511,7 @@ class ColorSettingsTable(Gtk.Box):
             is_left,
             r, g, b)
 
-        self.f.changed()
+        self.f.colors_changed()
         self.redraw()
 
     def select_segment(self, i):
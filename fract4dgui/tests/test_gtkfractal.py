@@ -1,11 +1,13 @@
 import copy
 import math
 import os.path
+from unittest import mock
 
 from . import testgui
 
 from gi.repository import Gdk, GLib, Gtk
 
+from fract4d import fract4dc
 from fract4dgui import gtkfractal
 
 
@@ -105,6 +107,37 @@ class TestHidden(testgui.TestCase):
         self.wait()
         self.assertEqual(True, os.path.exists(hires_image))
 
+    def testTilesInFlight(self):
+        # tiles drawn side by side are saved in order, as if drawn serially
+        names = []
+        for n in (1, 3):
+            with mock.patch.object(
+                    gtkfractal.HighResolution, "tiles_in_flight", n):
+                f = gtkfractal.HighResolution(TestHidden.g_comp, 64, 300)
+            self.assertEqual(n, len(f.slots))
+            f.set_nthreads(2)
+            f.connect('status-changed', self.quitloop)
+            names.append(os.path.join(TestHidden.tmpdir.name, f"tiles{n}.png"))
+            f.draw_image(names[-1])
+            self.wait()
+        with open(names[0], "rb") as a, open(names[1], "rb") as b:
+            self.assertEqual(a.read(), b.read())
+
+    def testPriorities(self):
+        # saving an image gives way to the view being worked on
+        f = gtkfractal.HighResolution(TestHidden.g_comp, 64, 40)
+        self.assertEqual(fract4dc.PRIORITY_BACKGROUND, f.priority)
+        self.assertEqual(fract4dc.PRIORITY_INTERACTIVE,
+                         gtkfractal.Hidden(TestHidden.g_comp, 64, 40).priority)
+        self.assertEqual(fract4dc.PRIORITY_PREVIEW,
+                         gtkfractal.SubFract.priority)
+        self.assertEqual(fract4dc.PRIORITY_PREVIEW,
+                         gtkfractal.Preview.priority)
+
+        f.connect('status-changed', self.quitloop)
+        f.draw_image(os.path.join(TestHidden.tmpdir.name, "background.png"))
+        self.wait()
+
 
 class Test(testgui.TestCase):
     def setUp(self):